@@ -8,7 +8,8 @@ import sys
 import os
 import json
 import importlib
-import pandas as pd
+import functools
+import time
 
 # Import utilities
 try:
@@ -18,6 +19,16 @@ try:
         import_technique_module,
         is_supported_technique
     )
+    from server.utils.dataset_cache import load_dataset, dataset_fingerprint
+    from server.utils.result_cache import cached_run, cached_result, store_result
+    from server.utils.downsample import downsample_result
+    from server.utils.thread_budget import job_threads
+    from server.utils.preprocessing import dataset_scope
+    from server.utils.model_store import save_model_artifact, model_available, predict_rows, read_rows
+    from server.utils.multi_run import profile_frame, valid_techniques, prepare_features, run_all
+    from server.utils.tuning import tune
+    from server.utils.progress import report_progress
+    from server.utils.profiling import run_profile, profile_stage, attach_profile, encode_result, export_profile
 except ImportError:
     # Add the project root to sys.path to find the utils package
     current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -32,6 +43,16 @@ except ImportError:
         import_technique_module,
         is_supported_technique
     )
+    from server.utils.dataset_cache import load_dataset, dataset_fingerprint
+    from server.utils.result_cache import cached_run, cached_result, store_result
+    from server.utils.downsample import downsample_result
+    from server.utils.thread_budget import job_threads
+    from server.utils.preprocessing import dataset_scope
+    from server.utils.model_store import save_model_artifact, model_available, predict_rows, read_rows
+    from server.utils.multi_run import profile_frame, valid_techniques, prepare_features, run_all
+    from server.utils.tuning import tune
+    from server.utils.progress import report_progress
+    from server.utils.profiling import run_profile, profile_stage, attach_profile, encode_result, export_profile
 
 def run_technique(technique, data_path, params=None):
     """Run a specific technique on dataset"""
@@ -44,8 +65,47 @@ def run_technique(technique, data_path, params=None):
         }
     
     try:
-        # Load the dataset
-        data = pd.read_json(data_path)
+        # profile=cprofile,tracemalloc opts this run into heavier profiling;
+        # such runs bypass the result cache so there is a run to profile
+        params = params if params is not None else {}
+        options = params.pop('profile', None)
+        if options:
+            params['use_cache'] = 0
+        with run_profile(technique, options) as profile:
+            # Identical runs on unchanged data are served from the result cache;
+            # the cache holds full-resolution charts and the point budget applies after
+            fingerprint = _memoized(lambda: dataset_fingerprint(data_path))
+            profile.cached = True
+
+            def compute():
+                profile.cached = False
+                return _run_uncached(technique, data_path, params, fingerprint)
+
+            result = cached_run(technique, fingerprint, params, compute, valid=model_available)
+            with profile_stage("downsample"):
+                result = downsample_result(result, params)
+        return attach_profile(result, profile)
+    except Exception as e:
+        return format_error_response(f"Error running {technique}: {str(e)}", technique)
+
+def _memoized(compute):
+    """Wrap a zero-argument callable so it runs at most once"""
+    value = []
+    def get():
+        if not value:
+            value.append(compute())
+        return value[0]
+    return get
+
+def _run_uncached(technique, data_path, params, fingerprint=None):
+    """Load the dataset and run the technique module on it"""
+    try:
+        # Load the dataset: memory-mapped when data_path is a columnar
+        # artifact, otherwise the CSV is read directly in chunks using any
+        # dtype hints from the stored schema
+        report_progress("load")
+        with profile_stage("load"):
+            data = load_dataset(data_path, dtypes=(params or {}).pop('dtypes', None))
         
         # Handle target column if specified in params
         if params and 'target_column' in params:
@@ -59,38 +119,293 @@ def run_technique(technique, data_path, params=None):
                 print(f"Warning: Target column '{target_column}' not found in dataset")
         
         # Import the module for the specified technique using our utility function
-        module, error = import_technique_module(technique)
+        with profile_stage("import"):
+            module, error = import_technique_module(technique)
         
         if error:
             return error
         
-        # Call the run function from the module
-        result = module.run(data, params)
-        return result
+        # Call the run function from the module with this job's share of
+        # the host's threads; feature matrices it builds are cached under
+        # the dataset's hash
+        fingerprint = fingerprint or _memoized(lambda: dataset_fingerprint(data_path))
+        report_progress("run", rows=len(data))
+        with job_threads((params or {}).get('n_jobs')), dataset_scope(fingerprint), profile_stage("technique"):
+            result = module.run(data, params)
+        # Keep the fitted model for later predictions instead of discarding it
+        report_progress("save")
+        with profile_stage("save_model"):
+            return save_model_artifact(technique, fingerprint, params, result)
     
     except Exception as e:
         return format_error_response(f"Error running {technique}: {str(e)}", technique)
 
-if __name__ == "__main__":
-    # Process command line arguments
-    if len(sys.argv) < 3:
-        print(json.dumps({"error": "Usage: python run_model.py [technique] [data_file] [param1=value1] [param2=value2] ..."}))
-        sys.exit(1)
-    
-    technique = sys.argv[1]
-    data_path = sys.argv[2]
-    
-    # Parse optional parameters
+def _run_prepared(technique, frame, params, dataset_hash=None, sample=None):
+    """
+    Run one technique of a multi-run or tuning job on the shared prepared
+    frame; `sample` names the subsample when frame is not the whole of it
+    """
+    try:
+        target_column = params.get('target_column')
+        if target_column in frame.columns:
+            params['target_data'] = frame[target_column]
+        module, error = import_technique_module(technique)
+        if error:
+            return error
+        # The prepared frame depends on the NaN policy as well as the data
+        scope = f"{dataset_hash}:{params.get('nan_policy')}" + (f":{sample}" if sample else "")
+        with run_profile(technique) as profile:
+            with job_threads(params.get('n_jobs')), dataset_scope(scope), profile_stage("technique"):
+                result = module.run(frame, params)
+            if sample:
+                # Models fitted on a subsample are only used for scoring the trial
+                result.pop('model_artifact', None)
+            else:
+                with profile_stage("save_model"):
+                    result = save_model_artifact(technique, dataset_hash, params, result)
+        profile.cached = False
+        return attach_profile(result, profile)
+    except Exception as e:
+        return format_error_response(f"Error running {technique}: {str(e)}", technique)
+
+def run_multi(data_path, params=None):
+    """
+    Run every valid technique on one load of the dataset.
+
+    Params besides the technique params:
+        techniques: comma-separated list to run instead of the techniques
+            whose constraint rules pass
+        nan_policy: "drop" (default), "impute" or "keep", applied once for
+            all techniques
+        workers: pool size (defaults to the host's thread budget)
+
+    Yields:
+        JSON-serializable messages: "start", one "result" per technique in
+        the order they finish, then "summary"
+    """
+    started = time.perf_counter()
+    params = dict(params or {})
+    requested = params.pop('techniques', None)
+    if isinstance(requested, str):
+        requested = [t.strip() for t in requested.split(',') if t.strip()]
+    workers = params.pop('workers', None)
+    params.setdefault('nan_policy', 'drop')
+
+    data = load_dataset(data_path, dtypes=params.pop('dtypes', None))
+    profile = profile_frame(data)
+    techniques, skipped = valid_techniques(
+        profile, SUPPORTED_TECHNIQUES, target_column=params.get('target_column'), requested=requested
+    )
+    frame = prepare_features(data, params['nan_policy'])
+    del data
+    # The prepared frame is part of the cache key through nan_policy
+    fingerprint = dataset_fingerprint(data_path)
+    yield {
+        "type": "start",
+        "techniques": techniques,
+        "skipped": skipped,
+        "profile": profile,
+        "rows_prepared": len(frame),
+        "load_ms": round((time.perf_counter() - started) * 1000, 1)
+    }
+
+    errors = 0
+    runs = run_all(
+        frame, techniques,
+        functools.partial(_run_prepared, dataset_hash=fingerprint),
+        params=params,
+        workers=workers,
+        cached=lambda technique: cached_result(technique, fingerprint, params, valid=model_available)
+    )
+    for technique, result, elapsed, hit in runs:
+        if not hit:
+            store_result(technique, fingerprint, params, result)
+        if isinstance(result, dict) and (result.get("error") or (result.get("stats") or {}).get("error")):
+            errors += 1
+        yield {
+            "type": "result",
+            "technique": technique,
+            "cached": hit,
+            "elapsed_ms": elapsed,
+            "result": downsample_result(result, params)
+        }
+    yield {
+        "type": "summary",
+        "techniques": len(techniques),
+        "errors": errors,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+    }
+
+def run_tune(technique, data_path, params=None):
+    """
+    Search a technique's params on one load of the dataset.
+
+    Params besides the shared technique params:
+        space: JSON search space (see tuning.sample_configs); defaults to the
+            technique's DEFAULT_SPACES entry
+        n_trials, eta, min_rows, seed: successive halving settings
+        objective, direction: stat to rank by and "max" or "min"
+        nan_policy: as for multi-runs (default "drop")
+        workers: pool size (defaults to the host's thread budget)
+
+    Yields:
+        JSON-serializable messages: "start", "trial" and "rung" events, then
+        "summary" with the leaderboard and the best configuration's result
+    """
+    started = time.perf_counter()
+    params = dict(params or {})
+    if technique not in SUPPORTED_TECHNIQUES:
+        raise ValueError(f"Technique '{technique}' is not supported")
+    space = params.pop('space', None)
+    if isinstance(space, str):
+        space = json.loads(space)
+    options = {key: params.pop(key) for key in ('n_trials', 'eta', 'min_rows', 'seed', 'objective',
+                                                 'direction', 'workers') if key in params}
+    params.setdefault('nan_policy', 'drop')
+
+    data = load_dataset(data_path, dtypes=params.pop('dtypes', None))
+    frame = prepare_features(data, params['nan_policy'])
+    del data
+    fingerprint = dataset_fingerprint(data_path)
+    yield {
+        "type": "start",
+        "technique": technique,
+        "rows_prepared": len(frame),
+        "load_ms": round((time.perf_counter() - started) * 1000, 1)
+    }
+
+    for message in tune(
+        frame, technique,
+        functools.partial(_run_prepared, dataset_hash=fingerprint),
+        space=space,
+        params=params,
+        # Full-frame trials share the multi-run cache entries
+        cached=lambda trial_params: cached_result(technique, fingerprint, trial_params, valid=model_available),
+        store=lambda trial_params, result: store_result(technique, fingerprint, trial_params, result),
+        **options
+    ):
+        if message["type"] == "summary":
+            message["technique"] = technique
+            message["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            if message["result"] is not None:
+                message["result"] = downsample_result(message["result"], params)
+        yield message
+
+def preload_techniques():
+    """Import every supported technique module so the first job runs warm"""
+    for technique in SUPPORTED_TECHNIQUES:
+        try:
+            import_technique_module(technique)
+        except Exception as e:
+            # A broken module should only fail its own jobs, not the worker
+            print(f"Could not preload {technique}: {str(e)}", file=sys.stderr)
+
+def predict(model_id, rows, method=None):
+    """Serve new rows from a stored model"""
+    try:
+        if isinstance(rows, str):
+            rows = read_rows(rows)
+        return predict_rows(model_id, rows, method)
+    except Exception as e:
+        return {"error": f"Prediction error: {str(e)}", "model_id": model_id}
+
+def run_job(job):
+    """Run a job received by a worker process"""
+    if job.get("action") == "predict":
+        return predict(job["model_id"], job.get("rows_path") or job.get("rows") or [], job.get("method"))
+    params = dict(job.get("params") or {})
+    if job.get("dtypes"):
+        params["dtypes"] = job["dtypes"]
+    return run_technique(job["technique"], job["data_path"], params)
+
+def parse_params(args):
+    """Parse key=value command line arguments into a params dict"""
     params = {}
-    for i in range(3, len(sys.argv)):
-        if '=' in sys.argv[i]:
-            key, value = sys.argv[i].split('=', 1)
+    for arg in args:
+        if '=' in arg:
+            key, value = arg.split('=', 1)
             # Try to convert value to number if possible
             try:
                 params[key] = float(value) if '.' in value else int(value)
             except ValueError:
                 params[key] = value
+    return params
+
+if __name__ == "__main__":
+    # Worker mode: keep this interpreter warm and take jobs over stdin
+    if len(sys.argv) > 1 and sys.argv[1] == "--worker":
+        from server.utils.worker import serve, parse_worker_args
+        options = parse_worker_args(sys.argv[2:])
+        serve(run_job, preload=preload_techniques, **options)
+        sys.exit(0)
+
+    # Job dispatcher: queue technique runs and start each as a `job` process
+    if len(sys.argv) > 1 and sys.argv[1] == "jobs":
+        from server.utils.job_queue import serve as serve_jobs
+        options = parse_params(sys.argv[2:])
+        serve_jobs([sys.executable, os.path.abspath(__file__), "job"],
+                   concurrency=options.get('concurrency'), techniques=SUPPORTED_TECHNIQUES)
+        sys.exit(0)
+
+    # Job process: run one queued job and record its result in the job store
+    if len(sys.argv) == 3 and sys.argv[1] == "job":
+        from server.utils.job_queue import execute_job
+        execute_job(sys.argv[2], run_job)
+        sys.exit(0)
+
+    # Multi-run mode: one JSON line per message as each technique finishes
+    if len(sys.argv) >= 3 and sys.argv[1] == "multi":
+        try:
+            for message in run_multi(sys.argv[2], parse_params(sys.argv[3:])):
+                sys.stdout.write(json.dumps(message, cls=NpEncoder) + "\n")
+                sys.stdout.flush()
+        except Exception as e:
+            sys.stdout.write(json.dumps({"type": "error", "error": str(e)}) + "\n")
+            sys.exit(1)
+        sys.exit(0)
+
+    # Tuning mode: one JSON line per trial, rung and final summary
+    if len(sys.argv) >= 4 and sys.argv[1] == "tune":
+        try:
+            for message in run_tune(sys.argv[2], sys.argv[3], parse_params(sys.argv[4:])):
+                sys.stdout.write(json.dumps(message, cls=NpEncoder) + "\n")
+                sys.stdout.flush()
+        except Exception as e:
+            sys.stdout.write(json.dumps({"type": "error", "error": str(e)}) + "\n")
+            sys.exit(1)
+        sys.exit(0)
+
+    # Process command line arguments
+    if len(sys.argv) < 3:
+        print(json.dumps({"error": "Usage: python run_model.py [technique] [data_file] [param1=value1] [param2=value2] ... [result_file=path] | predict [model_id] [rows_file] [method=name] [result_file=path] | multi [data_file] [techniques=a,b] [nan_policy=drop|impute|keep] [workers=N] ... | tune [technique] [data_file] [space=json] [n_trials=N] [eta=N] [min_rows=N] [objective=stat] [direction=max|min] [workers=N] ... | jobs [concurrency=N] | job [job_id] | --worker [--max-jobs N] [--max-rss-mb M]"}))
+        sys.exit(1)
     
-    # Run the technique and print the result as JSON
-    result = run_technique(technique, data_path, params)
-    print(json.dumps(result, cls=NpEncoder))
\ No newline at end of file
+    if sys.argv[1] == "predict" and len(sys.argv) >= 4:
+        # Apply a stored model (stats.model_id of an earlier run) to new rows
+        params = parse_params(sys.argv[4:])
+        result_file = params.pop('result_file', None)
+        result = predict(sys.argv[2], sys.argv[3], params.get('method'))
+    else:
+        technique = sys.argv[1]
+        data_path = sys.argv[2]
+        
+        # Parse optional parameters
+        params = parse_params(sys.argv[3:])
+        result_file = params.pop('result_file', None)
+        
+        # Run the technique and print the result as JSON, or write it as a
+        # binary envelope and print where it is
+        result = run_technique(technique, data_path, params)
+    if result_file:
+        from server.utils.result_transport import write_envelope
+        profile = result.get("profile") if isinstance(result, dict) else None
+        started = time.perf_counter()
+        size = write_envelope(result, result_file)
+        encode_ms = round((time.perf_counter() - started) * 1000, 2)
+        print(json.dumps({"result_file": result_file, "bytes": size, "encode_ms": encode_ms}))
+        if profile:
+            profile = dict(profile, encode_ms=encode_ms)
+    else:
+        encoded, profile = encode_result(result)
+        print(encoded)
+    export_profile(profile, entry="cli")
\ No newline at end of file
@@ -1,3 +1,5 @@
+import os
+import sys
 import pandas as pd
 import json
 import numpy as np
@@ -5,6 +7,18 @@ from sklearn.naive_bayes import GaussianNB
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, classification_report
 
+try:
+    from server.utils.model_store import model_artifact
+    from server.utils.evaluation import cross_validate
+    from server.utils.preprocessing import feature_matrix, missing_stats, DEFAULT_MISSING
+    from server.utils.profiling import profile_stage
+except ImportError:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from server.utils.model_store import model_artifact
+    from server.utils.evaluation import cross_validate
+    from server.utils.preprocessing import feature_matrix, missing_stats, DEFAULT_MISSING
+    from server.utils.profiling import profile_stage
+
 class NpEncoder(json.JSONEncoder):
     def default(self, obj):
         if isinstance(obj, np.integer):
@@ -17,8 +31,9 @@ class NpEncoder(json.JSONEncoder):
 
 def run(df: pd.DataFrame, params: dict = None):
     try:
-        X = df.select_dtypes(include='number').dropna()
-        if X.shape[1] < 2:
+        params = params or {}
+        numeric_cols = df.select_dtypes(include='number').columns.tolist()
+        if len(numeric_cols) < 2:
             return {
                 "charts": {},
                 "stats": {"error": "At least 2 numeric columns required"},
@@ -26,29 +41,46 @@ def run(df: pd.DataFrame, params: dict = None):
                 "explanation": "GaussianNB needs one target and at least one numeric feature."
             }
 
-        y = X.iloc[:, 0]
-        X = X.iloc[:, 1:]
+        # The first numeric column is the target; incomplete rows are imputed
+        # unless missing='drop'
+        features = feature_matrix(
+            df,
+            target=numeric_cols[0],
+            missing=params.get('missing', DEFAULT_MISSING),
+            scaling=params.get('scaling'),
+            dtype=params.get('dtype', 'float64')
+        )
+        X, y = features.frame(), features.target()
 
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.25, random_state=42)
         model = GaussianNB()
-        model.fit(X_train, y_train)
+        with profile_stage("fit"):
+            model.fit(X_train, y_train)
         preds = model.predict(X_test)
 
         # Get the classification report and ensure all values are JSON serializable
-        report = classification_report(y_test, preds, output_dict=True)
+        with profile_stage("metrics"):
+            report = classification_report(y_test, preds, output_dict=True)
         for class_name in report:
             if isinstance(report[class_name], dict):
                 for metric in report[class_name]:
                     report[class_name][metric] = float(report[class_name][metric])
 
+        cv_stats, cv_folds = cross_validate(model, X, y, "classification", params)
+
         return {
             "charts": {},
             "stats": {
-                "accuracy": float(accuracy_score(y_test, preds))
+                "accuracy": float(accuracy_score(y_test, preds)),
+                **missing_stats(features),
+                **cv_stats
             },
             "tables": {
-                "classification_report": report
+                "classification_report": report,
+                "cv_folds": cv_folds
             },
+            "model_artifact": model_artifact(features.pipeline(model), X.columns, target=y.name,
+                                             methods=["predict", "predict_proba"], classes=model.classes_.tolist()),
             "explanation": "Gaussian Naive Bayes is a simple probabilistic classifier based on applying Bayes' theorem with strong feature independence assumptions."
         }
 
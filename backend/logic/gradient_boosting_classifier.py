@@ -1,10 +1,29 @@
+import os
+import sys
 import pandas as pd
 import json
 import numpy as np
-from sklearn.ensemble import GradientBoostingClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, classification_report
 
+try:
+    from server.utils.boosting import (
+        resolve_engine, boosting_estimator, thread_limit, complete_rows, feature_importances,
+        DEFAULT_HIST_MIN_ROWS, DEFAULT_IMPORTANCE_SAMPLE
+    )
+    from server.utils.model_store import model_artifact
+    from server.utils.evaluation import cross_validate
+    from server.utils.profiling import profile_stage
+except ImportError:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from server.utils.boosting import (
+        resolve_engine, boosting_estimator, thread_limit, complete_rows, feature_importances,
+        DEFAULT_HIST_MIN_ROWS, DEFAULT_IMPORTANCE_SAMPLE
+    )
+    from server.utils.model_store import model_artifact
+    from server.utils.evaluation import cross_validate
+    from server.utils.profiling import profile_stage
+
 class NpEncoder(json.JSONEncoder):
     def default(self, obj):
         if isinstance(obj, np.integer):
@@ -17,7 +36,7 @@ class NpEncoder(json.JSONEncoder):
 
 def run(df: pd.DataFrame, params: dict = None):
     try:
-        X = df.select_dtypes(include='number').dropna()
+        X = df.select_dtypes(include='number')
         if X.shape[1] < 2:
             return {
                 "charts": {},
@@ -26,37 +45,65 @@ def run(df: pd.DataFrame, params: dict = None):
                 "explanation": "Gradient Boosting Classifier needs one target and at least one feature column."
             }
 
+        params = params or {}
         y = X.iloc[:, 0]
         X = X.iloc[:, 1:]
 
+        # Rows with missing values are only dropped when the exact engine needs it
+        engine = resolve_engine(len(X), params.get("engine", "auto"),
+                                int(params.get("hist_min_rows", DEFAULT_HIST_MIN_ROWS)))
+        mask = complete_rows(X, y, engine)
+        X, y = X[mask], y[mask]
+        random_state = int(params.get("random_state", 42))
+
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42)
-        model = GradientBoostingClassifier()
-        model.fit(X_train, y_train)
-        predictions = model.predict(X_test)
+        model = boosting_estimator("classification", engine,
+                                   early_stopping=str(params.get("early_stopping", 1)).lower() not in ("0", "false", "no"),
+                                   random_state=random_state)
+        with thread_limit(params.get("n_threads")):
+            with profile_stage("fit"):
+                model.fit(X_train, y_train)
+            predictions = model.predict(X_test)
+            importances, importance_method = feature_importances(
+                model, engine, X_test, y_test,
+                sample_size=int(params.get("importance_sample_size", DEFAULT_IMPORTANCE_SAMPLE)),
+                random_state=random_state
+            )
 
         # Convert feature importances to standard Python types
-        feature_importances = {}
-        for i, col in enumerate(X.columns):
-            feature_importances[col] = float(model.feature_importances_[i])
+        importances = {col: float(value) for col, value in importances.items()}
 
         # Get the classification report and ensure all values are JSON serializable
-        report = classification_report(y_test, predictions, output_dict=True)
+        with profile_stage("metrics"):
+            report = classification_report(y_test, predictions, output_dict=True, zero_division=0)
         for class_name in report:
             if isinstance(report[class_name], dict):
                 for metric in report[class_name]:
                     report[class_name][metric] = float(report[class_name][metric])
 
+        cv_stats, cv_folds = cross_validate(model, X, y, "classification", params)
+
         return {
             "charts": {
-                "feature_importances": feature_importances
+                "feature_importances": importances
             },
             "stats": {
-                "accuracy": float(accuracy_score(y_test, predictions))
+                "accuracy": float(accuracy_score(y_test, predictions)),
+                "engine": engine,
+                "n_iterations": int(model.n_iter_ if engine == "hist" else model.n_estimators_),
+                "rows_used": int(mask.sum()),
+                "importance_method": importance_method,
+                **cv_stats
             },
             "tables": {
-                "classification_report": report
+                "classification_report": report,
+                "cv_folds": cv_folds
             },
+            "model_artifact": model_artifact(model, X.columns, target=y.name,
+                                             methods=["predict", "predict_proba"], classes=model.classes_.tolist()),
             "explanation": "Gradient Boosting Classifier combines weak learners (typically decision trees) into a strong classifier through boosting."
+                           + (" The histogram-based engine was used: features are binned, missing values are handled natively, boosting stops early once a validation split stops improving, and importances are measured by permutation."
+                              if engine == "hist" else "")
         }
 
     except Exception as e:
@@ -69,8 +116,6 @@ def run(df: pd.DataFrame, params: dict = None):
 
 # This allows the file to be run as a script
 if __name__ == "__main__":
-    import sys
-    
     if len(sys.argv) < 2:
         print(json.dumps({"error": "No data file provided"}))
         sys.exit(1)
@@ -1,9 +1,28 @@
+import os
+import sys
 import pandas as pd
 import json
 import numpy as np
-from sklearn.ensemble import GradientBoostingRegressor
 from sklearn.metrics import mean_squared_error, r2_score
 
+try:
+    from server.utils.boosting import (
+        resolve_engine, boosting_estimator, thread_limit, complete_rows, feature_importances,
+        DEFAULT_HIST_MIN_ROWS, DEFAULT_IMPORTANCE_SAMPLE
+    )
+    from server.utils.model_store import model_artifact
+    from server.utils.evaluation import cross_validate
+    from server.utils.profiling import profile_stage
+except ImportError:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from server.utils.boosting import (
+        resolve_engine, boosting_estimator, thread_limit, complete_rows, feature_importances,
+        DEFAULT_HIST_MIN_ROWS, DEFAULT_IMPORTANCE_SAMPLE
+    )
+    from server.utils.model_store import model_artifact
+    from server.utils.evaluation import cross_validate
+    from server.utils.profiling import profile_stage
+
 class NpEncoder(json.JSONEncoder):
     def default(self, obj):
         if isinstance(obj, np.integer):
@@ -16,7 +35,7 @@ class NpEncoder(json.JSONEncoder):
 
 def run(df: pd.DataFrame, params: dict = None):
     try:
-        X = df.select_dtypes(include='number').dropna()
+        X = df.select_dtypes(include='number')
         if X.shape[1] < 2:
             return {
                 "charts": {},
@@ -25,22 +44,37 @@ def run(df: pd.DataFrame, params: dict = None):
                 "explanation": "Gradient Boosting Regressor requires one target and at least one feature column."
             }
 
+        params = params or {}
         y = X.iloc[:, 0]
         X = X.iloc[:, 1:]
 
-        model = GradientBoostingRegressor()
-        model.fit(X, y)
-        preds = model.predict(X)
+        # Rows with missing values are only dropped when the exact engine needs it
+        engine = resolve_engine(len(X), params.get("engine", "auto"),
+                                int(params.get("hist_min_rows", DEFAULT_HIST_MIN_ROWS)))
+        mask = complete_rows(X, y, engine)
+        X, y = X[mask], y[mask]
+        random_state = int(params.get("random_state", 42))
+
+        model = boosting_estimator("regression", engine,
+                                   early_stopping=str(params.get("early_stopping", 1)).lower() not in ("0", "false", "no"),
+                                   random_state=random_state)
+        with thread_limit(params.get("n_threads")):
+            with profile_stage("fit"):
+                model.fit(X, y)
+            preds = model.predict(X)
+            importances, importance_method = feature_importances(
+                model, engine, X, y,
+                sample_size=int(params.get("importance_sample_size", DEFAULT_IMPORTANCE_SAMPLE)),
+                random_state=random_state
+            )
 
         # Convert feature importances to standard Python types
-        feature_importances = {}
-        for i, col in enumerate(X.columns):
-            feature_importances[col] = float(model.feature_importances_[i])
+        importances = {col: float(value) for col, value in importances.items()}
+
+        # Prediction/actual pairs as an (n, 2) array
+        pred_actual_pairs = np.column_stack((preds, y.to_numpy(dtype=float)))
 
-        # Convert prediction data to list of float pairs
-        pred_actual_pairs = []
-        for i in range(len(preds)):
-            pred_actual_pairs.append([float(preds[i]), float(y.iloc[i])])
+        cv_stats, cv_folds = cross_validate(model, X, y, "regression", params)
 
         return {
             "charts": {
@@ -48,12 +82,21 @@ def run(df: pd.DataFrame, params: dict = None):
             },
             "stats": {
                 "r2": float(r2_score(y, preds)),
-                "mse": float(mean_squared_error(y, preds))
+                "mse": float(mean_squared_error(y, preds)),
+                "engine": engine,
+                "n_iterations": int(model.n_iter_ if engine == "hist" else model.n_estimators_),
+                "rows_used": int(mask.sum()),
+                "importance_method": importance_method,
+                **cv_stats
             },
             "tables": {
-                "feature_importances": feature_importances
+                "feature_importances": importances,
+                "cv_folds": cv_folds
             },
+            "model_artifact": model_artifact(model, X.columns, target=y.name),
             "explanation": "Gradient Boosting Regressor builds models sequentially, minimizing the error of the previous model using decision trees."
+                           + (" The histogram-based engine was used: features are binned, missing values are handled natively, boosting stops early once a validation split stops improving, and importances are measured by permutation."
+                              if engine == "hist" else "")
         }
 
     except Exception as e:
@@ -66,8 +109,6 @@ def run(df: pd.DataFrame, params: dict = None):
 
 # This allows the file to be run as a script
 if __name__ == "__main__":
-    import sys
-    
     if len(sys.argv) < 2:
         print(json.dumps({"error": "No data file provided"}))
         sys.exit(1)
@@ -1,8 +1,24 @@
+import os
+import sys
 import pandas as pd
 import json
 import numpy as np
-from scipy.cluster.hierarchy import linkage, fcluster
-from scipy.spatial.distance import pdist
+
+try:
+    from server.utils.cluster_quality import cluster_quality
+    from server.utils.json_utils import ColumnarRecords
+    from server.utils.progress import report_progress
+    from server.utils.scalable_linkage import (
+        hierarchical_labels, DEFAULT_MEMORY_BUDGET_MB, DEFAULT_MICRO_CLUSTERS, DEFAULT_DENDROGRAM_LEAVES
+    )
+except ImportError:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from server.utils.cluster_quality import cluster_quality
+    from server.utils.json_utils import ColumnarRecords
+    from server.utils.progress import report_progress
+    from server.utils.scalable_linkage import (
+        hierarchical_labels, DEFAULT_MEMORY_BUDGET_MB, DEFAULT_MICRO_CLUSTERS, DEFAULT_DENDROGRAM_LEAVES
+    )
 
 class NpEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -12,6 +28,8 @@ class NpEncoder(json.JSONEncoder):
             return float(obj)
         if isinstance(obj, np.ndarray):
             return obj.tolist()
+        if isinstance(obj, ColumnarRecords):
+            return obj.as_records()
         return super(NpEncoder, self).default(obj)
 
 def run(df: pd.DataFrame, params: dict = None):
@@ -25,26 +43,39 @@ def run(df: pd.DataFrame, params: dict = None):
                 "explanation": "Hierarchical Clustering requires at least two numeric features."
             }
 
-        method = params.get("method", "ward") if params else "ward"
-        Z = linkage(X, method=method)
-        clusters = fcluster(Z, t=3, criterion='maxclust')
+        params = params or {}
+        method = params.get("method", "ward")
+        distance_threshold = params.get("distance_threshold")
+        labels, info = hierarchical_labels(
+            X.to_numpy(dtype=float),
+            method=method,
+            n_clusters=int(params.get("n_clusters", 3)),
+            distance_threshold=float(distance_threshold) if distance_threshold not in (None, "") else None,
+            mode=params.get("mode", "auto"),
+            memory_budget_mb=float(params.get("memory_budget_mb", DEFAULT_MEMORY_BUDGET_MB)),
+            n_micro=int(params.get("n_micro_clusters", DEFAULT_MICRO_CLUSTERS)),
+            dendrogram_leaves=int(params.get("dendrogram_leaves", DEFAULT_DENDROGRAM_LEAVES))
+        )
 
-        # Convert cluster assignments to a list of dictionaries
-        cluster_assignments = []
-        for i, c in enumerate(clusters):
-            cluster_assignments.append({"Index": int(i), "Cluster": int(c)})
+        # Cluster assignments as columns; they serialise to a list of dictionaries
+        cluster_assignments = ColumnarRecords({"Index": np.arange(len(labels)), "Cluster": labels})
 
+        report_progress("cluster_quality")
         return {
             "charts": {
-                "linkage_matrix": Z.tolist()
+                "dendrogram": info["dendrogram"]
             },
             "stats": {
-                "n_clusters": int(len(set(clusters)))
+                "n_clusters": int(len(set(labels.tolist()))),
+                **cluster_quality(X, labels),
+                "mode": info["mode"],
+                "dendrogram_leaves": info["dendrogram_leaves"]
             },
             "tables": {
                 "cluster_assignments": cluster_assignments
             },
             "explanation": "Hierarchical Clustering builds nested clusters by merging or splitting them successively using a chosen linkage method."
+                           + (" The rows were first compressed into micro-clusters because the full distance matrix would not fit in memory." if info["mode"] == "two_stage" else "")
         }
 
     except Exception as e:
@@ -57,8 +88,6 @@ def run(df: pd.DataFrame, params: dict = None):
 
 # This allows the file to be run as a script
 if __name__ == "__main__":
-    import sys
-    
     if len(sys.argv) < 2:
         print(json.dumps({"error": "No data file provided"}))
         sys.exit(1)
@@ -1,7 +1,18 @@
+import os
+import sys
 import pandas as pd
 import json
 import numpy as np
-from sklearn.decomposition import KernelPCA
+
+try:
+    from server.utils.kernel_approx import (
+        kernel_pca_projection, DEFAULT_EXACT_MAX_ROWS, DEFAULT_LANDMARKS, DEFAULT_ERROR_SAMPLE
+    )
+except ImportError:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from server.utils.kernel_approx import (
+        kernel_pca_projection, DEFAULT_EXACT_MAX_ROWS, DEFAULT_LANDMARKS, DEFAULT_ERROR_SAMPLE
+    )
 
 class NpEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -24,17 +35,27 @@ def run(df: pd.DataFrame, params: dict = None):
                 "explanation": "Kernel PCA requires multiple numeric features to compute non-linear projections."
             }
 
-        kernel = params.get("kernel", "rbf") if params else "rbf"
-        kpca = KernelPCA(n_components=2, kernel=kernel)
-        X_kpca = kpca.fit_transform(X)
+        params = params or {}
+        kernel = params.get("kernel", "rbf")
+        X_kpca, info = kernel_pca_projection(
+            X.to_numpy(dtype=float),
+            kernel=kernel,
+            mode=params.get("mode", "auto"),
+            exact_max_rows=int(params.get("exact_max_rows", DEFAULT_EXACT_MAX_ROWS)),
+            approximation=params.get("approximation", "nystroem"),
+            n_landmarks=int(params.get("n_landmarks", DEFAULT_LANDMARKS)),
+            error_sample_size=int(params.get("error_sample_size", DEFAULT_ERROR_SAMPLE))
+        )
 
         return {
             "charts": {
-                "projection_2D": X_kpca.tolist()
+                "projection_2D": X_kpca
             },
-            "stats": {},
+            "stats": info,
             "tables": {},
             "explanation": f"Kernel PCA reduces dimensionality using a {kernel.upper()} kernel, capturing non-linear feature interactions."
+                           + (f" The kernel was approximated with {info['n_landmarks']} {'landmarks' if info['approximation'] == 'nystroem' else 'random Fourier features'} because the dataset is too large for an exact kernel matrix."
+                              if info["mode"] == "approximate" else "")
         }
 
     except Exception as e:
@@ -47,8 +68,6 @@ def run(df: pd.DataFrame, params: dict = None):
 
 # This allows the file to be run as a script
 if __name__ == "__main__":
-    import sys
-    
     if len(sys.argv) < 2:
         print(json.dumps({"error": "No data file provided"}))
         sys.exit(1)
@@ -1,7 +1,19 @@
+import os
+import sys
 import pandas as pd
 import json
 import numpy as np
 
+try:
+    from server.utils.evaluation import forecast_cv
+    from server.utils.progress import report_progress
+    from server.utils.profiling import profile_stage
+except ImportError:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from server.utils.evaluation import forecast_cv
+    from server.utils.progress import report_progress
+    from server.utils.profiling import profile_stage
+
 class NpEncoder(json.JSONEncoder):
     def default(self, obj):
         if isinstance(obj, np.integer):
@@ -15,6 +27,7 @@ class NpEncoder(json.JSONEncoder):
         return super(NpEncoder, self).default(obj)
 
 def run(df: pd.DataFrame, params: dict = None):
+    params = params or {}
     try:
         # Check if prophet is available
         try:
@@ -24,7 +37,7 @@ def run(df: pd.DataFrame, params: dict = None):
             prophet_available = False
             
         if not prophet_available:
-            return simulate_forecasting_result(df)
+            return simulate_forecasting_result(df, int(params.get("random_state", 42)))
             
         if df.shape[1] < 2:
             return {
@@ -40,12 +53,28 @@ def run(df: pd.DataFrame, params: dict = None):
         if not pd.api.types.is_datetime64_any_dtype(df["ds"]):
             df["ds"] = pd.to_datetime(df["ds"], errors="coerce")
             df = df.dropna()
+        df = df.sort_values("ds").reset_index(drop=True)
 
+        # Prophet samples its uncertainty intervals from NumPy's global
+        # generator; seed it so identical runs give identical results
+        np.random.seed(int(params.get("random_state", 42)))
         model = Prophet()
-        model.fit(df)
+        report_progress("fit", rows=len(df))
+        with profile_stage("fit"):
+            model.fit(df)
+        report_progress("forecast")
         future = model.make_future_dataframe(periods=30)
         forecast = model.predict(future)
 
+        # Forecast accuracy over expanding windows: each fold fits on the
+        # rows before its test block and forecasts that block
+        def fold_forecast(train, test):
+            fold_model = Prophet()
+            fold_model.fit(df.iloc[train])
+            return fold_model.predict(df.iloc[test][["ds"]])["yhat"].to_numpy()
+
+        cv_stats, cv_folds = forecast_cv(fold_forecast, df["y"], params)
+
         # Convert forecast data to serializable format
         forecast_data = []
         for i in range(len(forecast.tail(30))):
@@ -70,10 +99,12 @@ def run(df: pd.DataFrame, params: dict = None):
                 "forecast": forecast_data
             },
             "stats": {
-                "total_forecasted_days": 30
+                "total_forecasted_days": 30,
+                **cv_stats
             },
             "tables": {
-                "last_forecast": last_forecast
+                "last_forecast": last_forecast,
+                "cv_folds": cv_folds
             },
             "explanation": "Prophet forecasts time series data using additive models with trend and seasonality components, ideal for business or event-driven series."
         }
@@ -86,7 +117,7 @@ def run(df: pd.DataFrame, params: dict = None):
             "explanation": "An error occurred during time series forecasting."
         }
 
-def simulate_forecasting_result(df):
+def simulate_forecasting_result(df, random_state=42):
     """Fallback function when Prophet is not available"""
     try:
         if df.shape[1] < 2:
@@ -111,11 +142,17 @@ def simulate_forecasting_result(df):
         last_value = y_values[-1]
         trend = (y_values[-1] - y_values[0]) / len(y_values) if len(y_values) > 1 else 0
         
-        forecasted_dates = pd.date_range(start=pd.Timestamp.now(), periods=30, freq='D')
+        # Continue from the last date in the data, so the result depends only
+        # on the inputs (and can be cached); today when there is none
+        dates = df.iloc[:, 0]
+        last_date = pd.NaT if pd.api.types.is_numeric_dtype(dates) else pd.to_datetime(dates, errors="coerce").max()
+        start = last_date + pd.Timedelta(days=1) if pd.notna(last_date) else pd.Timestamp.now().normalize()
+        forecasted_dates = pd.date_range(start=start, periods=30, freq='D')
         forecasted_values = []
+        rng = np.random.default_rng(random_state)
         
         for i in range(30):
-            next_val = last_value + trend * (i + 1) + np.random.normal(0, abs(trend) * 2 if trend != 0 else 0.1)
+            next_val = last_value + trend * (i + 1) + rng.normal(0, abs(trend) * 2 if trend != 0 else 0.1)
             forecasted_values.append(next_val)
             
         forecast_data = [{"ds": date.strftime("%Y-%m-%d"), "yhat": float(val)} 
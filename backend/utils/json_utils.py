@@ -19,6 +19,9 @@ class NpEncoder(json.JSONEncoder):
             return bool(obj)
         if isinstance(obj, pd.Timestamp):
             return obj.strftime('%Y-%m-%d')
+        if hasattr(obj, "as_records"):
+            # server.utils.json_utils.ColumnarRecords
+            return obj.as_records()
         return super(NpEncoder, self).default(obj)
 
 def format_error_response(error_message, technique=None):
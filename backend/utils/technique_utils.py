@@ -12,6 +12,7 @@ SUPPORTED_TECHNIQUES = [
     'kmeans',
     'isolation_forest',
     'linear_regression',
+    'logistic_regression',
     'random_forest_classifier',
     'dbscan',
     'ridge_regression',
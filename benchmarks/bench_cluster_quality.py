@@ -0,0 +1,60 @@
+"""
+Show that cluster quality metrics stay within their memory budget as rows grow.
+
+Usage:
+    python benchmarks/bench_cluster_quality.py [--rows 100000,300000,1000000]
+                                               [--features 8] [--budget-mb 64]
+
+For each size, reports wall time and the peak memory allocated while
+computing silhouette (sampled), Davies-Bouldin and Calinski-Harabasz,
+measured with tracemalloc and excluding the input matrix itself.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.utils.cluster_quality import cluster_quality
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default="100000,300000,1000000")
+    parser.add_argument("--features", type=int, default=8)
+    parser.add_argument("--clusters", type=int, default=5)
+    parser.add_argument("--budget-mb", type=int, default=64)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    report = []
+    for rows in [int(r) for r in args.rows.split(",")]:
+        labels = rng.integers(0, args.clusters, size=rows)
+        X = rng.normal(size=(rows, args.features)) + labels[:, None] * 2.0
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        quality = cluster_quality(X, labels, memory_budget_mb=args.budget_mb)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        report.append({
+            "rows": rows,
+            "input_mb": round(X.nbytes / 1024 ** 2, 1),
+            "peak_extra_mb": round(peak / 1024 ** 2, 1),
+            "seconds": round(elapsed, 2),
+            "silhouette": round(quality["silhouette_score"], 4),
+            "silhouette_ci": [round(v, 4) for v in quality["silhouette_ci"]],
+            "davies_bouldin": round(quality["davies_bouldin_score"], 4),
+            "calinski_harabasz": round(quality["calinski_harabasz_score"], 1)
+        })
+
+    print(json.dumps({"budget_mb": args.budget_mb, "results": report}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Compare ways of getting an uploaded CSV into a technique's DataFrame.
+
+Usage:
+    python benchmarks/bench_csv_loading.py [--sizes-mb 10,50] [--keep]
+
+Strategies, each measured in a fresh interpreter for wall time and peak RSS
+(Linux only: read from /proc; `baseline_rss_mb` is the interpreter with
+pandas imported, before loading):
+    json_roundtrip  the old /run path: CSV -> JSON array of string records
+                    (as csv-parser + JSON.stringify produced it), then
+                    pd.read_json; the conversion is done here with the csv
+                    module and counted in both wall time and peak RSS
+    csv_chunked     read_csv_chunked on the original CSV (what run_model.py
+                    does before the columnar artifact exists)
+    artifact        load_artifact on the memory-mapped columnar artifact
+"""
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from server.utils.dataset_cache import build_artifact
+
+LOADERS = {
+    "json_roundtrip": """
+import csv, json
+with open(CSV) as f:
+    records = list(csv.DictReader(f))
+with open(JSON_PATH, "w") as f:
+    json.dump(records, f)
+del records
+df = pd.read_json(JSON_PATH)
+""",
+    "csv_chunked": """
+from server.utils.dataset_cache import read_csv_chunked
+df = read_csv_chunked(CSV, {"group": "categorical"})
+""",
+    "artifact": """
+from server.utils.dataset_cache import load_artifact
+df = load_artifact(ARTIFACT)
+# Touch every numeric column so mapped pages are actually read
+df.select_dtypes(include="number").sum()
+""",
+}
+
+# ru_maxrss survives exec and would report the parent's high-water mark, so
+# read VmHWM (reset with the new address space) instead
+RUNNER = """
+import os, sys, json, time
+sys.path.insert(0, {root!r})
+import pandas as pd
+
+def peak_rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+
+CSV, JSON_PATH, ARTIFACT = {csv!r}, {json_path!r}, {artifact!r}
+baseline = peak_rss_mb()
+started = time.perf_counter()
+{body}
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "rows": len(df), "baseline_rss_mb": baseline,
+                  "peak_rss_mb": peak_rss_mb()}}))
+"""
+
+def make_csv(path, size_mb):
+    """Write a mixed numeric/text CSV of roughly size_mb megabytes"""
+    rng = np.random.default_rng(0)
+    rows = int(size_mb * 1024 * 1024 / 62)
+    df = pd.DataFrame({f"x{i}": rng.normal(size=rows).round(6) for i in range(6)})
+    df["group"] = rng.choice(["alpha", "beta", "gamma", "delta"], rows)
+    df.to_csv(path, index=False)
+    return rows
+
+def measure(name, csv_path, json_path, artifact):
+    script = RUNNER.format(root=ROOT, csv=csv_path, json_path=json_path, artifact=artifact, body=LOADERS[name])
+    output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes-mb", default="10,50")
+    parser.add_argument("--keep", action="store_true", help="keep the generated files")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-csv-")
+    report = []
+    try:
+        for size_mb in [float(s) for s in args.sizes_mb.split(",")]:
+            csv_path = os.path.join(workdir, f"data_{size_mb:g}mb.csv")
+            json_path = os.path.join(workdir, f"data_{size_mb:g}mb.json")
+            rows = make_csv(csv_path, size_mb)
+            artifact = build_artifact(csv_path, f"bench{size_mb:g}", cache_root=workdir)["path"]
+
+            results = {name: measure(name, csv_path, json_path, artifact) for name in LOADERS}
+            report.append({
+                "size_mb": round(os.path.getsize(csv_path) / 1024 ** 2, 1),
+                "rows": rows,
+                "baseline_rss_mb": round(results["csv_chunked"]["baseline_rss_mb"], 1),
+                **{
+                    name: {"seconds": round(r["seconds"], 3), "peak_rss_mb": round(r["peak_rss_mb"], 1)}
+                    for name, r in results.items()
+                }
+            })
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps({"results": report}, indent=2))
+
+if __name__ == "__main__":
+    main()
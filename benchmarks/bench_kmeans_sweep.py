@@ -0,0 +1,59 @@
+"""
+Wall time of choosing k with one kmeans sweep versus one run per k.
+
+Usage:
+    python benchmarks/bench_kmeans_sweep.py [--rows 50000] [--features 6]
+                                            [--clusters 5] [--k 2,10]
+
+Both sides run the kmeans module in-process on the same blobs, so the
+comparison excludes interpreter start-up and CSV parsing (which the sweep
+also saves when called through run_model.py). Reports the recommended k and
+the worst inertia ratio of the warm-started sweep fits to the cold fits.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import pandas as pd
+from sklearn.datasets import make_blobs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.logic import kmeans
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--features", type=int, default=6)
+    parser.add_argument("--clusters", type=int, default=5)
+    parser.add_argument("--k", default="2,10", help="k_min,k_max")
+    args = parser.parse_args()
+
+    k_min, k_max = (int(v) for v in args.k.split(","))
+    X, _ = make_blobs(args.rows, n_features=args.features, centers=args.clusters, cluster_std=1.5, random_state=0)
+    df = pd.DataFrame(X, columns=[f"x{i}" for i in range(args.features)])
+
+    started = time.perf_counter()
+    cold = {k: kmeans.run(df, {"n_clusters": k})["stats"]["inertia"] for k in range(k_min, k_max + 1)}
+    separate = time.perf_counter() - started
+
+    started = time.perf_counter()
+    sweep = kmeans.run(df, {"k_min": k_min, "k_max": k_max})
+    swept = time.perf_counter() - started
+
+    rows = sweep["tables"]["k_sweep"]
+    print(json.dumps({
+        "rows": args.rows,
+        "true_clusters": args.clusters,
+        "k_values": len(rows),
+        "separate_s": round(separate, 2),
+        "sweep_s": round(swept, 2),
+        "speedup": round(separate / swept, 2),
+        "recommended_k": sweep["stats"]["recommended_k"],
+        "max_inertia_ratio": round(max(r["inertia"] / cold[r["k"]] for r in rows), 4)
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
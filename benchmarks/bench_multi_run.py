@@ -0,0 +1,86 @@
+"""
+Wall time of running several techniques one request at a time versus one
+multi-run.
+
+Usage:
+    python benchmarks/bench_multi_run.py [--rows 100000] [--features 6]
+        [--techniques kmeans,isolation_forest,linear_regression,...] [--workers N]
+
+Writes a synthetic CSV, then reports:
+- separate: one `run_model.py <technique> <csv>` process per technique, run
+  back to back (an interpreter start and a CSV parse each)
+- multi: one `run_model.py multi <csv>` process; the time to the first
+  streamed result is reported too
+
+The result cache is disabled for both so every technique is computed.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUN_MODEL = os.path.join(ROOT, "backend", "api", "run_model.py")
+DEFAULT_TECHNIQUES = "kmeans,isolation_forest,linear_regression,logistic_regression,random_forest_classifier,gaussian_nb"
+
+def write_dataset(path, rows, features):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(rows, features))
+    df = pd.DataFrame(X, columns=[f"x{i}" for i in range(features)])
+    df.insert(0, "label", (X[:, 0] + X[:, 1] > 0).astype(int))
+    df.to_csv(path, index=False)
+
+def run_separate(path, techniques, env):
+    started = time.perf_counter()
+    for technique in techniques:
+        subprocess.run([sys.executable, RUN_MODEL, technique, path, "use_cache=0"],
+                       env=env, capture_output=True, check=True)
+    return time.perf_counter() - started
+
+def run_multi(path, techniques, workers, env):
+    args = [sys.executable, RUN_MODEL, "multi", path, f"techniques={','.join(techniques)}", "use_cache=0"]
+    if workers:
+        args.append(f"workers={workers}")
+    started = time.perf_counter()
+    first = None
+    process = subprocess.Popen(args, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    for line in process.stdout:
+        if first is None and json.loads(line).get("type") == "result":
+            first = time.perf_counter() - started
+    process.wait()
+    return time.perf_counter() - started, first
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--features", type=int, default=6)
+    parser.add_argument("--techniques", default=DEFAULT_TECHNIQUES)
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args()
+
+    techniques = args.techniques.split(",")
+    scratch = tempfile.mkdtemp(prefix="bench-multi-")
+    path = os.path.join(scratch, "data.csv")
+    write_dataset(path, args.rows, args.features)
+    env = dict(os.environ, BUMP_MODEL_CACHE=os.path.join(scratch, "models"))
+
+    separate = run_separate(path, techniques, env)
+    multi, first = run_multi(path, techniques, args.workers, env)
+    print(json.dumps({
+        "rows": args.rows,
+        "techniques": len(techniques),
+        "separate_s": round(separate, 2),
+        "multi_s": round(multi, 2),
+        "multi_first_result_s": round(first, 2) if first is not None else None,
+        "speedup": round(separate / multi, 2) if multi else None
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Compare JSON and the binary envelope for large technique results.
+
+Usage:
+    python benchmarks/bench_result_transport.py [--rows 100000,1000000]
+
+Builds results shaped like kmeans (`data` rows, `labels`) and isolation
+forest (scores, per-row outlier table), both as the techniques now return
+them (ColumnarRecords and arrays) and as plain lists of dicts, then reports
+encoded size, encode time and decode time for json.dumps/json.loads versus
+write_envelope/read_envelope. The decode side only matters for the JSON
+fallback; binary clients read the buffers directly.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.utils.json_utils import NpEncoder, ColumnarRecords
+from server.utils.result_transport import write_envelope, read_envelope
+
+def make_results(rows):
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(rows, 4)), columns=["a", "b", "c", "d"])
+    labels = rng.integers(0, 5, rows)
+    scores = rng.normal(size=rows)
+    anomalies = np.where(scores < -2, -1, 1)
+    return {
+        "kmeans": {
+            "data": ColumnarRecords.from_frame(X),
+            "labels": labels,
+            "centroids": rng.normal(size=(5, 4)).tolist(),
+            "stats": {"inertia": 1.0},
+            "explanation": "KMeans"
+        },
+        "kmeans_lists": {
+            "data": X.to_dict("records"),
+            "labels": labels.tolist(),
+            "centroids": rng.normal(size=(5, 4)).tolist(),
+            "stats": {"inertia": 1.0},
+            "explanation": "KMeans"
+        },
+        "isolation_forest": {
+            "charts": {"anomaly_scores": scores},
+            "stats": {"n_outliers": int((anomalies == -1).sum())},
+            "tables": {"outliers": ColumnarRecords({"Index": np.arange(rows), "Anomaly": anomalies})},
+            "explanation": "Isolation Forest"
+        },
+        "isolation_forest_lists": {
+            "charts": {"anomaly_scores": scores.tolist()},
+            "stats": {"n_outliers": int((anomalies == -1).sum())},
+            "tables": {"outliers": [{"Index": i, "Anomaly": int(a)} for i, a in enumerate(anomalies)]},
+            "explanation": "Isolation Forest"
+        }
+    }
+
+def timed(fn):
+    started = time.perf_counter()
+    value = fn()
+    return value, time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default="100000,1000000")
+    args = parser.parse_args()
+
+    report = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows in [int(r) for r in args.rows.split(",")]:
+            for name, result in make_results(rows).items():
+                encoded, json_encode = timed(lambda: json.dumps(result, cls=NpEncoder))
+                _, json_decode = timed(lambda: json.loads(encoded))
+
+                path = os.path.join(workdir, f"{name}.bin")
+                size, envelope_encode = timed(lambda: write_envelope(result, path))
+                _, envelope_decode = timed(lambda: read_envelope(path))
+
+                report.append({
+                    "shape": name,
+                    "rows": rows,
+                    "json": {"mb": round(len(encoded) / 1024 ** 2, 1),
+                             "encode_s": round(json_encode, 3), "decode_s": round(json_decode, 3)},
+                    "envelope": {"mb": round(size / 1024 ** 2, 1),
+                                 "encode_s": round(envelope_encode, 3), "decode_s": round(envelope_decode, 3)}
+                })
+
+    print(json.dumps({"results": report}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Compare exact kernel SVC/SVR with the kernel-approximation path.
+
+Usage:
+    python benchmarks/bench_svm_approximation.py [--rows 5000,20000,100000]
+                                                 [--exact-max-rows 20000]
+
+Generates a non-linear classification problem (points inside or outside a
+circle) and a non-linear regression problem, then for each size reports
+held-out accuracy / R^2 and fit + predict time for the exact estimators
+(SVC/SVR) and for Nystroem and random-Fourier approximations with the
+solver svm_estimator picks automatically. Exact runs above
+--exact-max-rows are skipped because they take minutes.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import accuracy_score, r2_score
+
+from server.utils.kernel_approx import svm_estimator
+
+def make_problems(rows, features=4):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(rows, features))
+    labels = ((X[:, 0] ** 2 + X[:, 1] ** 2) > 1.5).astype(int)
+    target = 2 * np.sin(X[:, 0]) + X[:, 1] ** 2 + rng.normal(scale=0.1, size=rows)
+    return {"classification": (X, labels), "regression": (X, target)}
+
+def evaluate(task, X, y, **options):
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.25, random_state=42)
+    model, info = svm_estimator(task, X_train, **options)
+    started = time.perf_counter()
+    model.fit(X_train, y_train)
+    preds = model.predict(X_test)
+    elapsed = time.perf_counter() - started
+    score = accuracy_score(y_test, preds) if task == "classification" else r2_score(y_test, preds)
+    return {
+        "mode": info["mode"],
+        "approximation": info["approximation"],
+        "solver": info["solver"],
+        "score": round(float(score), 4),
+        "seconds": round(elapsed, 3)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default="5000,20000,100000")
+    parser.add_argument("--exact-max-rows", type=int, default=20000)
+    parser.add_argument("--landmarks", type=int, default=300)
+    args = parser.parse_args()
+
+    report = []
+    for rows in [int(r) for r in args.rows.split(",")]:
+        for task, (X, y) in make_problems(rows).items():
+            runs = []
+            if rows <= args.exact_max_rows:
+                runs.append(evaluate(task, X, y, mode="exact"))
+            for approximation in ("nystroem", "rff"):
+                runs.append(evaluate(task, X, y, mode="approximate", approximation=approximation,
+                                     n_landmarks=args.landmarks))
+            report.append({"task": task, "rows": rows, "metric": "accuracy" if task == "classification" else "r2",
+                           "runs": runs})
+
+    print(json.dumps({"results": report}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Throughput of concurrent forest jobs with and without the thread budget.
+
+Usage:
+    python benchmarks/bench_thread_budget.py [--concurrency 1,2,4,8]
+                                             [--rows 50000] [--jobs-per-process 2]
+
+Each concurrency level starts that many processes, each fitting a random
+forest and an isolation forest jobs-per-process times, and reports jobs
+per second for three policies:
+- serial: n_jobs=1, the old behaviour (one core per job)
+- unbudgeted: n_jobs=-1 with BLAS/OpenMP uncapped in every process
+- budget: every job runs inside thread_budget.job_threads and uses
+  allotted_threads() for n_jobs
+
+On an N-core host, serial leaves cores idle until N jobs run at once,
+unbudgeted oversubscribes as soon as two jobs overlap, and budget should
+keep every core busy without oversubscribing at every level.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import multiprocessing as mp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def _fit(rows, policy):
+    import numpy as np
+    from sklearn.ensemble import RandomForestClassifier, IsolationForest
+    from server.utils.thread_budget import job_threads, allotted_threads
+
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(rows, 8))
+    y = (X[:, 0] + X[:, 1] > 0).astype(int)
+
+    def fit(n_jobs):
+        RandomForestClassifier(n_estimators=50, n_jobs=n_jobs, random_state=0).fit(X, y)
+        IsolationForest(n_jobs=n_jobs, random_state=0).fit(X)
+
+    if policy == "budget":
+        with job_threads():
+            fit(allotted_threads())
+    else:
+        fit(1 if policy == "serial" else -1)
+
+def _process(rows, policy, jobs, start):
+    start.wait()
+    for _ in range(jobs):
+        _fit(rows, policy)
+
+def measure(concurrency, rows, policy, jobs_per_process):
+    ctx = mp.get_context("spawn")
+    start = ctx.Event()
+    processes = [ctx.Process(target=_process, args=(rows, policy, jobs_per_process, start))
+                 for _ in range(concurrency)]
+    for process in processes:
+        process.start()
+    # Let every interpreter finish importing before the clock starts
+    time.sleep(3)
+    started = time.perf_counter()
+    start.set()
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+    return round(concurrency * jobs_per_process / elapsed, 3)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,2,4,8")
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--jobs-per-process", type=int, default=2)
+    args = parser.parse_args()
+
+    os.environ["BUMP_JOB_REGISTRY"] = tempfile.mkdtemp(prefix="bump-jobs-")
+    from server.utils.thread_budget import total_threads
+
+    report = []
+    for concurrency in [int(c) for c in args.concurrency.split(",")]:
+        report.append({
+            "concurrency": concurrency,
+            "jobs_per_second": {
+                policy: measure(concurrency, args.rows, policy, args.jobs_per_process)
+                for policy in ("serial", "unbudgeted", "budget")
+            }
+        })
+
+    print(json.dumps({"cores": total_threads(), "rows": args.rows, "results": report}, indent=2))
+
+if __name__ == "__main__":
+    main()
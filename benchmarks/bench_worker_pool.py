@@ -0,0 +1,109 @@
+"""
+Compare technique latency for spawn-per-request against warm pooled workers.
+
+Usage:
+    python benchmarks/bench_worker_pool.py [--technique kmeans] [--requests 40]
+                                           [--workers 2] [--rows 5000]
+
+Both paths run the same `backend/api/run_model.py` on the same JSON dataset;
+the spawn path starts a new interpreter per request the way server/routes.ts
+used to, the pool path sends jobs to `run_model.py --worker` processes.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUN_MODEL = os.path.join(PROJECT_ROOT, "backend", "api", "run_model.py")
+
+def make_dataset(rows, path):
+    """Write a synthetic numeric dataset as JSON records"""
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.normal(size=(rows, 5)), columns=[f"f{i}" for i in range(5)])
+    df.to_json(path, orient="records")
+
+def summarize(latencies):
+    values = np.array(latencies) * 1000
+    return {
+        "n": len(values),
+        "p50_ms": round(float(np.percentile(values, 50)), 1),
+        "p99_ms": round(float(np.percentile(values, 99)), 1),
+        "mean_ms": round(float(values.mean()), 1)
+    }
+
+def bench_spawn(technique, data_path, requests):
+    latencies = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        subprocess.run(
+            [sys.executable, RUN_MODEL, technique, data_path],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True
+        )
+        latencies.append(time.perf_counter() - started)
+    return summarize(latencies)
+
+def start_worker():
+    process = subprocess.Popen(
+        [sys.executable, RUN_MODEL, "--worker"],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+    )
+    ready = json.loads(process.stdout.readline())
+    assert ready["type"] == "ready", ready
+    return process
+
+def bench_pool(technique, data_path, requests, workers):
+    started = time.perf_counter()
+    pool = [start_worker() for _ in range(workers)]
+    startup = time.perf_counter() - started
+
+    latencies = []
+    for i in range(requests):
+        worker = pool[i % workers]
+        started = time.perf_counter()
+        worker.stdin.write(json.dumps({"id": i, "technique": technique, "data_path": data_path}) + "\n")
+        worker.stdin.flush()
+        response = json.loads(worker.stdout.readline())
+        latencies.append(time.perf_counter() - started)
+        assert response.get("ok"), response
+
+    for worker in pool:
+        worker.stdin.write(json.dumps({"type": "shutdown"}) + "\n")
+        worker.stdin.close()
+        worker.wait()
+
+    summary = summarize(latencies)
+    summary["pool_startup_ms"] = round(startup * 1000, 1)
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--technique", default="kmeans")
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--rows", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_path = os.path.join(tmp, "dataset.json")
+        make_dataset(args.rows, data_path)
+
+        spawn = bench_spawn(args.technique, data_path, args.requests)
+        pool = bench_pool(args.technique, data_path, args.requests, args.workers)
+
+    print(json.dumps({
+        "technique": args.technique,
+        "rows": args.rows,
+        "spawn_per_request": spawn,
+        "worker_pool": pool,
+        "p50_speedup": round(spawn["p50_ms"] / pool["p50_ms"], 1) if pool["p50_ms"] else None
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
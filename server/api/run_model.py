@@ -1,7 +1,6 @@
 import os
 import sys
 import json
-import pandas as pd
 from pathlib import Path
 import csv
 import importlib.util
@@ -13,26 +12,38 @@ sys.path.append(str(server_dir))
 
 # Import utilities
 try:
-    from server.utils.json_utils import NpEncoder, format_error_response
     from server.utils.technique_utils import (
         SUPPORTED_TECHNIQUES, 
         TECHNIQUE_MODULE_MAP,
         is_supported_technique,
         import_technique_module
     )
+    from server.utils.dataset_cache import load_dataset, dataset_fingerprint
+    from server.utils.result_cache import cached_run
+    from server.utils.downsample import downsample_result
+    from server.utils.thread_budget import job_threads
+    from server.utils.preprocessing import dataset_scope
+    from server.utils.model_store import save_model_artifact, model_available, predict_rows, read_rows
+    from server.utils.profiling import run_profile, profile_stage, attach_profile, encode_result, export_profile
 except ImportError:
     # If we can't find them, add more paths
     project_root = str(server_dir.parent)
     if project_root not in sys.path:
         sys.path.insert(0, project_root)
     # Try again
-    from server.utils.json_utils import NpEncoder, format_error_response
     from server.utils.technique_utils import (
         SUPPORTED_TECHNIQUES, 
         TECHNIQUE_MODULE_MAP,
         is_supported_technique,
         import_technique_module
     )
+    from server.utils.dataset_cache import load_dataset, dataset_fingerprint
+    from server.utils.result_cache import cached_run
+    from server.utils.downsample import downsample_result
+    from server.utils.thread_budget import job_threads
+    from server.utils.preprocessing import dataset_scope
+    from server.utils.model_store import save_model_artifact, model_available, predict_rows, read_rows
+    from server.utils.profiling import run_profile, profile_stage, attach_profile, encode_result, export_profile
     
 # Attempt to import from the server module - this is for direct DB access
 try:
@@ -48,7 +59,11 @@ try:
         USE_DATABASE = False
 except ImportError:
     # Fallback if we can't import the storage
-    from server.api.upload import sessionData
+    try:
+        from server.api.upload import sessionData
+    except ImportError:
+        # Session data lives in the Node process when running as a worker
+        sessionData = {}
     USE_DATABASE = False
 
 def run_technique(technique, data_id, user_id, params=None):
@@ -83,9 +98,49 @@ def run_technique(technique, data_id, user_id, params=None):
     if not file_path or not os.path.exists(file_path):
         return {"error": "Dataset file not found"}
     
-    # Load the CSV file into a pandas DataFrame
+    # Identical runs on unchanged data are served from the result cache; the
+    # cache holds full-resolution charts and the point budget applies after
+    try:
+        # profile=cprofile,tracemalloc opts this run into heavier profiling;
+        # such runs bypass the result cache so there is a run to profile
+        params = params if params is not None else {}
+        options = params.pop("profile", None)
+        if options:
+            params["use_cache"] = 0
+        with run_profile(technique, options) as profile:
+            fingerprint = _memoized(lambda: dataset_fingerprint(file_path, dataset_id=data_id))
+            profile.cached = True
+
+            def compute():
+                profile.cached = False
+                result = _run_on_file(technique, file_path, data_id, params, schema_data, fingerprint)
+                # Fitted models go to the model store for later predictions
+                with profile_stage("save_model"):
+                    return save_model_artifact(technique, fingerprint, params, result)
+
+            result = cached_run(technique, fingerprint, params, compute, valid=model_available)
+            with profile_stage("downsample"):
+                result = downsample_result(result, params)
+        return attach_profile(result, profile)
+    except Exception as e:
+        return {"error": f"Error running technique: {str(e)}"}
+
+def _memoized(compute):
+    """Wrap a zero-argument callable so it runs at most once"""
+    value = []
+    def get():
+        if not value:
+            value.append(compute())
+        return value[0]
+    return get
+
+def _run_on_file(technique, file_path, data_id, params, schema_data=None, fingerprint=None):
+    """Load the dataset file and run the technique module on it"""
+    # Load the dataset, preferring the columnar artifact built at upload;
+    # otherwise read the CSV in chunks with the stored schema as dtype hints
     try:
-        df = pd.read_csv(file_path)
+        with profile_stage("load"):
+            df = load_dataset(file_path, dataset_id=data_id, dtypes=schema_data)
     except Exception as e:
         return {"error": f"Failed to read dataset file: {str(e)}"}
     
@@ -94,6 +149,7 @@ def run_technique(technique, data_id, user_id, params=None):
         "kmeans": "logic.kmeans",
         "isolation_forest": "logic.isolation_forest",
         "linear_regression": "logic.linear_regression",
+        "logistic_regression": "logic.logistic_regression",
         "random_forest_classifier": "logic.random_forest_classifier",
         "dbscan": "logic.dbscan",
         "ridge_regression": "logic.ridge_regression",
@@ -120,8 +176,12 @@ def run_technique(technique, data_id, user_id, params=None):
         if module_parts[0] == 'logic':
             # Try Python module first
             try:
-                python_module = __import__(f"server.{module_name}", fromlist=['run'])
-                result = python_module.run(df, params)
+                with profile_stage("import"):
+                    python_module = __import__(f"server.{module_name}", fromlist=['run'])
+                # Feature matrices built by the module are cached under the
+                # dataset's hash
+                with job_threads((params or {}).get("n_jobs")), dataset_scope(fingerprint), profile_stage("technique"):
+                    result = python_module.run(df, params)
                 return result
             except (ImportError, AttributeError) as e:
                 # Fall back to JavaScript implementation
@@ -136,4 +196,48 @@ def run_technique(technique, data_id, user_id, params=None):
         return {"error": "Invalid module path"}
         
     except Exception as e:
-        return {"error": f"Error running technique: {str(e)}"}
\ No newline at end of file
+        return {"error": f"Error running technique: {str(e)}"}
+
+def predict(model_id, rows, method=None):
+    """Serve new rows from a stored model"""
+    try:
+        if isinstance(rows, str):
+            rows = read_rows(rows)
+        return predict_rows(model_id, rows, method)
+    except Exception as e:
+        return {"error": f"Prediction error: {str(e)}", "model_id": model_id}
+
+def run_job(job):
+    """Run a job received by a worker process"""
+    if job.get("action") == "predict":
+        return predict(job["model_id"], job.get("rows_path") or job.get("rows") or [], job.get("method"))
+    return run_technique(job["technique"], job["data_id"], job.get("user_id"), job.get("params") or {})
+
+def preload_techniques():
+    """Import every supported technique module so the first job runs warm"""
+    for technique in SUPPORTED_TECHNIQUES:
+        try:
+            import_technique_module(technique)
+        except Exception as e:
+            # A broken module should only fail its own jobs, not the worker
+            print(f"Could not preload {technique}: {str(e)}", file=sys.stderr)
+
+if __name__ == "__main__":
+    # Worker mode: keep this interpreter warm and take jobs over stdin
+    if len(sys.argv) > 1 and sys.argv[1] == "--worker":
+        from server.utils.worker import serve, parse_worker_args
+        options = parse_worker_args(sys.argv[2:])
+        serve(run_job, preload=preload_techniques, **options)
+        sys.exit(0)
+
+    if len(sys.argv) < 4:
+        print(json.dumps({"error": "Usage: python run_model.py [technique] [data_id] [user_id] | predict [model_id] [rows_file] [method] | --worker [--max-jobs N] [--max-rss-mb M]"}))
+        sys.exit(1)
+
+    if sys.argv[1] == "predict":
+        result = predict(sys.argv[2], sys.argv[3], sys.argv[4] if len(sys.argv) > 4 else None)
+    else:
+        result = run_technique(sys.argv[1], sys.argv[2], sys.argv[3], {})
+    encoded, profile = encode_result(result)
+    print(encoded)
+    export_profile(profile, entry="cli")
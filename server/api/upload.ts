@@ -24,29 +24,11 @@ const upload = multer({
   }
 });
 
-// Python schema inference subprocess
+// Python schema inference subprocess: one streaming pass over the CSV, so
+// memory stays bounded however large the upload is
 const analyzeFileWithPython = (filePath: string): Promise<any> => {
   return new Promise((resolve, reject) => {
-    const pythonProcess = spawn('python', [
-      '-c',
-      `
-import pandas as pd, sys, json
-sys.path.append("${path.resolve('server/engine')}")
-from schema_infer import infer_schema
-
-try:
-    df = pd.read_csv("${filePath}")
-    schema = infer_schema(df)
-    print(json.dumps({
-        "success": True,
-        "rows": len(df),
-        "columns": len(df.columns),
-        "schema": schema
-    }))
-except Exception as e:
-    print(json.dumps({"success": False, "error": str(e)}))
-      `
-    ]);
+    const pythonProcess = spawn('python', [path.resolve('server/engine/schema_infer.py'), filePath]);
 
     let output = '';
     pythonProcess.stdout.on('data', (data) => output += data.toString());
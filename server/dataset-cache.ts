@@ -0,0 +1,101 @@
+import { spawn } from "child_process";
+import path from "path";
+import fs from "fs";
+
+// Columnar artifacts are built by server/utils/dataset_cache.py: one `.npy`
+// file per column plus a manifest, keyed by dataset id and content hash.
+// Technique runs load them with memory mapping instead of re-parsing the CSV.
+
+export function getColumnarCacheRoot(): string {
+  return process.env.BUMP_COLUMNAR_CACHE || path.join(process.cwd(), "uploads", ".columnar");
+}
+
+// Builds still running, by dataset id
+const inFlightBuilds = new Map<string, Promise<string | null>>();
+
+// Parse the uploaded CSV once into a columnar artifact. Resolves with the
+// artifact directory, or null if the build failed (runs then fall back to CSV).
+// Requests for a dataset whose build is already running share that build.
+export function buildColumnarArtifact(filePath: string, datasetId: number | string): Promise<string | null> {
+  const key = String(datasetId);
+  const running = inFlightBuilds.get(key);
+  if (running) return running;
+
+  const build = spawnColumnarBuild(filePath, datasetId)
+    .finally(() => inFlightBuilds.delete(key));
+  inFlightBuilds.set(key, build);
+  return build;
+}
+
+function spawnColumnarBuild(filePath: string, datasetId: number | string): Promise<string | null> {
+  return new Promise((resolve) => {
+    const pythonProcess = spawn("python", ["-m", "server.utils.dataset_cache", "build", filePath, String(datasetId)], {
+      cwd: process.cwd(),
+    });
+
+    let output = "";
+    pythonProcess.stdout.on("data", (data: Buffer) => (output += data.toString()));
+    pythonProcess.stderr.on("data", (data: Buffer) => console.error("[COLUMNAR CACHE]", data.toString()));
+    pythonProcess.on("close", () => {
+      try {
+        const result = JSON.parse(output.trim().split("\n").pop() || "");
+        if (!result.success) {
+          console.error(`Columnar artifact build failed for dataset ${datasetId}:`, result.error);
+          return resolve(null);
+        }
+        resolve(result.artifact);
+      } catch {
+        resolve(null);
+      }
+    });
+    pythonProcess.on("error", () => resolve(null));
+  });
+}
+
+// Return the artifact directory for a dataset if it exists and was built
+// from the current contents of `filePath`
+export function findColumnarArtifact(datasetId: number | string, filePath: string): string | null {
+  const root = getColumnarCacheRoot();
+  if (!fs.existsSync(root)) return null;
+
+  const candidates = fs.readdirSync(root)
+    .filter(name => name.startsWith(`${datasetId}-`))
+    .map(name => path.join(root, name))
+    .filter(dir => fs.existsSync(path.join(dir, "manifest.json")));
+
+  for (const dir of candidates) {
+    try {
+      const manifest = JSON.parse(fs.readFileSync(path.join(dir, "manifest.json"), "utf8"));
+      const stat = fs.statSync(filePath);
+      if (manifest.source_size === stat.size && manifest.source_mtime_ms === Math.floor(stat.mtimeMs)) {
+        return dir;
+      }
+    } catch {
+      continue;
+    }
+  }
+  return null;
+}
+
+// Column type hints for reading the raw CSV, taken from the dataset's stored
+// schema (per-column entries, or the `column_info` block written by
+// schema_infer.py). Columns whose type is still unknown are left to pandas.
+export function getDtypeHints(schemaData: string | null | undefined): Record<string, string> | null {
+  if (!schemaData) return null;
+  try {
+    const parsed = JSON.parse(schemaData);
+    const schema = parsed.column_info || parsed;
+    const hints: Record<string, string> = {};
+    for (const [column, info] of Object.entries<any>(schema)) {
+      let type = typeof info === "string" ? info : info?.type;
+      // Numeric columns are hinted with their parsed dtype so integers stay integers
+      if (type === "numeric" && info?.dtype) type = info.dtype;
+      if (type && type !== "unknown") {
+        hints[column] = String(type);
+      }
+    }
+    return Object.keys(hints).length ? hints : null;
+  } catch {
+    return null;
+  }
+}
@@ -0,0 +1,167 @@
+import { spawn, type ChildProcessWithoutNullStreams } from "child_process";
+import { EventEmitter } from "events";
+import { recordRunProfile } from "./metrics";
+
+// Client for the `run_model.py jobs` dispatcher (server/utils/job_queue.py).
+// The dispatcher keeps queued technique runs in SQLite, starts them as
+// separate processes in priority order, enforces their time and memory
+// limits and pushes every job event (status changes and the progress the
+// technique modules report) as a newline-delimited JSON line.
+
+export interface JobSubmission {
+  technique: string;
+  payload: Record<string, any>;
+  owner?: string | number;
+  priority?: number;
+  time_limit_s?: number;
+  memory_limit_mb?: number;
+}
+
+export interface JobEvent {
+  seq: number;
+  type: string;
+  status?: string;
+  [key: string]: any;
+}
+
+interface PendingCommand {
+  resolve: (value: any) => void;
+  reject: (reason: Error) => void;
+}
+
+export const TERMINAL_JOB_STATUSES = ["succeeded", "failed", "cancelled", "timeout"];
+
+export class JobQueueClient {
+  private process?: ChildProcessWithoutNullStreams;
+  private buffer = "";
+  private pending = new Map<number, PendingCommand>();
+  private nextId = 1;
+  private closed = false;
+  private events = new EventEmitter();
+
+  constructor(private script: string, private pythonBin = "python") {
+    // One listener per streaming client
+    this.events.setMaxListeners(0);
+    this.start();
+  }
+
+  submit(job: JobSubmission) {
+    return this.command({ type: "submit", ...job }).then(reply => reply.job);
+  }
+
+  get(jobId: string) {
+    return this.command({ type: "get", job_id: jobId }).then(reply => reply.job);
+  }
+
+  list(owner?: string | number, limit = 50) {
+    return this.command({ type: "list", owner, limit }).then(reply => reply.jobs);
+  }
+
+  eventsAfter(jobId: string, after = 0): Promise<JobEvent[]> {
+    return this.command({ type: "events", job_id: jobId, after }).then(reply => reply.events);
+  }
+
+  cancel(jobId: string) {
+    return this.command({ type: "cancel", job_id: jobId }).then(reply => reply.job);
+  }
+
+  stats() {
+    return this.command({ type: "stats" });
+  }
+
+  // Call listener with each new event of the job; returns the unsubscribe
+  subscribe(jobId: string, listener: (event: JobEvent) => void) {
+    this.events.on(jobId, listener);
+    return () => {
+      this.events.off(jobId, listener);
+    };
+  }
+
+  shutdown() {
+    this.closed = true;
+    this.process?.stdin.end(JSON.stringify({ type: "shutdown" }) + "\n");
+  }
+
+  private command(message: Record<string, any>): Promise<any> {
+    if (this.closed) {
+      return Promise.reject(new Error("Job queue is shut down"));
+    }
+    return new Promise((resolve, reject) => {
+      const id = this.nextId++;
+      this.pending.set(id, { resolve, reject });
+      this.process?.stdin.write(JSON.stringify({ ...message, id }) + "\n");
+    });
+  }
+
+  private start() {
+    const child = spawn(this.pythonBin, [this.script, "jobs"]);
+    this.process = child;
+    this.buffer = "";
+
+    child.stdout.on("data", (data: Buffer) => {
+      this.buffer += data.toString();
+      let newline;
+      while ((newline = this.buffer.indexOf("\n")) >= 0) {
+        const line = this.buffer.slice(0, newline).trim();
+        this.buffer = this.buffer.slice(newline + 1);
+        if (line) this.handleMessage(line);
+      }
+    });
+
+    child.stderr.on("data", (data: Buffer) => {
+      console.error(`[JOB QUEUE ${child.pid}]`, data.toString().trimEnd());
+    });
+
+    child.on("exit", (code) => {
+      for (const command of Array.from(this.pending.values())) {
+        command.reject(new Error(`Job dispatcher exited with code ${code}`));
+      }
+      this.pending.clear();
+      if (this.closed) return;
+      // Queued and interrupted jobs are picked up again by the new dispatcher
+      setTimeout(() => {
+        if (!this.closed) this.start();
+      }, code === 0 ? 0 : 1000);
+    });
+    child.on("error", (err) => {
+      console.error("Job dispatcher failed to start:", err);
+    });
+  }
+
+  private handleMessage(line: string) {
+    let message: any;
+    try {
+      message = JSON.parse(line);
+    } catch {
+      console.error("[JOB QUEUE] unframed output:", line);
+      return;
+    }
+
+    if (message.type === "event") {
+      const event = message.event || {};
+      if (event.type === "status" && event.profile) {
+        recordRunProfile(event.profile.technique, event.profile, "job");
+      }
+      this.events.emit(message.job_id, { seq: message.seq, ...event });
+    } else if (message.type === "reply") {
+      const command = this.pending.get(message.id);
+      if (!command) return;
+      this.pending.delete(message.id);
+      if (message.ok) {
+        command.resolve(message);
+      } else {
+        command.reject(new Error(message.error || "Job queue command failed"));
+      }
+    }
+  }
+}
+
+let sharedQueue: JobQueueClient | undefined;
+
+// Lazily start the process-wide dispatcher
+export function getJobQueue(script: string): JobQueueClient {
+  if (!sharedQueue) {
+    sharedQueue = new JobQueueClient(script);
+  }
+  return sharedQueue;
+}
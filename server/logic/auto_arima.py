@@ -1,9 +1,22 @@
+import os
 import pandas as pd
 import json
 import sys
 import numpy as np
 from datetime import datetime, timedelta
 
+try:
+    from server.utils.evaluation import forecast_cv
+except ImportError:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from server.utils.evaluation import forecast_cv
+
+def _forecast(y, periods):
+    """Placeholder forecast: recent level plus a small seasonal wave"""
+    window_size = min(5, len(y))
+    trend = np.mean(y[-window_size:])
+    return [trend + 0.1 * trend * np.sin(i/5) for i in range(periods)]
+
 def run(df: pd.DataFrame, params: dict = None):
     try:
         params = params or {}
@@ -65,12 +78,10 @@ def run(df: pd.DataFrame, params: dict = None):
             future_dates = list(range(len(y) + 1, len(y) + forecast_len + 1))
             
         # Simple forecast model (this is a placeholder - would use actual ARIMA in real implementation)
-        # Calculate trend using simple moving average
-        window_size = min(5, len(y))
-        trend = np.mean(y[-window_size:])
+        forecast = _forecast(y, forecast_len)
         
-        # Add some seasonality with a sine wave
-        forecast = [trend + 0.1 * trend * np.sin(i/5) for i in range(forecast_len)]
+        # Forecast accuracy over expanding windows of the sorted series
+        cv_stats, cv_folds = forecast_cv(lambda train, test: _forecast(y[train], len(test)), y, params)
         
         # Original data for plotting
         historical = [{"date": str(date), "value": float(val)} for date, val in zip(dates, y)]
@@ -86,9 +97,12 @@ def run(df: pd.DataFrame, params: dict = None):
             },
             "stats": {
                 "forecast_periods": forecast_len,
-                "mean_forecasted_value": round(float(np.mean(forecast)), 4)
+                "mean_forecasted_value": round(float(np.mean(forecast)), 4),
+                **cv_stats
+            },
+            "tables": {
+                "cv_folds": cv_folds
             },
-            "tables": {},
             "explanation": "Auto ARIMA automatically finds the optimal ARIMA model for time series forecasting. This implementation provides a simplified forecast."
         }
         
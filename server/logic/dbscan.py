@@ -1,7 +1,47 @@
+import os
+import numpy as np
 import pandas as pd
 import json
 import sys
-from sklearn.cluster import DBSCAN
+from sklearn.cluster import DBSCAN, OPTICS, cluster_optics_dbscan
+
+try:
+    from server.utils.cluster_quality import cluster_quality
+    from server.utils.neighbor_graph import radius_graph, filter_graph, feature_fingerprint
+    from server.utils.json_utils import NpEncoder, ColumnarRecords
+except ImportError:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from server.utils.cluster_quality import cluster_quality
+    from server.utils.neighbor_graph import radius_graph, filter_graph, feature_fingerprint
+    from server.utils.json_utils import NpEncoder, ColumnarRecords
+
+# The cached graph is built a little wider than the largest eps requested so
+# that nudging eps upwards on the next run can still reuse it
+GRAPH_RADIUS_HEADROOM = 1.5
+
+def _parse_list(value, cast):
+    """Accept a list or a comma-separated string of values"""
+    if value is None or value == "":
+        return []
+    if isinstance(value, str):
+        value = [v for v in value.split(",") if v.strip()]
+    elif not isinstance(value, (list, tuple)):
+        value = [value]
+    return [cast(v) for v in value]
+
+def _dbscan_on_graph(graph, eps, min_samples):
+    """Run DBSCAN on a precomputed radius graph restricted to eps"""
+    model = DBSCAN(eps=eps, min_samples=min_samples, metric="precomputed")
+    return model.fit_predict(filter_graph(graph, eps))
+
+def _summarize(labels, eps, min_samples):
+    labels = np.asarray(labels)
+    return {
+        "eps": float(eps),
+        "min_samples": int(min_samples),
+        "n_clusters": int(len(set(labels.tolist())) - (1 if -1 in labels else 0)),
+        "n_noise": int((labels == -1).sum())
+    }
 
 def run(df: pd.DataFrame, params: dict = None):
     try:
@@ -17,23 +57,62 @@ def run(df: pd.DataFrame, params: dict = None):
             }
 
         X = df[numeric_cols].dropna()
+        features = X.to_numpy(dtype=float)
+
+        eps = float(params.get("eps", 0.5))
+        min_samples = int(params.get("min_samples", 5))
+        eps_values = _parse_list(params.get("eps_values"), float)
+        min_samples_values = _parse_list(params.get("min_samples_values"), int) or [min_samples]
+        max_eps = max([eps] + eps_values)
+        sweep = []
+
+        if params.get("sweep_method") == "optics" and eps_values:
+            # One OPTICS pass orders the points by reachability; a DBSCAN-like
+            # clustering for any eps <= max_eps is then a linear-time cut
+            optics = OPTICS(min_samples=min_samples, max_eps=max_eps).fit(features)
+            cut = lambda e: cluster_optics_dbscan(
+                reachability=optics.reachability_,
+                core_distances=optics.core_distances_,
+                ordering=optics.ordering_,
+                eps=e
+            )
+            labels = cut(eps)
+            sweep = [_summarize(cut(e), e, min_samples) for e in eps_values]
+            neighbor_stats = {"sweep_method": "optics"}
+        else:
+            # Build or reuse one radius-neighbour graph covering every eps,
+            # then run each eps/min_samples combination on a filtered view
+            radius = max(float(params.get("cache_radius", max_eps * GRAPH_RADIUS_HEADROOM)), max_eps)
+            graph, graph_radius, cache_hit = radius_graph(
+                features, radius, key=feature_fingerprint(features, numeric_cols)
+            )
+            labels = _dbscan_on_graph(graph, eps, min_samples)
+            for e in eps_values:
+                for m in min_samples_values:
+                    sweep.append(_summarize(_dbscan_on_graph(graph, e, m), e, m))
+            neighbor_stats = {
+                "sweep_method": "neighbor_graph",
+                "neighbor_graph_cached": cache_hit,
+                "neighbor_graph_radius": float(graph_radius),
+                "neighbor_graph_edges": int(graph.nnz)
+            }
 
-        model = DBSCAN(
-            eps=params.get("eps", 0.5),
-            min_samples=params.get("min_samples", 5)
-        )
-        labels = model.fit_predict(X)
+        # Noise points are excluded from the quality metrics
+        quality = cluster_quality(X, labels)
 
         return {
             "charts": {
-                "cluster_labels": labels.tolist()
+                "cluster_labels": labels
             },
             "stats": {
                 "n_clusters": len(set(labels)) - (1 if -1 in labels else 0),
-                "n_noise": list(labels).count(-1)
+                "n_noise": list(labels).count(-1),
+                **quality,
+                **neighbor_stats
             },
             "tables": {
-                "cluster_assignments": [{"Index": i, "Cluster": int(label)} for i, label in enumerate(labels)]
+                "cluster_assignments": ColumnarRecords({"Index": np.arange(len(labels)), "Cluster": labels}),
+                "eps_sweep": sweep
             },
             "explanation": "DBSCAN clusters data based on density. It identifies core samples and expands clusters from them, treating outliers as noise."
         }
@@ -51,7 +130,7 @@ if __name__ == "__main__":
         file_path = sys.argv[1]
         df = pd.read_csv(file_path)
         result = run(df)
-        print(json.dumps(result))
+        print(json.dumps(result, cls=NpEncoder))
     except Exception as e:
         print(json.dumps({"error": str(e)}))
         sys.exit(1)
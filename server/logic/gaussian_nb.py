@@ -1,10 +1,23 @@
-import pandas as pd
-import json
+import os
 import sys
+import json
+import pandas as pd
 from sklearn.naive_bayes import GaussianNB
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, classification_report
 
+try:
+    from server.utils.model_store import model_artifact
+    from server.utils.evaluation import cross_validate
+    from server.utils.preprocessing import feature_matrix, missing_stats, DEFAULT_MISSING
+    from server.utils.profiling import profile_stage
+except ImportError:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from server.utils.model_store import model_artifact
+    from server.utils.evaluation import cross_validate
+    from server.utils.preprocessing import feature_matrix, missing_stats, DEFAULT_MISSING
+    from server.utils.profiling import profile_stage
+
 
 def run(df: pd.DataFrame, params: dict = None):
     try:
@@ -23,27 +36,44 @@ def run(df: pd.DataFrame, params: dict = None):
                 "GaussianNB requires one target and at least one numeric feature column."
             }
 
-        y = df[target_column] if target_column in df.columns else df[
-            numeric_cols[0]]
-        X = df[numeric_cols].drop(columns=[y.name])
+        features = feature_matrix(
+            df,
+            target=target_column if target_column in df.columns else numeric_cols[0],
+            missing=params.get('missing', DEFAULT_MISSING),
+            scaling=params.get('scaling'),
+            dtype=params.get('dtype', 'float64')
+        )
+        X, y = features.frame(), features.target()
 
         X_train, X_test, y_train, y_test = train_test_split(X,
                                                             y,
                                                             test_size=0.25,
                                                             random_state=42)
         model = GaussianNB()
-        model.fit(X_train, y_train)
+        with profile_stage("fit"):
+            model.fit(X_train, y_train)
         preds = model.predict(X_test)
 
+        cv_stats, cv_folds = cross_validate(model, X, y, "classification", params)
+
         return {
             "charts": {},
             "stats": {
-                "accuracy": round(accuracy_score(y_test, preds), 4)
+                "accuracy": round(accuracy_score(y_test, preds), 4),
+                **missing_stats(features),
+                **cv_stats
             },
             "tables": {
                 "classification_report":
-                classification_report(y_test, preds, output_dict=True)
+                classification_report(y_test, preds, output_dict=True),
+                "cv_folds": cv_folds
             },
+            "model_artifact":
+            model_artifact(features.pipeline(model),
+                           X.columns,
+                           target=y.name,
+                           methods=["predict", "predict_proba"],
+                           classes=model.classes_.tolist()),
             "explanation":
             "Gaussian Naive Bayes assumes normally distributed input features and applies Bayes' theorem for fast, interpretable classification."
         }
@@ -1,59 +1,104 @@
-        import pandas as pd
-        import json
-        import sys
-        from sklearn.ensemble import GradientBoostingClassifier
-        from sklearn.model_selection import train_test_split
-        from sklearn.metrics import accuracy_score, classification_report
-
-        def run(df: pd.DataFrame, params: dict = None):
-            try:
-                params = params or {}
-                target_column = params.get('target_column')
-
-                numeric_cols = df.select_dtypes(include='number').columns.tolist()
-                if len(numeric_cols) < 2:
-                    return {
-                        "charts": {},
-                        "stats": {"error": "At least 2 numeric columns required"},
-                        "tables": {},
-                        "explanation": "Gradient Boosting Classifier requires one target and at least one numeric feature column."
-                    }
-
-                y = df[target_column] if target_column in df.columns else df[numeric_cols[0]]
-                X = df[numeric_cols].drop(columns=[y.name])
-
-                X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42)
-                model = GradientBoostingClassifier()
+import os
+import pandas as pd
+import json
+import sys
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import accuracy_score, classification_report
+
+try:
+    from server.utils.boosting import (
+        resolve_engine, boosting_estimator, thread_limit, complete_rows, feature_importances,
+        DEFAULT_HIST_MIN_ROWS, DEFAULT_IMPORTANCE_SAMPLE
+    )
+    from server.utils.model_store import model_artifact
+    from server.utils.evaluation import cross_validate
+    from server.utils.profiling import profile_stage
+except ImportError:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from server.utils.boosting import (
+        resolve_engine, boosting_estimator, thread_limit, complete_rows, feature_importances,
+        DEFAULT_HIST_MIN_ROWS, DEFAULT_IMPORTANCE_SAMPLE
+    )
+    from server.utils.model_store import model_artifact
+    from server.utils.evaluation import cross_validate
+    from server.utils.profiling import profile_stage
+
+def run(df: pd.DataFrame, params: dict = None):
+    try:
+        params = params or {}
+        target_column = params.get('target_column')
+
+        numeric_cols = df.select_dtypes(include='number').columns.tolist()
+        if len(numeric_cols) < 2:
+            return {
+                "charts": {},
+                "stats": {"error": "At least 2 numeric columns required"},
+                "tables": {},
+                "explanation": "Gradient Boosting Classifier requires one target and at least one numeric feature column."
+            }
+
+        y = df[target_column] if target_column in df.columns else df[numeric_cols[0]]
+        X = df[numeric_cols].drop(columns=[y.name], errors="ignore")
+
+        engine = resolve_engine(len(df), params.get("engine", "auto"),
+                                int(params.get("hist_min_rows", DEFAULT_HIST_MIN_ROWS)))
+        mask = complete_rows(X, y, engine)
+        X, y = X[mask], y[mask]
+        random_state = int(params.get("random_state", 42))
+
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42)
+        model = boosting_estimator("classification", engine,
+                                   early_stopping=str(params.get("early_stopping", 1)).lower() not in ("0", "false", "no"),
+                                   random_state=random_state)
+        with thread_limit(params.get("n_threads")):
+            with profile_stage("fit"):
                 model.fit(X_train, y_train)
-                preds = model.predict(X_test)
-
-                return {
-                    "charts": {
-                        "feature_importances": dict(zip(X.columns, model.feature_importances_.tolist()))
-                    },
-                    "stats": {
-                        "accuracy": round(accuracy_score(y_test, preds), 4)
-                    },
-                    "tables": {
-                        "classification_report": classification_report(y_test, preds, output_dict=True)
-                    },
-                    "explanation": "Gradient Boosting Classifier builds an ensemble of shallow decision trees, each correcting the last. It's powerful and widely used in structured data competitions."
-                }
-
-            except Exception as e:
-                return {
-                    "charts": {},
-                    "stats": {"error": str(e)},
-                    "tables": {},
-                    "explanation": "An error occurred during model execution."
-                }
-
-        if __name__ == "__main__":
-            try:
-                file_path = sys.argv[1]
-                df = pd.read_csv(file_path)
-                result = run(df)
-                print(json.dumps(result))
-            except Exception as e:
-                print(json.dumps({"error": str(e)}))
-                sys.exit(1)
+            preds = model.predict(X_test)
+            importances, importance_method = feature_importances(
+                model, engine, X_test, y_test,
+                sample_size=int(params.get("importance_sample_size", DEFAULT_IMPORTANCE_SAMPLE)),
+                random_state=random_state
+            )
+
+        cv_stats, cv_folds = cross_validate(model, X, y, "classification", params)
+
+        return {
+            "charts": {
+                "feature_importances": importances
+            },
+            "stats": {
+                "accuracy": round(accuracy_score(y_test, preds), 4),
+                "engine": engine,
+                "n_iterations": int(model.n_iter_ if engine == "hist" else model.n_estimators_),
+                "rows_used": int(mask.sum()),
+                "importance_method": importance_method,
+                **cv_stats
+            },
+            "tables": {
+                "classification_report": classification_report(y_test, preds, output_dict=True, zero_division=0),
+                "cv_folds": cv_folds
+            },
+            "model_artifact": model_artifact(model, X.columns, target=y.name,
+                                             methods=["predict", "predict_proba"], classes=model.classes_.tolist()),
+            "explanation": "Gradient Boosting Classifier builds an ensemble of shallow decision trees, each correcting the last. It's powerful and widely used in structured data competitions."
+                           + (" The histogram-based engine was used: features are binned, missing values are handled natively, boosting stops early once a validation split stops improving, and importances are measured by permutation."
+                              if engine == "hist" else "")
+        }
+
+    except Exception as e:
+        return {
+            "charts": {},
+            "stats": {"error": str(e)},
+            "tables": {},
+            "explanation": "An error occurred during model execution."
+        }
+
+if __name__ == "__main__":
+    try:
+        file_path = sys.argv[1]
+        df = pd.read_csv(file_path)
+        result = run(df)
+        print(json.dumps(result))
+    except Exception as e:
+        print(json.dumps({"error": str(e)}))
+        sys.exit(1)
@@ -1,58 +1,105 @@
-        import pandas as pd
-        import json
-        import sys
-        from sklearn.ensemble import GradientBoostingRegressor
-        from sklearn.metrics import mean_squared_error, r2_score
-
-        def run(df: pd.DataFrame, params: dict = None):
-            try:
-                params = params or {}
-                target_column = params.get('target_column')
-
-                numeric_cols = df.select_dtypes(include='number').columns.tolist()
-                if len(numeric_cols) < 2:
-                    return {
-                        "charts": {},
-                        "stats": {"error": "At least 2 numeric columns required"},
-                        "tables": {},
-                        "explanation": "Gradient Boosting Regressor needs one target and at least one numeric feature column."
-                    }
-
-                y = df[target_column] if target_column in df.columns else df[numeric_cols[0]]
-                X = df[numeric_cols].drop(columns=[y.name])
-
-                model = GradientBoostingRegressor()
+import os
+import numpy as np
+import pandas as pd
+import json
+import sys
+from sklearn.metrics import mean_squared_error, r2_score
+
+try:
+    from server.utils.boosting import (
+        resolve_engine, boosting_estimator, thread_limit, complete_rows, feature_importances,
+        DEFAULT_HIST_MIN_ROWS, DEFAULT_IMPORTANCE_SAMPLE
+    )
+    from server.utils.model_store import model_artifact
+    from server.utils.evaluation import cross_validate
+    from server.utils.json_utils import NpEncoder
+    from server.utils.profiling import profile_stage
+except ImportError:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from server.utils.boosting import (
+        resolve_engine, boosting_estimator, thread_limit, complete_rows, feature_importances,
+        DEFAULT_HIST_MIN_ROWS, DEFAULT_IMPORTANCE_SAMPLE
+    )
+    from server.utils.model_store import model_artifact
+    from server.utils.evaluation import cross_validate
+    from server.utils.json_utils import NpEncoder
+    from server.utils.profiling import profile_stage
+
+def run(df: pd.DataFrame, params: dict = None):
+    try:
+        params = params or {}
+        target_column = params.get('target_column')
+
+        numeric_cols = df.select_dtypes(include='number').columns.tolist()
+        if len(numeric_cols) < 2:
+            return {
+                "charts": {},
+                "stats": {"error": "At least 2 numeric columns required"},
+                "tables": {},
+                "explanation": "Gradient Boosting Regressor needs one target and at least one numeric feature column."
+            }
+
+        y = df[target_column] if target_column in df.columns else df[numeric_cols[0]]
+        X = df[numeric_cols].drop(columns=[y.name], errors="ignore")
+
+        engine = resolve_engine(len(df), params.get("engine", "auto"),
+                                int(params.get("hist_min_rows", DEFAULT_HIST_MIN_ROWS)))
+        mask = complete_rows(X, y, engine)
+        X, y = X[mask], y[mask]
+        random_state = int(params.get("random_state", 42))
+
+        model = boosting_estimator("regression", engine,
+                                   early_stopping=str(params.get("early_stopping", 1)).lower() not in ("0", "false", "no"),
+                                   random_state=random_state)
+        with thread_limit(params.get("n_threads")):
+            with profile_stage("fit"):
                 model.fit(X, y)
-                preds = model.predict(X)
-
-                return {
-                    "charts": {
-                        "predicted_vs_actual": list(zip(preds.tolist(), y.tolist()))
-                    },
-                    "stats": {
-                        "r2": round(r2_score(y, preds), 4),
-                        "mse": round(mean_squared_error(y, preds), 4)
-                    },
-                    "tables": {
-                        "feature_importances": dict(zip(X.columns, model.feature_importances_.tolist()))
-                    },
-                    "explanation": "Gradient Boosting Regressor fits trees sequentially to correct previous errors, ideal for capturing complex patterns in numeric targets."
-                }
-
-            except Exception as e:
-                return {
-                    "charts": {},
-                    "stats": {"error": str(e)},
-                    "tables": {},
-                    "explanation": "An error occurred during model execution."
-                }
-
-        if __name__ == "__main__":
-            try:
-                file_path = sys.argv[1]
-                df = pd.read_csv(file_path)
-                result = run(df)
-                print(json.dumps(result))
-            except Exception as e:
-                print(json.dumps({"error": str(e)}))
-                sys.exit(1)
+            preds = model.predict(X)
+            importances, importance_method = feature_importances(
+                model, engine, X, y,
+                sample_size=int(params.get("importance_sample_size", DEFAULT_IMPORTANCE_SAMPLE)),
+                random_state=random_state
+            )
+
+        cv_stats, cv_folds = cross_validate(model, X, y, "regression", params)
+
+        return {
+            "charts": {
+                "predicted_vs_actual": np.column_stack((preds, y.to_numpy(dtype=float)))
+            },
+            "stats": {
+                "r2": round(r2_score(y, preds), 4),
+                "mse": round(mean_squared_error(y, preds), 4),
+                "engine": engine,
+                "n_iterations": int(model.n_iter_ if engine == "hist" else model.n_estimators_),
+                "rows_used": int(mask.sum()),
+                "importance_method": importance_method,
+                **cv_stats
+            },
+            "tables": {
+                "feature_importances": importances,
+                "cv_folds": cv_folds
+            },
+            "model_artifact": model_artifact(model, X.columns, target=y.name),
+            "explanation": "Gradient Boosting Regressor fits trees sequentially to correct previous errors, ideal for capturing complex patterns in numeric targets."
+                           + (" The histogram-based engine was used: features are binned, missing values are handled natively, boosting stops early once a validation split stops improving, and importances are measured by permutation."
+                              if engine == "hist" else "")
+        }
+
+    except Exception as e:
+        return {
+            "charts": {},
+            "stats": {"error": str(e)},
+            "tables": {},
+            "explanation": "An error occurred during model execution."
+        }
+
+if __name__ == "__main__":
+    try:
+        file_path = sys.argv[1]
+        df = pd.read_csv(file_path)
+        result = run(df)
+        print(json.dumps(result, cls=NpEncoder))
+    except Exception as e:
+        print(json.dumps({"error": str(e)}))
+        sys.exit(1)
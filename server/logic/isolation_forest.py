@@ -1,8 +1,69 @@
+import os
+import numpy as np
 import pandas as pd
 import json
 import sys
 from sklearn.ensemble import IsolationForest
 
+try:
+    from server.utils.json_utils import NpEncoder, ColumnarRecords
+    from server.utils.thread_budget import allotted_threads
+    from server.utils.anomaly_stream import score_appended, DEFAULT_CHUNK_ROWS, DEFAULT_REFIT_RATIO
+    from server.utils.model_store import model_artifact
+    from server.utils.profiling import profile_stage
+except ImportError:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from server.utils.json_utils import NpEncoder, ColumnarRecords
+    from server.utils.thread_budget import allotted_threads
+    from server.utils.anomaly_stream import score_appended, DEFAULT_CHUNK_ROWS, DEFAULT_REFIT_RATIO
+    from server.utils.model_store import model_artifact
+    from server.utils.profiling import profile_stage
+
+def run_incremental(df, numeric_cols, params):
+    """Score only the rows appended since the last run with the persisted forest"""
+    model_key = params.get("model_key")
+    if not model_key:
+        raise ValueError("Incremental mode needs a model_key identifying the dataset")
+
+    first_row, scores, labels, summary = score_appended(
+        model_key,
+        df,
+        columns=numeric_cols,
+        chunk_rows=int(params.get("chunk_rows", DEFAULT_CHUNK_ROWS)),
+        refit_ratio=float(params.get("refit_ratio", DEFAULT_REFIT_RATIO)),
+        contamination=float(params.get("contamination", 0.1))
+    )
+    # Like batch mode, rows with missing values are left out of the output
+    complete = ~np.isnan(scores)
+    rows = np.arange(first_row, first_row + len(scores))[complete]
+    scores, labels = scores[complete], labels[complete]
+
+    return {
+        "charts": {
+            "anomaly_scores": scores
+        },
+        "stats": {
+            "n_outliers": summary["n_outliers"],
+            "n_samples": len(labels),
+            "first_row": first_row,
+            "mode": "incremental",
+            "fitted": summary["fitted"],
+            "refit": summary["refit"],
+            "drift_psi": summary["drift_psi"],
+            "model": summary["model"]
+        },
+        "tables": {
+            "outliers": ColumnarRecords({"Index": rows, "Anomaly": labels})
+        },
+        "chart_hints": {
+            "anomaly_scores": {"kind": "series", "keep": np.flatnonzero(labels == -1)}
+        },
+        "explanation": "Isolation Forest isolates anomalies instead of profiling normal data. It is effective for unsupervised anomaly detection."
+                       + (f" Only the {len(labels)} rows added since the last run were scored with the saved forest."
+                          if not summary["fitted"] else " A forest was fitted and saved for scoring rows added later.")
+                       + (f" The forest was then refitted ({summary['refit'].replace('_', ' ')})." if summary["refit"] else "")
+    }
+
 def run(df: pd.DataFrame, params: dict = None):
     try:
         params = params or {}
@@ -16,24 +77,37 @@ def run(df: pd.DataFrame, params: dict = None):
                 "explanation": "Isolation Forest requires numeric input to identify outliers."
             }
 
+        if params.get("mode") == "incremental":
+            return run_incremental(df, numeric_cols, params)
+
         X = df[numeric_cols].dropna()
-        model = IsolationForest(contamination=params.get("contamination", 0.1), random_state=42)
-        model.fit(X)
+        model = IsolationForest(
+            contamination=params.get("contamination", 0.1),
+            n_jobs=allotted_threads(params.get("n_jobs")),
+            random_state=42
+        )
+        with profile_stage("fit"):
+            model.fit(X)
 
         scores = model.decision_function(X)
         labels = model.predict(X)  # -1 = anomaly, 1 = normal
 
         return {
             "charts": {
-                "anomaly_scores": scores.tolist()
+                "anomaly_scores": scores
             },
             "stats": {
                 "n_outliers": int((labels == -1).sum()),
                 "n_samples": len(labels)
             },
             "tables": {
-                "outliers": [{"Index": i, "Anomaly": int(label)} for i, label in enumerate(labels)]
+                "outliers": ColumnarRecords({"Index": np.arange(len(labels)), "Anomaly": labels})
+            },
+            "chart_hints": {
+                # Anomalies must survive chart downsampling
+                "anomaly_scores": {"kind": "series", "keep": np.flatnonzero(labels == -1)}
             },
+            "model_artifact": model_artifact(model, numeric_cols, methods=["predict", "decision_function"]),
             "explanation": "Isolation Forest isolates anomalies instead of profiling normal data. It is effective for unsupervised anomaly detection."
         }
 
@@ -50,7 +124,7 @@ if __name__ == "__main__":
         file_path = sys.argv[1]
         df = pd.read_csv(file_path)
         result = run(df)
-        print(json.dumps(result))
+        print(json.dumps(result, cls=NpEncoder))
     except Exception as e:
         print(json.dumps({"error": str(e)}))
         sys.exit(1)
@@ -1,49 +1,70 @@
-        import pandas as pd
-        import json
-        import sys
-        from sklearn.decomposition import KernelPCA
+import os
+import pandas as pd
+import json
+import sys
 
-        def run(df: pd.DataFrame, params: dict = None):
-            try:
-                params = params or {}
-                kernel = params.get("kernel", "rbf")
+try:
+    from server.utils.kernel_approx import (
+        kernel_pca_projection, DEFAULT_EXACT_MAX_ROWS, DEFAULT_LANDMARKS, DEFAULT_ERROR_SAMPLE
+    )
+    from server.utils.json_utils import NpEncoder
+except ImportError:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from server.utils.kernel_approx import (
+        kernel_pca_projection, DEFAULT_EXACT_MAX_ROWS, DEFAULT_LANDMARKS, DEFAULT_ERROR_SAMPLE
+    )
+    from server.utils.json_utils import NpEncoder
 
-                numeric_cols = df.select_dtypes(include='number').columns.tolist()
-                if len(numeric_cols) < 2:
-                    return {
-                        "charts": {},
-                        "stats": {"error": "At least 2 numeric columns required"},
-                        "tables": {},
-                        "explanation": "Kernel PCA requires multiple numeric features to perform projection."
-                    }
+def run(df: pd.DataFrame, params: dict = None):
+    try:
+        params = params or {}
+        kernel = params.get("kernel", "rbf")
 
-                X = df[numeric_cols].dropna()
-                kpca = KernelPCA(n_components=2, kernel=kernel)
-                transformed = kpca.fit_transform(X)
+        numeric_cols = df.select_dtypes(include='number').columns.tolist()
+        if len(numeric_cols) < 2:
+            return {
+                "charts": {},
+                "stats": {"error": "At least 2 numeric columns required"},
+                "tables": {},
+                "explanation": "Kernel PCA requires multiple numeric features to perform projection."
+            }
 
-                return {
-                    "charts": {
-                        "projection_2D": transformed.tolist()
-                    },
-                    "stats": {},
-                    "tables": {},
-                    "explanation": f"Kernel PCA reduces dimensionality using a {kernel.upper()} kernel, capturing non-linear patterns in the data."
-                }
+        X = df[numeric_cols].dropna()
+        transformed, info = kernel_pca_projection(
+            X.to_numpy(dtype=float),
+            kernel=kernel,
+            mode=params.get("mode", "auto"),
+            exact_max_rows=int(params.get("exact_max_rows", DEFAULT_EXACT_MAX_ROWS)),
+            approximation=params.get("approximation", "nystroem"),
+            n_landmarks=int(params.get("n_landmarks", DEFAULT_LANDMARKS)),
+            error_sample_size=int(params.get("error_sample_size", DEFAULT_ERROR_SAMPLE))
+        )
 
-            except Exception as e:
-                return {
-                    "charts": {},
-                    "stats": {"error": str(e)},
-                    "tables": {},
-                    "explanation": "An error occurred during Kernel PCA dimensionality reduction."
-                }
+        return {
+            "charts": {
+                "projection_2D": transformed
+            },
+            "stats": info,
+            "tables": {},
+            "explanation": f"Kernel PCA reduces dimensionality using a {kernel.upper()} kernel, capturing non-linear patterns in the data."
+                           + (f" The kernel was approximated with {info['n_landmarks']} {'landmarks' if info['approximation'] == 'nystroem' else 'random Fourier features'} because the dataset is too large for an exact kernel matrix."
+                              if info["mode"] == "approximate" else "")
+        }
 
-        if __name__ == "__main__":
-            try:
-                file_path = sys.argv[1]
-                df = pd.read_csv(file_path)
-                result = run(df)
-                print(json.dumps(result))
-            except Exception as e:
-                print(json.dumps({"error": str(e)}))
-                sys.exit(1)
+    except Exception as e:
+        return {
+            "charts": {},
+            "stats": {"error": str(e)},
+            "tables": {},
+            "explanation": "An error occurred during Kernel PCA dimensionality reduction."
+        }
+
+if __name__ == "__main__":
+    try:
+        file_path = sys.argv[1]
+        df = pd.read_csv(file_path)
+        result = run(df)
+        print(json.dumps(result, cls=NpEncoder))
+    except Exception as e:
+        print(json.dumps({"error": str(e)}))
+        sys.exit(1)
@@ -1,10 +1,245 @@
 #!/usr/bin/env python3
+import os
 import sys
 import json
 import numpy as np
 import pandas as pd
-from sklearn.cluster import KMeans
-from sklearn.metrics import silhouette_score
+from concurrent.futures import ThreadPoolExecutor
+from threadpoolctl import threadpool_limits
+from sklearn.cluster import KMeans, MiniBatchKMeans, kmeans_plusplus
+from sklearn.metrics import pairwise_distances, silhouette_score
+
+try:
+    from server.utils.cluster_quality import cluster_quality
+    from server.utils.json_utils import NpEncoder, ColumnarRecords
+    from server.utils.model_store import model_artifact
+    from server.utils.thread_budget import allotted_threads
+    from server.utils.progress import progress_counter
+    from server.utils.preprocessing import feature_matrix, missing_stats, DEFAULT_MISSING
+    from server.utils.profiling import profile_stage
+except ImportError:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from server.utils.cluster_quality import cluster_quality
+    from server.utils.json_utils import NpEncoder, ColumnarRecords
+    from server.utils.model_store import model_artifact
+    from server.utils.thread_budget import allotted_threads
+    from server.utils.progress import progress_counter
+    from server.utils.preprocessing import feature_matrix, missing_stats, DEFAULT_MISSING
+    from server.utils.profiling import profile_stage
+
+# Above this many rows the O(n^2) exact silhouette and full-batch Lloyd
+# iterations dominate the runtime, so switch to the mini-batch mode
+MINIBATCH_ROW_THRESHOLD = 100_000
+DEFAULT_CHUNK_SIZE = 10_000
+DEFAULT_SILHOUETTE_SAMPLE = 10_000
+DEFAULT_SWEEP_K = (2, 10)
+# Every k of a sweep is scored on one sample whose distance matrix is
+# computed once, so its size is bounded by that matrix (n^2 floats)
+SWEEP_SILHOUETTE_SAMPLE = 2_000
+
+def _chunks(X, chunk_size, rng=None):
+    """Yield row chunks of a DataFrame as float arrays, optionally in random order"""
+    starts = np.arange(0, len(X), chunk_size)
+    if rng is not None:
+        rng.shuffle(starts)
+    for start in starts:
+        yield X.iloc[start:start + chunk_size].to_numpy(dtype=float)
+
+def _fit_minibatch(X, n_clusters, chunk_size, epochs, init=None):
+    """
+    Fit mini-batch k-means by streaming the rows in chunks.
+
+    Only one chunk is materialised as a dense array at a time, so memory
+    stays bounded by the chunk size rather than the dataset size.
+    """
+    rng = np.random.default_rng(42)
+
+    # Seed the centroids with k-means++ on a random sample so that sorted or
+    # grouped files do not initialise every centroid from the first chunk
+    if init is None:
+        sample = rng.choice(len(X), min(len(X), max(chunk_size, 10 * n_clusters)), replace=False)
+        init, _ = kmeans_plusplus(X.iloc[np.sort(sample)].to_numpy(dtype=float), n_clusters, random_state=42)
+
+    kmeans = MiniBatchKMeans(n_clusters=n_clusters, init=init, n_init=1, random_state=42, batch_size=chunk_size)
+    for _ in range(epochs):
+        for chunk in _chunks(X, chunk_size, rng):
+            kmeans.partial_fit(chunk)
+
+    labels = np.empty(len(X), dtype=np.int32)
+    inertia = 0.0
+    offset = 0
+    for chunk in _chunks(X, chunk_size):
+        labels[offset:offset + len(chunk)] = kmeans.predict(chunk)
+        inertia += -kmeans.score(chunk)
+        offset += len(chunk)
+    return kmeans, labels, inertia
+
+def _parse_k_values(params):
+    """k values from `k_values` (list or "2,3,5") or `k_min`..`k_max`"""
+    value = params.get('k_values')
+    if isinstance(value, str):
+        value = [v for v in value.split(',') if v.strip()]
+    elif value is not None and not isinstance(value, (list, tuple)):
+        value = [value]
+    if value:
+        return sorted({int(v) for v in value})
+    if params.get('k_max') is not None:
+        return list(range(int(params.get('k_min', DEFAULT_SWEEP_K[0])), int(params['k_max']) + 1))
+    return []
+
+def _grow_centers(X, centers, k, rng):
+    """
+    Extend a fitted solution to k centers with greedy k-means++: each new
+    center is the candidate, sampled by squared distance, that lowers the
+    inertia most
+    """
+    d2 = pairwise_distances(X, centers, metric='sqeuclidean').min(axis=1)
+    centers = list(centers)
+    n_candidates = 2 + int(np.log(k))
+    while len(centers) < k:
+        total = d2.sum()
+        if total > 0:
+            candidates = rng.choice(len(X), n_candidates, p=d2 / total)
+        else:
+            candidates = rng.integers(len(X), size=n_candidates)
+        options = np.minimum(d2, pairwise_distances(X[candidates], X, metric='sqeuclidean'))
+        best = int(np.argmin(options.sum(axis=1)))
+        centers.append(X[candidates[best]])
+        d2 = options[best]
+    return np.asarray(centers)
+
+def _sweep_block(X, k_values, minibatch, chunk_size, sample, distances, step):
+    """
+    Fit consecutive k values, seeding each from the previous solution, and
+    score them on the shared silhouette sample
+    """
+    rng = np.random.default_rng(42 + k_values[0])
+    fits = []
+    previous = None
+    for k in k_values:
+        init = _grow_centers(X, previous.cluster_centers_, k, rng) if previous is not None else None
+        if minibatch:
+            model = MiniBatchKMeans(n_clusters=k, random_state=42, batch_size=chunk_size,
+                                    **({'init': init, 'n_init': 1} if init is not None else {}))
+        else:
+            model = KMeans(n_clusters=k, random_state=42,
+                           **({'init': init, 'n_init': 1} if init is not None else {}))
+        model.fit(X)
+        sample_labels = model.labels_[sample]
+        n_labels = len(np.unique(sample_labels))
+        silhouette = (float(silhouette_score(distances, sample_labels, metric='precomputed'))
+                      if 1 < n_labels < len(sample) else None)
+        fits.append((model, {
+            "k": int(k),
+            "inertia": float(model.inertia_),
+            "silhouette_score": silhouette,
+            "iterations": int(model.n_iter_),
+            "warm_started": init is not None
+        }))
+        step(k=int(k))
+        previous = model
+    return fits
+
+def _elbow(k_values, inertias):
+    """
+    The k where the inertia curve bends most: the point furthest below the
+    straight line from its first to its last point, both axes normalised
+    """
+    if len(k_values) < 3:
+        return None
+    x = (np.asarray(k_values, dtype=float) - k_values[0]) / (k_values[-1] - k_values[0])
+    y = np.asarray(inertias, dtype=float)
+    span = y[0] - y[-1]
+    if span <= 0:
+        return None
+    y = (y - y[-1]) / span
+    return int(k_values[int(np.argmax((1 - x) - y))])
+
+def run_sweep(df, params, k_values):
+    """
+    Fit every k in one job and recommend one from the elbow of the inertia
+    curve (or, with fewer than three k values, the best silhouette).
+
+    The feature matrix is built once; k values are split into contiguous
+    blocks fitted in parallel threads, and within a block each k starts from
+    the previous k's centroids plus new ones sampled k-means++ style. The
+    returned clustering is the recommended k's fit, so nothing is refitted.
+    """
+    features = feature_matrix(
+        df,
+        missing=params.get('missing', DEFAULT_MISSING),
+        dtype=params.get('dtype', 'float64')
+    )
+    X = features.X
+    if X.shape[1] == 0 or len(X) == 0:
+        return {"error": "No numeric data available for clustering"}
+    k_values = [k for k in k_values if 1 <= k <= len(X)]
+    if not k_values:
+        return {"error": "No valid k values for the number of rows"}
+
+    mode = params.get('mode', 'auto')
+    if mode not in ('full', 'minibatch'):
+        mode = 'minibatch' if len(X) > int(params.get('minibatch_threshold', MINIBATCH_ROW_THRESHOLD)) else 'full'
+    rng = np.random.default_rng(42)
+    sample_size = min(len(X), int(params.get('silhouette_sample_size', SWEEP_SILHOUETTE_SAMPLE)))
+    sample = np.sort(rng.choice(len(X), sample_size, replace=False))
+    distances = pairwise_distances(X[sample])
+
+    # One thread per block; Lloyd iterations release the GIL, so each block
+    # runs single-threaded instead of competing for OpenMP threads
+    blocks = [list(b) for b in np.array_split(k_values, min(len(k_values), allotted_threads(params.get('n_jobs'))))]
+    args = (mode == 'minibatch', int(params.get('chunk_size', DEFAULT_CHUNK_SIZE)), sample, distances,
+            progress_counter("k_sweep", len(k_values)))
+    if len(blocks) == 1:
+        fits = _sweep_block(X, blocks[0], *args)
+    else:
+        with threadpool_limits(limits=1), ThreadPoolExecutor(max_workers=len(blocks)) as pool:
+            fits = [fit for block in pool.map(lambda b: _sweep_block(X, b, *args), blocks) for fit in block]
+
+    sweep = [row for _, row in fits]
+    elbow_k = _elbow([r["k"] for r in sweep], [r["inertia"] for r in sweep])
+    scored = [r for r in sweep if r["silhouette_score"] is not None]
+    silhouette_k = max(scored, key=lambda r: r["silhouette_score"])["k"] if scored else None
+    recommended_k = elbow_k or silhouette_k or sweep[0]["k"]
+    kmeans = next(model for model, row in fits if row["k"] == recommended_k)
+    labels = kmeans.labels_
+
+    quality = cluster_quality(
+        X,
+        labels,
+        sample_size=int(params.get('silhouette_sample_size', DEFAULT_SILHOUETTE_SAMPLE)),
+        silhouette_method='sampled' if mode == 'minibatch' else 'auto'
+    )
+    frame = features.frame()
+    return {
+        "data": ColumnarRecords.from_frame(frame),
+        "labels": np.asarray(labels),
+        "centroids": kmeans.cluster_centers_.tolist(),
+        "charts": {
+            "elbow": [[r["k"], r["inertia"]] for r in sweep],
+            "silhouette": [[r["k"], r["silhouette_score"]] for r in scored]
+        },
+        "stats": {
+            "inertia": float(kmeans.inertia_),
+            **quality,
+            "silhouette_score": float(quality["silhouette_score"] or 0),
+            "iterations": int(kmeans.n_iter_),
+            "mode": "sweep",
+            "fit_mode": mode,
+            "recommended_k": int(recommended_k),
+            "elbow_k": elbow_k,
+            "silhouette_k": silhouette_k,
+            "sweep_silhouette_sample_size": int(sample_size),
+            **missing_stats(features)
+        },
+        "tables": {
+            "k_sweep": sweep
+        },
+        "model_artifact": model_artifact(features.pipeline(kmeans), frame.columns, methods=["predict", "transform"]),
+        "explanation": f"KMeans was fitted for k = {', '.join(str(r['k']) for r in sweep)} on {len(X)} data points; "
+                       f"k = {recommended_k} is recommended "
+                       + ("where the inertia curve bends (elbow)." if elbow_k else "by the best silhouette score.")
+    }
 
 def run(df, params=None):
     """
@@ -21,7 +256,13 @@ def run(df, params=None):
     if params is None:
         params = {}
     
-    n_clusters = params.get('n_clusters', 3)
+    n_clusters = int(params.get('n_clusters', 3))
+    mode = params.get('mode', 'auto')
+    chunk_size = int(params.get('chunk_size', DEFAULT_CHUNK_SIZE))
+    silhouette_sample = int(params.get('silhouette_sample_size', DEFAULT_SILHOUETTE_SAMPLE))
+    # Optional starting centroids (e.g. from a fit on a subsample); one
+    # initialisation from them replaces the k-means++ restarts
+    init = params.get('init')
     
     # Convert input to DataFrame if it's not already
     if not isinstance(df, pd.DataFrame):
@@ -30,41 +271,72 @@ def run(df, params=None):
         else:
             return {"error": "Input data must be a DataFrame or list of dictionaries"}
     
-    # Get only numeric columns
-    X = df.select_dtypes(include='number')
+    # Sweep mode: fit a range of k in one job and recommend one
+    k_values = _parse_k_values(params)
+    if k_values or mode == 'sweep':
+        return run_sweep(df, params, k_values or list(range(DEFAULT_SWEEP_K[0], DEFAULT_SWEEP_K[1] + 1)))
+    
+    # Numeric columns, with missing values dropped or imputed as the sweep does
+    features = feature_matrix(
+        df,
+        missing=params.get('missing', DEFAULT_MISSING),
+        dtype=params.get('dtype', 'float64')
+    )
+    X = features.frame()
     
     if X.empty:
         return {"error": "No numeric data available for clustering"}
     
-    # Extract features
-    features = X.values
+    if init is not None:
+        init = np.asarray(init, dtype=float)
+        if init.shape != (n_clusters, X.shape[1]):
+            init = None
     
-    # Run KMeans
-    kmeans = KMeans(n_clusters=n_clusters, random_state=42)
-    labels = kmeans.fit_predict(features)
+    if mode == 'auto':
+        mode = 'minibatch' if len(X) > int(params.get('minibatch_threshold', MINIBATCH_ROW_THRESHOLD)) else 'full'
     
-    # Calculate silhouette score
-    silhouette = 0
-    if n_clusters > 1 and n_clusters < len(features):
-        try:
-            silhouette = silhouette_score(features, labels)
-        except:
-            silhouette = 0
+    if mode == 'minibatch':
+        # Scalable mode: stream chunks through mini-batch k-means
+        kmeans, labels, inertia = _fit_minibatch(X, n_clusters, chunk_size, int(params.get('epochs', 3)), init)
+        iterations = int(kmeans.n_steps_)
+    else:
+        # Run KMeans
+        kmeans = KMeans(n_clusters=n_clusters, random_state=42,
+                        **({'init': init, 'n_init': 1} if init is not None else {}))
+        with profile_stage("fit"):
+            labels = kmeans.fit_predict(features.X)
+        inertia = kmeans.inertia_
+        iterations = int(kmeans.n_iter_)
     
-    # Convert data for result
-    data_list = X.to_dict('records')
+    # Cluster quality within a bounded memory budget; the scalable mode
+    # always estimates the silhouette on a fixed-size sample
+    quality = cluster_quality(
+        features.X,
+        labels,
+        sample_size=silhouette_sample,
+        silhouette_method='sampled' if mode == 'minibatch' else 'auto'
+    )
     
+    # Per-row output stays columnar so large results can travel as binary
+    # buffers; it still serialises to the same JSON records
     # Format results
     result = {
-        "data": data_list,
-        "labels": labels.tolist(),
+        "data": ColumnarRecords.from_frame(X),
+        "labels": np.asarray(labels),
         "centroids": kmeans.cluster_centers_.tolist(),
         "stats": {
-            "inertia": float(kmeans.inertia_),
-            "silhouette_score": float(silhouette),
-            "iterations": int(kmeans.n_iter_)
+            "inertia": float(inertia),
+            **quality,
+            "silhouette_score": float(quality["silhouette_score"] or 0),
+            "iterations": iterations,
+            "mode": mode,
+            **missing_stats(features)
         },
-        "explanation": f"KMeans clustering with {n_clusters} clusters applied to {len(data_list)} data points with {X.shape[1]} features."
+        # New rows are assigned to the nearest fitted centroid, after the
+        # same imputation as the training rows
+        "model_artifact": model_artifact(features.pipeline(kmeans), X.columns, methods=["predict", "transform"]),
+        "explanation": f"KMeans clustering with {n_clusters} clusters applied to {len(X)} data points with {X.shape[1]} features."
+                       + (" Mini-batch k-means was used because of the dataset size." if mode == 'minibatch' else "")
     }
     
     return result
@@ -96,7 +368,7 @@ if __name__ == "__main__":
         result = run(df, {'n_clusters': n_clusters})
         
         # Print result as JSON
-        print(json.dumps(result))
+        print(json.dumps(result, cls=NpEncoder))
     except Exception as e:
         print(json.dumps({"error": str(e)}))
         sys.exit(1)
\ No newline at end of file
@@ -1,9 +1,22 @@
-import pandas as pd
-import json
+import os
 import sys
+import json
+import pandas as pd
 from sklearn.linear_model import Lasso
 from sklearn.metrics import r2_score, mean_squared_error
 
+try:
+    from server.utils.model_store import model_artifact
+    from server.utils.evaluation import cross_validate
+    from server.utils.preprocessing import feature_matrix, missing_stats, DEFAULT_MISSING
+    from server.utils.profiling import profile_stage
+except ImportError:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from server.utils.model_store import model_artifact
+    from server.utils.evaluation import cross_validate
+    from server.utils.preprocessing import feature_matrix, missing_stats, DEFAULT_MISSING
+    from server.utils.profiling import profile_stage
+
 def run(df: pd.DataFrame, params: dict = None):
     try:
         params = params or {}
@@ -18,24 +31,37 @@ def run(df: pd.DataFrame, params: dict = None):
                 "explanation": "Lasso Regression requires one target and at least one feature column."
             }
 
-        y = df[target_column] if target_column in df.columns else df[numeric_cols[0]]
-        X = df[numeric_cols].drop(columns=[y.name])
+        features = feature_matrix(
+            df,
+            target=target_column if target_column in df.columns else numeric_cols[0],
+            missing=params.get('missing', DEFAULT_MISSING),
+            scaling=params.get('scaling'),
+            dtype=params.get('dtype', 'float64')
+        )
+        X, y = features.frame(), features.target()
 
         model = Lasso(alpha=params.get("alpha", 1.0))
-        model.fit(X, y)
+        with profile_stage("fit"):
+            model.fit(X, y)
         preds = model.predict(X)
 
+        cv_stats, cv_folds = cross_validate(model, X, y, "regression", params)
+
         return {
             "charts": {
                 "predicted_vs_actual": list(zip(preds.tolist(), y.tolist()))
             },
             "stats": {
                 "r2": round(r2_score(y, preds), 4),
-                "mse": round(mean_squared_error(y, preds), 4)
+                "mse": round(mean_squared_error(y, preds), 4),
+                **missing_stats(features),
+                **cv_stats
             },
             "tables": {
-                "coefficients": dict(zip(X.columns, model.coef_.tolist()))
+                "coefficients": dict(zip(X.columns, model.coef_.tolist())),
+                "cv_folds": cv_folds
             },
+            "model_artifact": model_artifact(features.pipeline(model), X.columns, target=y.name),
             "explanation": "Lasso Regression adds L1 regularization which can zero out less important features, improving interpretability."
         }
 
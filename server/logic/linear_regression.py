@@ -1,9 +1,23 @@
-import pandas as pd
-import json
+import os
 import sys
+import json
+import numpy as np
+import pandas as pd
 from sklearn.linear_model import LinearRegression
 from sklearn.metrics import r2_score, mean_squared_error
 
+try:
+    from server.utils.model_store import model_artifact
+    from server.utils.evaluation import cross_validate
+    from server.utils.preprocessing import feature_matrix, missing_stats, DEFAULT_MISSING
+    from server.utils.profiling import profile_stage
+except ImportError:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from server.utils.model_store import model_artifact
+    from server.utils.evaluation import cross_validate
+    from server.utils.preprocessing import feature_matrix, missing_stats, DEFAULT_MISSING
+    from server.utils.profiling import profile_stage
+
 def run(df: pd.DataFrame, params: dict = None):
     try:
         params = params or {}
@@ -20,13 +34,25 @@ def run(df: pd.DataFrame, params: dict = None):
                 "explanation": "Linear Regression needs one target and at least one feature column."
             }
 
-        # Handle target column selection
-        y = df[target_column] if target_column in df.columns else df[numeric_cols[0]]
-        X = df[numeric_cols].drop(columns=[y.name])
+        # Handle target column selection; missing feature values are imputed
+        # (or dropped) once per dataset in the shared preprocessing layer
+        features = feature_matrix(
+            df,
+            target=target_column if target_column in df.columns else numeric_cols[0],
+            missing=params.get('missing', DEFAULT_MISSING),
+            scaling=params.get('scaling'),
+            dtype=params.get('dtype', 'float64')
+        )
+        X, y = features.frame(), features.target()
 
         model = LinearRegression()
-        model.fit(X, y)
+        with profile_stage("fit"):
+            model.fit(X, y)
         preds = model.predict(X)
+        residuals = np.abs(y.to_numpy() - preds)
+        residual_cutoff = np.nanmean(residuals) + 3 * np.nanstd(residuals)
+
+        cv_stats, cv_folds = cross_validate(model, X, y, "regression", params)
 
         return {
             "charts": {
@@ -34,11 +60,19 @@ def run(df: pd.DataFrame, params: dict = None):
             },
             "stats": {
                 "r2": round(r2_score(y, preds), 4),
-                "mse": round(mean_squared_error(y, preds), 4)
+                "mse": round(mean_squared_error(y, preds), 4),
+                **missing_stats(features),
+                **cv_stats
             },
             "tables": {
-                "coefficients": dict(zip(X.columns, model.coef_.tolist()))
+                "coefficients": dict(zip(X.columns, model.coef_.tolist())),
+                "cv_folds": cv_folds
+            },
+            "chart_hints": {
+                # Points far off the fit must survive chart downsampling
+                "predicted_vs_actual": {"kind": "scatter", "keep": np.flatnonzero(residuals > residual_cutoff).tolist()}
             },
+            "model_artifact": model_artifact(features.pipeline(model), X.columns, target=y.name),
             "explanation": "Linear Regression models the linear relationship between the target variable and one or more features."
         }
 
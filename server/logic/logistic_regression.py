@@ -1,11 +1,24 @@
-import pandas as pd
-import json
+import os
 import sys
+import json
 import numpy as np
+import pandas as pd
 from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import classification_report, accuracy_score
 from sklearn.preprocessing import LabelEncoder
 
+try:
+    from server.utils.model_store import model_artifact
+    from server.utils.evaluation import cross_validate
+    from server.utils.preprocessing import feature_matrix, missing_stats, DEFAULT_MISSING
+    from server.utils.profiling import profile_stage
+except ImportError:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from server.utils.model_store import model_artifact
+    from server.utils.evaluation import cross_validate
+    from server.utils.preprocessing import feature_matrix, missing_stats, DEFAULT_MISSING
+    from server.utils.profiling import profile_stage
+
 def run(df: pd.DataFrame, params: dict = None):
     try:
         params = params or {}
@@ -23,8 +36,14 @@ def run(df: pd.DataFrame, params: dict = None):
             }
             
         # Handle target column selection
-        y = df[target_column] if target_column and target_column in df.columns else df[numeric_cols[0]]
-        X = df[numeric_cols].drop(columns=[y.name])
+        features = feature_matrix(
+            df,
+            target=target_column if target_column and target_column in df.columns else numeric_cols[0],
+            missing=params.get('missing', DEFAULT_MISSING),
+            scaling=params.get('scaling'),
+            dtype=params.get('dtype', 'float64')
+        )
+        X, y = features.frame(), features.target()
         
         # Encode target if needed
         encoder = None
@@ -33,27 +52,39 @@ def run(df: pd.DataFrame, params: dict = None):
             y = encoder.fit_transform(y)
             
         model = LogisticRegression(random_state=42, max_iter=1000)
-        model.fit(X, y)
+        with profile_stage("fit"):
+            model.fit(X, y)
         y_pred = model.predict(X)
         
         # Generate class report
-        report = classification_report(y, y_pred, output_dict=True)
+        with profile_stage("metrics"):
+            report = classification_report(y, y_pred, output_dict=True)
         
         feature_importance = dict(zip(X.columns, np.abs(model.coef_[0])))
         top_features = dict(sorted(feature_importance.items(), key=lambda x: x[1], reverse=True)[:5])
         
+        cv_stats, cv_folds = cross_validate(model, X, y, "classification", params)
+
         return {
             "charts": {},
             "stats": {
                 "accuracy": round(accuracy_score(y, y_pred), 4),
                 "precision": round(report['weighted avg']['precision'], 4),
                 "recall": round(report['weighted avg']['recall'], 4),
-                "f1": round(report['weighted avg']['f1-score'], 4)
+                "f1": round(report['weighted avg']['f1-score'], 4),
+                **missing_stats(features),
+                **cv_stats
             },
             "tables": {
                 "feature_importance": top_features,
-                "classification_report": report
+                "classification_report": report,
+                "cv_folds": cv_folds
             },
+            # Predictions are class codes when the target was label-encoded;
+            # `classes` maps them back
+            "model_artifact": model_artifact(features.pipeline(model), X.columns, target=y.name if encoder is None else target_column,
+                                             methods=["predict", "predict_proba"],
+                                             classes=(encoder or model).classes_.tolist()),
             "explanation": "Logistic Regression is used for binary classification problems. It models the probability of an outcome using the logistic function."
         }
         
@@ -1,3 +1,4 @@
+import os
 import pandas as pd
 import json
 import sys
@@ -6,6 +7,14 @@ from sklearn.naive_bayes import GaussianNB
 from sklearn.metrics import classification_report, accuracy_score
 from sklearn.preprocessing import LabelEncoder
 
+try:
+    from server.utils.evaluation import cross_validate
+    from server.utils.profiling import profile_stage
+except ImportError:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from server.utils.evaluation import cross_validate
+    from server.utils.profiling import profile_stage
+
 def run(df: pd.DataFrame, params: dict = None):
     try:
         params = params or {}
@@ -33,11 +42,17 @@ def run(df: pd.DataFrame, params: dict = None):
             y = encoder.fit_transform(y)
             
         model = GaussianNB()
-        model.fit(X, y)
+        with profile_stage("fit"):
+            model.fit(X, y)
         y_pred = model.predict(X)
         
+        # The metrics above are on the training rows; cross-validation
+        # reports how the model does on rows it was not fitted on
+        cv_stats, cv_folds = cross_validate(model, X, y, "classification", params)
+        
         # Generate class report
-        report = classification_report(y, y_pred, output_dict=True)
+        with profile_stage("metrics"):
+            report = classification_report(y, y_pred, output_dict=True)
         
         # Get class priors and class counts
         class_priors = dict(enumerate(model.class_prior_))
@@ -54,9 +69,12 @@ def run(df: pd.DataFrame, params: dict = None):
                 "precision": round(report['weighted avg']['precision'], 4),
                 "recall": round(report['weighted avg']['recall'], 4),
                 "f1": round(report['weighted avg']['f1-score'], 4),
-                "class_priors": class_priors
+                "class_priors": class_priors,
+                **cv_stats
+            },
+            "tables": {
+                "cv_folds": cv_folds
             },
-            "tables": {},
             "explanation": "Naive Bayes applies Bayes' theorem with strong independence assumptions between features. It's often used for text classification and spam filtering."
         }
         
@@ -1,8 +1,19 @@
+import os
 import pandas as pd
 import json
 import sys
 from prophet import Prophet
 
+try:
+    from server.utils.evaluation import forecast_cv
+    from server.utils.progress import report_progress
+    from server.utils.profiling import profile_stage
+except ImportError:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from server.utils.evaluation import forecast_cv
+    from server.utils.progress import report_progress
+    from server.utils.profiling import profile_stage
+
 def run(df: pd.DataFrame, params: dict = None):
     try:
         params = params or {}
@@ -18,7 +29,7 @@ def run(df: pd.DataFrame, params: dict = None):
             df.columns = ["ds", "y"]
 
         df["ds"] = pd.to_datetime(df["ds"], errors="coerce")
-        df = df.dropna()
+        df = df.dropna().sort_values("ds").reset_index(drop=True)
 
         if df.empty:
             return {
@@ -28,21 +39,38 @@ def run(df: pd.DataFrame, params: dict = None):
                 "explanation": "Prophet requires a datetime column (ds) and a numeric target (y)."
             }
 
+        # Prophet samples its uncertainty intervals from NumPy's global
+        # generator; seed it so identical runs give identical results
+        np.random.seed(int(params.get("random_state", 42)))
         model = Prophet()
-        model.fit(df)
+        report_progress("fit", rows=len(df))
+        with profile_stage("fit"):
+            model.fit(df)
 
+        report_progress("forecast")
         future = model.make_future_dataframe(periods=params.get("periods", 30))
         forecast = model.predict(future)
 
+        # Forecast accuracy over expanding windows: each fold fits on the
+        # rows before its test block and forecasts that block
+        def fold_forecast(train, test):
+            fold_model = Prophet()
+            fold_model.fit(df.iloc[train])
+            return fold_model.predict(df.iloc[test][["ds"]])["yhat"].to_numpy()
+
+        cv_stats, cv_folds = forecast_cv(fold_forecast, df["y"], params)
+
         return {
             "charts": {
                 "forecast": forecast[["ds", "yhat"]].tail(30).to_dict(orient="records")
             },
             "stats": {
-                "forecasted_days": 30
+                "forecasted_days": 30,
+                **cv_stats
             },
             "tables": {
-                "forecast_tail": forecast.tail(10).to_dict(orient="records")
+                "forecast_tail": forecast.tail(10).to_dict(orient="records"),
+                "cv_folds": cv_folds
             },
             "explanation": "Prophet is a robust time series forecasting model that accounts for trend, seasonality, and holiday effects."
         }
@@ -1,3 +1,5 @@
+import os
+import sys
 import pandas as pd
 import json
 import numpy as np
@@ -5,6 +7,20 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, classification_report
 
+try:
+    from server.utils.thread_budget import allotted_threads
+    from server.utils.model_store import model_artifact
+    from server.utils.evaluation import cross_validate
+    from server.utils.preprocessing import feature_matrix, missing_stats, DEFAULT_MISSING
+    from server.utils.profiling import profile_stage
+except ImportError:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from server.utils.thread_budget import allotted_threads
+    from server.utils.model_store import model_artifact
+    from server.utils.evaluation import cross_validate
+    from server.utils.preprocessing import feature_matrix, missing_stats, DEFAULT_MISSING
+    from server.utils.profiling import profile_stage
+
 class NpEncoder(json.JSONEncoder):
     def default(self, obj):
         if isinstance(obj, np.integer):
@@ -31,22 +47,25 @@ def run(df: pd.DataFrame, params: dict = None):
                 "explanation": "Random Forest needs one target and at least one feature column."
             }
             
-        # Handle target column selection
-        if target_column and target_column in numeric_cols:
-            # Use selected target column
-            y = df[target_column]
-            feature_cols = [col for col in numeric_cols if col != target_column]
-            X = df[feature_cols].dropna()
-            y = y.loc[X.index]  # Align y with X indices after dropna
-        else:
-            # Fall back to default behavior if no target specified
-            X = df[numeric_cols].dropna()
-            y = X.iloc[:, 0]
-            X = X.iloc[:, 1:]
+        # Handle target column selection, falling back to the first numeric
+        # column; incomplete rows are imputed unless missing='drop'
+        features = feature_matrix(
+            df,
+            target=target_column if target_column and target_column in numeric_cols else numeric_cols[0],
+            missing=params.get('missing', DEFAULT_MISSING),
+            scaling=params.get('scaling'),
+            dtype=params.get('dtype', 'float64')
+        )
+        X, y = features.frame(), features.target()
 
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42)
-        model = RandomForestClassifier()
-        model.fit(X_train, y_train)
+        # Trees are fitted in parallel on this job's share of the thread budget;
+        # unseeded unless the caller pins random_state (see result_cache)
+        random_state = params.get("random_state")
+        model = RandomForestClassifier(n_jobs=allotted_threads((params or {}).get("n_jobs")),
+                                       random_state=None if random_state is None else int(random_state))
+        with profile_stage("fit"):
+            model.fit(X_train, y_train)
         predictions = model.predict(X_test)
 
         # Convert feature importances to a standard Python list
@@ -55,23 +74,31 @@ def run(df: pd.DataFrame, params: dict = None):
             feature_importances[col] = float(model.feature_importances_[i])
 
         # Get the classification report as a dictionary and ensure all values are JSON serializable
-        report = classification_report(y_test, predictions, output_dict=True)
+        with profile_stage("metrics"):
+            report = classification_report(y_test, predictions, output_dict=True)
         # Convert any NumPy types to Python native types
         for class_name in report:
             if isinstance(report[class_name], dict):
                 for metric in report[class_name]:
                     report[class_name][metric] = float(report[class_name][metric])
 
+        cv_stats, cv_folds = cross_validate(model, X, y, "classification", params)
+
         return {
             "charts": {
                 "feature_importances": feature_importances
             },
             "stats": {
-                "accuracy": float(accuracy_score(y_test, predictions))
+                "accuracy": float(accuracy_score(y_test, predictions)),
+                **missing_stats(features),
+                **cv_stats
             },
             "tables": {
-                "classification_report": report
+                "classification_report": report,
+                "cv_folds": cv_folds
             },
+            "model_artifact": model_artifact(features.pipeline(model), X.columns, target=y.name,
+                                             methods=["predict", "predict_proba"], classes=model.classes_.tolist()),
             "explanation": "Random Forest is an ensemble of decision trees that improves accuracy and reduces overfitting."
         }
 
@@ -85,8 +112,6 @@ def run(df: pd.DataFrame, params: dict = None):
 
 # This allows the file to be run as a script
 if __name__ == "__main__":
-    import sys
-    
     if len(sys.argv) < 2:
         print(json.dumps({"error": "No data file provided"}))
         sys.exit(1)
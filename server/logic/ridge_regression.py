@@ -1,58 +1,84 @@
-        import pandas as pd
-        import json
-        import sys
-        from sklearn.linear_model import Ridge
-        from sklearn.metrics import r2_score, mean_squared_error
-
-        def run(df: pd.DataFrame, params: dict = None):
-            try:
-                params = params or {}
-                target_column = params.get('target_column')
-
-                numeric_cols = df.select_dtypes(include='number').columns.tolist()
-                if len(numeric_cols) < 2:
-                    return {
-                        "charts": {},
-                        "stats": {"error": "At least 2 numeric columns required"},
-                        "tables": {},
-                        "explanation": "Ridge Regression requires one target and at least one feature column."
-                    }
-
-                y = df[target_column] if target_column in df.columns else df[numeric_cols[0]]
-                X = df[numeric_cols].drop(columns=[y.name])
-
-                model = Ridge(alpha=params.get("alpha", 1.0))
-                model.fit(X, y)
-                preds = model.predict(X)
-
-                return {
-                    "charts": {
-                        "predicted_vs_actual": list(zip(preds.tolist(), y.tolist()))
-                    },
-                    "stats": {
-                        "r2": round(r2_score(y, preds), 4),
-                        "mse": round(mean_squared_error(y, preds), 4)
-                    },
-                    "tables": {
-                        "coefficients": dict(zip(X.columns, model.coef_.tolist()))
-                    },
-                    "explanation": "Ridge Regression adds L2 regularization to penalize large coefficients and reduce overfitting."
-                }
-
-            except Exception as e:
-                return {
-                    "charts": {},
-                    "stats": {"error": str(e)},
-                    "tables": {},
-                    "explanation": "An error occurred during model execution."
-                }
-
-        if __name__ == "__main__":
-            try:
-                file_path = sys.argv[1]
-                df = pd.read_csv(file_path)
-                result = run(df)
-                print(json.dumps(result))
-            except Exception as e:
-                print(json.dumps({"error": str(e)}))
-                sys.exit(1)
+import os
+import sys
+import json
+import pandas as pd
+from sklearn.linear_model import Ridge
+from sklearn.metrics import r2_score, mean_squared_error
+
+try:
+    from server.utils.model_store import model_artifact
+    from server.utils.evaluation import cross_validate
+    from server.utils.preprocessing import feature_matrix, missing_stats, DEFAULT_MISSING
+    from server.utils.profiling import profile_stage
+except ImportError:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from server.utils.model_store import model_artifact
+    from server.utils.evaluation import cross_validate
+    from server.utils.preprocessing import feature_matrix, missing_stats, DEFAULT_MISSING
+    from server.utils.profiling import profile_stage
+
+def run(df: pd.DataFrame, params: dict = None):
+    try:
+        params = params or {}
+        target_column = params.get('target_column')
+
+        numeric_cols = df.select_dtypes(include='number').columns.tolist()
+        if len(numeric_cols) < 2:
+            return {
+                "charts": {},
+                "stats": {"error": "At least 2 numeric columns required"},
+                "tables": {},
+                "explanation": "Ridge Regression requires one target and at least one feature column."
+            }
+
+        features = feature_matrix(
+            df,
+            target=target_column if target_column in df.columns else numeric_cols[0],
+            missing=params.get('missing', DEFAULT_MISSING),
+            scaling=params.get('scaling'),
+            dtype=params.get('dtype', 'float64')
+        )
+        X, y = features.frame(), features.target()
+
+        model = Ridge(alpha=params.get("alpha", 1.0))
+        with profile_stage("fit"):
+            model.fit(X, y)
+        preds = model.predict(X)
+
+        cv_stats, cv_folds = cross_validate(model, X, y, "regression", params)
+
+        return {
+            "charts": {
+                "predicted_vs_actual": list(zip(preds.tolist(), y.tolist()))
+            },
+            "stats": {
+                "r2": round(r2_score(y, preds), 4),
+                "mse": round(mean_squared_error(y, preds), 4),
+                **missing_stats(features),
+                **cv_stats
+            },
+            "tables": {
+                "coefficients": dict(zip(X.columns, model.coef_.tolist())),
+                "cv_folds": cv_folds
+            },
+            "model_artifact": model_artifact(features.pipeline(model), X.columns, target=y.name),
+            "explanation": "Ridge Regression adds L2 regularization to penalize large coefficients and reduce overfitting."
+        }
+
+    except Exception as e:
+        return {
+            "charts": {},
+            "stats": {"error": str(e)},
+            "tables": {},
+            "explanation": "An error occurred during model execution."
+        }
+
+if __name__ == "__main__":
+    try:
+        file_path = sys.argv[1]
+        df = pd.read_csv(file_path)
+        result = run(df)
+        print(json.dumps(result))
+    except Exception as e:
+        print(json.dumps({"error": str(e)}))
+        sys.exit(1)
@@ -1,57 +1,106 @@
-        import pandas as pd
-        import json
-        import sys
-        from sklearn.svm import SVC
-        from sklearn.model_selection import train_test_split
-        from sklearn.metrics import accuracy_score, classification_report
-
-        def run(df: pd.DataFrame, params: dict = None):
-            try:
-                params = params or {}
-                target_column = params.get('target_column')
-
-                numeric_cols = df.select_dtypes(include='number').columns.tolist()
-                if len(numeric_cols) < 2:
-                    return {
-                        "charts": {},
-                        "stats": {"error": "At least 2 numeric columns required"},
-                        "tables": {},
-                        "explanation": "SVC requires one target and at least one feature column."
-                    }
-
-                y = df[target_column] if target_column in df.columns else df[numeric_cols[0]]
-                X = df[numeric_cols].drop(columns=[y.name])
-
-                X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.25, random_state=42)
-                model = SVC(probability=True)
-                model.fit(X_train, y_train)
-                preds = model.predict(X_test)
-
-                return {
-                    "charts": {},
-                    "stats": {
-                        "accuracy": round(accuracy_score(y_test, preds), 4)
-                    },
-                    "tables": {
-                        "classification_report": classification_report(y_test, preds, output_dict=True)
-                    },
-                    "explanation": "Support Vector Classifier finds an optimal separating hyperplane in high-dimensional space for classification."
-                }
-
-            except Exception as e:
-                return {
-                    "charts": {},
-                    "stats": {"error": str(e)},
-                    "tables": {},
-                    "explanation": "An error occurred during model execution."
-                }
-
-        if __name__ == "__main__":
-            try:
-                file_path = sys.argv[1]
-                df = pd.read_csv(file_path)
-                result = run(df)
-                print(json.dumps(result))
-            except Exception as e:
-                print(json.dumps({"error": str(e)}))
-                sys.exit(1)
+import os
+import pandas as pd
+import json
+import sys
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import accuracy_score, classification_report, log_loss
+
+try:
+    from server.utils.kernel_approx import svm_estimator, DEFAULT_SVM_EXACT_MAX_ROWS, DEFAULT_LANDMARKS
+    from server.utils.json_utils import NpEncoder
+    from server.utils.model_store import model_artifact
+    from server.utils.evaluation import cross_validate
+    from server.utils.preprocessing import feature_matrix, missing_stats, DEFAULT_MISSING
+    from server.utils.profiling import profile_stage
+except ImportError:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from server.utils.kernel_approx import svm_estimator, DEFAULT_SVM_EXACT_MAX_ROWS, DEFAULT_LANDMARKS
+    from server.utils.json_utils import NpEncoder
+    from server.utils.model_store import model_artifact
+    from server.utils.evaluation import cross_validate
+    from server.utils.preprocessing import feature_matrix, missing_stats, DEFAULT_MISSING
+    from server.utils.profiling import profile_stage
+
+def run(df: pd.DataFrame, params: dict = None):
+    try:
+        params = params or {}
+        target_column = params.get('target_column')
+
+        numeric_cols = df.select_dtypes(include='number').columns.tolist()
+        if len(numeric_cols) < 2:
+            return {
+                "charts": {},
+                "stats": {"error": "At least 2 numeric columns required"},
+                "tables": {},
+                "explanation": "SVC requires one target and at least one feature column."
+            }
+
+        features = feature_matrix(
+            df,
+            target=target_column if target_column in df.columns else numeric_cols[0],
+            missing=params.get('missing', DEFAULT_MISSING),
+            scaling=params.get('scaling'),
+            dtype=params.get('dtype', 'float64')
+        )
+        X, y = features.frame(), features.target()
+
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.25, random_state=42)
+        probability = str(params.get("probability", 0)).lower() in ("1", "true", "yes")
+        model, info = svm_estimator(
+            "classification",
+            X_train.to_numpy(dtype=float),
+            mode=params.get("mode", "auto"),
+            exact_max_rows=int(params.get("exact_max_rows", DEFAULT_SVM_EXACT_MAX_ROWS)),
+            approximation=params.get("approximation", "nystroem"),
+            n_landmarks=int(params.get("n_landmarks", DEFAULT_LANDMARKS)),
+            solver=params.get("solver", "auto"),
+            probability=probability,
+            C=float(params.get("C", 1.0))
+        )
+        with profile_stage("fit"):
+            model.fit(X_train, y_train)
+        preds = model.predict(X_test)
+
+        cv_stats, cv_folds = cross_validate(model, X, y, "classification", params)
+
+        stats = {
+            "accuracy": round(accuracy_score(y_test, preds), 4),
+            **info,
+            **missing_stats(features),
+            **cv_stats
+        }
+        if probability:
+            stats["log_loss"] = round(log_loss(y_test, model.predict_proba(X_test), labels=model.classes_), 4)
+
+        return {
+            "charts": {},
+            "stats": stats,
+            "tables": {
+                "classification_report": classification_report(y_test, preds, output_dict=True, zero_division=0),
+                "cv_folds": cv_folds
+            },
+            "model_artifact": model_artifact(features.pipeline(model), X.columns, target=y.name,
+                                             methods=["predict", "predict_proba"] if probability else ["predict"],
+                                             classes=model.classes_.tolist()),
+            "explanation": "Support Vector Classifier finds an optimal separating hyperplane in high-dimensional space for classification."
+                           + (f" Because of the dataset size, the RBF kernel was approximated with {info['n_landmarks']} {'landmarks' if info['approximation'] == 'nystroem' else 'random Fourier features'} and a linear {'SGD' if info['solver'] == 'sgd' else 'SVM'} solver was trained on them."
+                              if info["mode"] == "approximate" else "")
+        }
+
+    except Exception as e:
+        return {
+            "charts": {},
+            "stats": {"error": str(e)},
+            "tables": {},
+            "explanation": "An error occurred during model execution."
+        }
+
+if __name__ == "__main__":
+    try:
+        file_path = sys.argv[1]
+        df = pd.read_csv(file_path)
+        result = run(df)
+        print(json.dumps(result, cls=NpEncoder))
+    except Exception as e:
+        print(json.dumps({"error": str(e)}))
+        sys.exit(1)
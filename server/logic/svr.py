@@ -1,56 +1,100 @@
-        import pandas as pd
-        import json
-        import sys
-        from sklearn.svm import SVR
-        from sklearn.metrics import mean_squared_error, r2_score
-
-        def run(df: pd.DataFrame, params: dict = None):
-            try:
-                params = params or {}
-                target_column = params.get('target_column')
-
-                numeric_cols = df.select_dtypes(include='number').columns.tolist()
-                if len(numeric_cols) < 2:
-                    return {
-                        "charts": {},
-                        "stats": {"error": "At least 2 numeric columns required"},
-                        "tables": {},
-                        "explanation": "SVR requires one target and at least one numeric feature column."
-                    }
-
-                y = df[target_column] if target_column in df.columns else df[numeric_cols[0]]
-                X = df[numeric_cols].drop(columns=[y.name])
-
-                model = SVR()
-                model.fit(X, y)
-                preds = model.predict(X)
-
-                return {
-                    "charts": {
-                        "predicted_vs_actual": list(zip(preds.tolist(), y.tolist()))
-                    },
-                    "stats": {
-                        "r2": round(r2_score(y, preds), 4),
-                        "mse": round(mean_squared_error(y, preds), 4)
-                    },
-                    "tables": {},
-                    "explanation": "Support Vector Regressor fits a hyperplane within a margin to approximate the relationship between features and target."
-                }
-
-            except Exception as e:
-                return {
-                    "charts": {},
-                    "stats": {"error": str(e)},
-                    "tables": {},
-                    "explanation": "An error occurred during model execution."
-                }
-
-        if __name__ == "__main__":
-            try:
-                file_path = sys.argv[1]
-                df = pd.read_csv(file_path)
-                result = run(df)
-                print(json.dumps(result))
-            except Exception as e:
-                print(json.dumps({"error": str(e)}))
-                sys.exit(1)
+import os
+import numpy as np
+import pandas as pd
+import json
+import sys
+from sklearn.metrics import mean_squared_error, r2_score
+
+try:
+    from server.utils.kernel_approx import svm_estimator, DEFAULT_SVM_EXACT_MAX_ROWS, DEFAULT_LANDMARKS
+    from server.utils.json_utils import NpEncoder
+    from server.utils.model_store import model_artifact
+    from server.utils.evaluation import cross_validate
+    from server.utils.preprocessing import feature_matrix, missing_stats, DEFAULT_MISSING
+    from server.utils.profiling import profile_stage
+except ImportError:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from server.utils.kernel_approx import svm_estimator, DEFAULT_SVM_EXACT_MAX_ROWS, DEFAULT_LANDMARKS
+    from server.utils.json_utils import NpEncoder
+    from server.utils.model_store import model_artifact
+    from server.utils.evaluation import cross_validate
+    from server.utils.preprocessing import feature_matrix, missing_stats, DEFAULT_MISSING
+    from server.utils.profiling import profile_stage
+
+def run(df: pd.DataFrame, params: dict = None):
+    try:
+        params = params or {}
+        target_column = params.get('target_column')
+
+        numeric_cols = df.select_dtypes(include='number').columns.tolist()
+        if len(numeric_cols) < 2:
+            return {
+                "charts": {},
+                "stats": {"error": "At least 2 numeric columns required"},
+                "tables": {},
+                "explanation": "SVR requires one target and at least one numeric feature column."
+            }
+
+        features = feature_matrix(
+            df,
+            target=target_column if target_column in df.columns else numeric_cols[0],
+            missing=params.get('missing', DEFAULT_MISSING),
+            scaling=params.get('scaling'),
+            dtype=params.get('dtype', 'float64')
+        )
+        X, y = features.frame(), features.target()
+
+        model, info = svm_estimator(
+            "regression",
+            X.to_numpy(dtype=float),
+            mode=params.get("mode", "auto"),
+            exact_max_rows=int(params.get("exact_max_rows", DEFAULT_SVM_EXACT_MAX_ROWS)),
+            approximation=params.get("approximation", "nystroem"),
+            n_landmarks=int(params.get("n_landmarks", DEFAULT_LANDMARKS)),
+            solver=params.get("solver", "auto"),
+            C=float(params.get("C", 1.0)),
+            epsilon=float(params.get("epsilon", 0.1))
+        )
+        with profile_stage("fit"):
+            model.fit(X, y)
+        preds = model.predict(X)
+
+        cv_stats, cv_folds = cross_validate(model, X, y, "regression", params)
+
+        return {
+            "charts": {
+                "predicted_vs_actual": np.column_stack((preds, y.to_numpy(dtype=float)))
+            },
+            "stats": {
+                "r2": round(r2_score(y, preds), 4),
+                "mse": round(mean_squared_error(y, preds), 4),
+                **missing_stats(features),
+                **info,
+                **cv_stats
+            },
+            "tables": {
+                "cv_folds": cv_folds
+            },
+            "model_artifact": model_artifact(features.pipeline(model), X.columns, target=y.name),
+            "explanation": "Support Vector Regressor fits a hyperplane within a margin to approximate the relationship between features and target."
+                           + (f" Because of the dataset size, the RBF kernel was approximated with {info['n_landmarks']} {'landmarks' if info['approximation'] == 'nystroem' else 'random Fourier features'} and a linear {'SGD' if info['solver'] == 'sgd' else 'SVM'} solver was trained on them."
+                              if info["mode"] == "approximate" else "")
+        }
+
+    except Exception as e:
+        return {
+            "charts": {},
+            "stats": {"error": str(e)},
+            "tables": {},
+            "explanation": "An error occurred during model execution."
+        }
+
+if __name__ == "__main__":
+    try:
+        file_path = sys.argv[1]
+        df = pd.read_csv(file_path)
+        result = run(df)
+        print(json.dumps(result, cls=NpEncoder))
+    except Exception as e:
+        print(json.dumps({"error": str(e)}))
+        sys.exit(1)
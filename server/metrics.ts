@@ -0,0 +1,78 @@
+// Prometheus metrics aggregated from the profile block of technique runs
+// (server/utils/profiling.py). Every run Python finishes carries per-stage
+// timings; the server records the ones it relays, from /api/run and from
+// job status events, and serves the totals at /api/metrics.
+
+interface RunTotals {
+  runs: number;
+  seconds: number;
+  peakRssBytes: number;
+}
+
+interface StageTotals {
+  calls: number;
+  seconds: number;
+}
+
+const runs = new Map<string, RunTotals>();
+const stages = new Map<string, StageTotals>();
+const runSources = new Map<string, number>();
+
+function escapeLabel(value: string) {
+  return value.replace(/\\/g, "\\\\").replace(/"/g, '\\"').replace(/\n/g, "\\n");
+}
+
+function labels(values: Record<string, string>) {
+  return "{" + Object.entries(values).map(([key, value]) => `${key}="${escapeLabel(value)}"`).join(",") + "}";
+}
+
+// Record one run's profile; `source` is "run" or "job"
+export function recordRunProfile(technique: string, profile: any, source = "run") {
+  if (!profile || !Array.isArray(profile.stages)) return;
+  const cached = profile.cached ? "true" : "false";
+  const runKey = labels({ technique, cached });
+  const run = runs.get(runKey) || { runs: 0, seconds: 0, peakRssBytes: 0 };
+  run.runs += 1;
+  run.seconds += (Number(profile.total_ms) || 0) / 1000;
+  run.peakRssBytes = Math.max(run.peakRssBytes, (Number(profile.peak_rss_mb) || 0) * 1024 * 1024);
+  runs.set(runKey, run);
+
+  const sourceKey = labels({ source });
+  runSources.set(sourceKey, (runSources.get(sourceKey) || 0) + 1);
+
+  for (const stage of profile.stages) {
+    const stageKey = labels({ technique, stage: String(stage.stage) });
+    const totals = stages.get(stageKey) || { calls: 0, seconds: 0 };
+    totals.calls += Number(stage.calls) || 0;
+    // Self time, so nested stages are not counted twice
+    totals.seconds += (Number(stage.self_ms ?? stage.ms) || 0) / 1000;
+    stages.set(stageKey, totals);
+  }
+}
+
+// The metrics in the Prometheus text exposition format
+export function renderMetrics() {
+  const lines: string[] = [];
+  const family = (name: string, type: string, help: string, rows: [string, number][]) => {
+    lines.push(`# HELP ${name} ${help}`, `# TYPE ${name} ${type}`);
+    for (const [key, value] of rows) lines.push(`${name}${key} ${value}`);
+  };
+  const runRows = Array.from(runs.entries());
+  const stageRows = Array.from(stages.entries());
+
+  family("bump_runs_total", "counter", "Technique runs by technique and cache hit",
+    runRows.map(([key, run]) => [key, run.runs]));
+  family("bump_run_seconds_sum", "counter", "Total wall time of technique runs",
+    runRows.map(([key, run]) => [key, Number(run.seconds.toFixed(6))]));
+  family("bump_run_seconds_count", "counter", "Technique runs timed",
+    runRows.map(([key, run]) => [key, run.runs]));
+  family("bump_run_peak_rss_bytes", "gauge", "Highest peak RSS of a process that ran the technique",
+    runRows.map(([key, run]) => [key, Math.round(run.peakRssBytes)]));
+  family("bump_stage_seconds_total", "counter", "Self time spent in each run stage",
+    stageRows.map(([key, stage]) => [key, Number(stage.seconds.toFixed(6))]));
+  family("bump_stage_calls_total", "counter", "Times each run stage was entered",
+    stageRows.map(([key, stage]) => [key, stage.calls]));
+  family("bump_profiled_runs_total", "counter", "Profiles recorded by where the run came from",
+    Array.from(runSources.entries()));
+  return lines.join("\n") + "\n";
+}
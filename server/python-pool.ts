@@ -0,0 +1,273 @@
+import { spawn, type ChildProcessWithoutNullStreams } from "child_process";
+import os from "os";
+
+// Pool of long-lived `run_model.py --worker` processes. Each worker keeps
+// pandas/numpy/scikit-learn imported and takes one newline-delimited JSON
+// job at a time, so a technique run no longer pays the interpreter and
+// import start-up cost.
+
+export interface PythonPoolOptions {
+  script: string;
+  size?: number;
+  maxJobsPerWorker?: number;
+  maxRssMb?: number;
+  healthCheckIntervalMs?: number;
+  healthCheckTimeoutMs?: number;
+  jobTimeoutMs?: number;
+  pythonBin?: string;
+}
+
+interface PendingJob {
+  id: number;
+  payload: Record<string, any>;
+  resolve: (value: any) => void;
+  reject: (reason: Error) => void;
+}
+
+interface Worker {
+  process: ChildProcessWithoutNullStreams;
+  ready: boolean;
+  busy: boolean;
+  jobs: number;
+  buffer: string;
+  current?: PendingJob;
+  jobTimer?: NodeJS.Timeout;
+  pingTimer?: NodeJS.Timeout;
+  pingId?: number;
+  lastRssMb?: number;
+}
+
+const envInt = (name: string, fallback: number) => {
+  const value = process.env[name] ? parseInt(process.env[name] as string) : NaN;
+  return isNaN(value) ? fallback : value;
+};
+
+export class PythonWorkerPool {
+  private options: Required<PythonPoolOptions>;
+  private workers: Worker[] = [];
+  private queue: PendingJob[] = [];
+  private nextId = 1;
+  private closed = false;
+  private healthTimer?: NodeJS.Timeout;
+  private counters = { completed: 0, failed: 0, recycled: 0, restarted: 0 };
+
+  constructor(options: PythonPoolOptions) {
+    this.options = {
+      size: Math.max(1, Math.min(4, os.cpus().length)),
+      maxJobsPerWorker: 100,
+      maxRssMb: 1024,
+      healthCheckIntervalMs: 30_000,
+      healthCheckTimeoutMs: 5_000,
+      jobTimeoutMs: 10 * 60_000,
+      pythonBin: "python",
+      ...options,
+    };
+
+    for (let i = 0; i < this.options.size; i++) {
+      this.workers.push(this.startWorker());
+    }
+    this.healthTimer = setInterval(() => this.healthCheck(), this.options.healthCheckIntervalMs);
+    this.healthTimer.unref();
+  }
+
+  // Submit a job and resolve with the parsed result once a worker finishes it
+  run(payload: Record<string, any>): Promise<any> {
+    if (this.closed) {
+      return Promise.reject(new Error("Python worker pool is shut down"));
+    }
+    return new Promise((resolve, reject) => {
+      this.queue.push({ id: this.nextId++, payload, resolve, reject });
+      this.dispatch();
+    });
+  }
+
+  stats() {
+    return {
+      size: this.workers.length,
+      busy: this.workers.filter(w => w.busy).length,
+      queued: this.queue.length,
+      workers: this.workers.map(w => ({ pid: w.process.pid, ready: w.ready, busy: w.busy, jobs: w.jobs, rssMb: w.lastRssMb })),
+      ...this.counters,
+    };
+  }
+
+  shutdown() {
+    this.closed = true;
+    if (this.healthTimer) clearInterval(this.healthTimer);
+    for (const job of this.queue.splice(0)) {
+      job.reject(new Error("Python worker pool is shutting down"));
+    }
+    for (const worker of this.workers) {
+      worker.process.stdin.end(JSON.stringify({ type: "shutdown" }) + "\n");
+    }
+  }
+
+  private startWorker(): Worker {
+    const args = [
+      this.options.script,
+      "--worker",
+      "--max-jobs", String(this.options.maxJobsPerWorker),
+      "--max-rss-mb", String(this.options.maxRssMb),
+    ];
+    const child = spawn(this.options.pythonBin, args);
+    const worker: Worker = { process: child, ready: false, busy: false, jobs: 0, buffer: "" };
+
+    child.stdout.on("data", (data: Buffer) => {
+      worker.buffer += data.toString();
+      let newline;
+      while ((newline = worker.buffer.indexOf("\n")) >= 0) {
+        const line = worker.buffer.slice(0, newline).trim();
+        worker.buffer = worker.buffer.slice(newline + 1);
+        if (line) this.handleMessage(worker, line);
+      }
+    });
+
+    child.stderr.on("data", (data: Buffer) => {
+      console.error(`[PYTHON WORKER ${child.pid}]`, data.toString().trimEnd());
+    });
+
+    child.on("exit", (code) => this.handleExit(worker, code));
+    child.on("error", (err) => {
+      console.error(`Python worker failed to start:`, err);
+    });
+
+    return worker;
+  }
+
+  private handleMessage(worker: Worker, line: string) {
+    let message: any;
+    try {
+      message = JSON.parse(line);
+    } catch {
+      console.error(`[PYTHON WORKER ${worker.process.pid}] unframed output:`, line);
+      return;
+    }
+
+    switch (message.type) {
+      case "ready":
+        worker.ready = true;
+        worker.lastRssMb = message.rss_mb;
+        this.dispatch();
+        break;
+      case "pong":
+        if (message.id === worker.pingId) {
+          if (worker.pingTimer) clearTimeout(worker.pingTimer);
+          worker.pingTimer = undefined;
+          worker.pingId = undefined;
+          worker.lastRssMb = message.rss_mb;
+        }
+        break;
+      case "result": {
+        const job = worker.current;
+        if (!job || job.id !== message.id) break;
+        if (worker.jobTimer) clearTimeout(worker.jobTimer);
+        worker.current = undefined;
+        worker.busy = false;
+        worker.jobs++;
+        if (message.ok) {
+          this.counters.completed++;
+          job.resolve(message.result);
+        } else {
+          this.counters.failed++;
+          job.reject(new Error(message.error || "Python worker job failed"));
+        }
+        this.dispatch();
+        break;
+      }
+      case "recycle":
+        // The worker is about to exit on its own; stop sending it work
+        worker.ready = false;
+        this.counters.recycled++;
+        // A job may have been dispatched between its last result and this
+        // notice; the worker will never read it, so hand it to another one
+        if (worker.current) {
+          if (worker.jobTimer) clearTimeout(worker.jobTimer);
+          this.queue.unshift(worker.current);
+          worker.current = undefined;
+          worker.busy = false;
+          this.dispatch();
+        }
+        break;
+    }
+  }
+
+  private handleExit(worker: Worker, code: number | null) {
+    worker.ready = false;
+    if (worker.jobTimer) clearTimeout(worker.jobTimer);
+    if (worker.pingTimer) clearTimeout(worker.pingTimer);
+    if (worker.current) {
+      this.counters.failed++;
+      worker.current.reject(new Error(`Python worker exited with code ${code} while running a job`));
+      worker.current = undefined;
+    }
+
+    const index = this.workers.indexOf(worker);
+    if (index === -1) return;
+    if (this.closed) {
+      this.workers.splice(index, 1);
+      return;
+    }
+    // Recycled workers exit cleanly and are replaced at once; back off after
+    // crashes so a broken interpreter does not spin in a restart loop
+    this.counters.restarted++;
+    setTimeout(() => {
+      if (this.closed) return;
+      const slot = this.workers.indexOf(worker);
+      if (slot !== -1) this.workers[slot] = this.startWorker();
+    }, code === 0 ? 0 : 1000);
+  }
+
+  private dispatch() {
+    for (const worker of this.workers) {
+      if (this.queue.length === 0) return;
+      if (!worker.ready || worker.busy) continue;
+
+      const job = this.queue.shift() as PendingJob;
+      worker.busy = true;
+      worker.current = job;
+      worker.jobTimer = setTimeout(() => {
+        console.error(`Python worker ${worker.process.pid} timed out; killing it`);
+        worker.process.kill("SIGKILL");
+      }, this.options.jobTimeoutMs);
+      worker.process.stdin.write(JSON.stringify({ ...job.payload, id: job.id, type: "run" }) + "\n");
+    }
+  }
+
+  // Ping idle workers and replace any that do not answer in time
+  private healthCheck() {
+    for (const worker of this.workers) {
+      if (!worker.ready || worker.busy || worker.pingId !== undefined) continue;
+      const pingId = this.nextId++;
+      worker.pingId = pingId;
+      worker.pingTimer = setTimeout(() => {
+        console.error(`Python worker ${worker.process.pid} failed health check; killing it`);
+        worker.process.kill("SIGKILL");
+      }, this.options.healthCheckTimeoutMs);
+      worker.process.stdin.write(JSON.stringify({ id: pingId, type: "ping" }) + "\n");
+    }
+  }
+}
+
+let sharedPool: PythonWorkerPool | null | undefined;
+
+// Lazily create the process-wide pool. PYTHON_POOL_SIZE=0 disables it and
+// callers fall back to spawning one interpreter per request.
+export function getPythonPool(script: string): PythonWorkerPool | null {
+  if (sharedPool !== undefined) return sharedPool;
+
+  const size = envInt("PYTHON_POOL_SIZE", Math.max(1, Math.min(4, os.cpus().length)));
+  if (size <= 0) {
+    sharedPool = null;
+    return sharedPool;
+  }
+
+  sharedPool = new PythonWorkerPool({
+    script,
+    size,
+    maxJobsPerWorker: envInt("PYTHON_WORKER_MAX_JOBS", 100),
+    maxRssMb: envInt("PYTHON_WORKER_MAX_RSS_MB", 1024),
+    healthCheckIntervalMs: envInt("PYTHON_WORKER_HEALTH_INTERVAL_MS", 30_000),
+    jobTimeoutMs: envInt("PYTHON_WORKER_JOB_TIMEOUT_MS", 10 * 60_000),
+  });
+  return sharedPool;
+}
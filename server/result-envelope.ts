@@ -0,0 +1,100 @@
+import fs from "fs";
+
+// Reader for the binary result envelope written by
+// server/utils/result_transport.py: a small JSON header describing the
+// result, followed by raw little-endian buffers for its large numeric arrays.
+
+const MAGIC = "BUMPRES1";
+
+interface BufferSpec {
+  offset: number;
+  bytes: number;
+  dtype: string;
+  shape: number[];
+}
+
+const TYPED_ARRAYS: Record<string, any> = {
+  float64: Float64Array,
+  float32: Float32Array,
+  int32: Int32Array,
+  int16: Int16Array,
+  int8: Int8Array,
+  uint32: Uint32Array,
+  uint16: Uint16Array,
+  uint8: Uint8Array,
+  bool: Uint8Array,
+};
+
+function toPlain(values: ArrayLike<number>, isBool: boolean): any[] {
+  const out = new Array(values.length);
+  for (let i = 0; i < values.length; i++) {
+    out[i] = isBool ? values[i] !== 0 : values[i];
+  }
+  return out;
+}
+
+function readBuffer(spec: BufferSpec, data: ArrayBuffer, base: number): any[] {
+  const Typed = TYPED_ARRAYS[spec.dtype];
+  if (!Typed) throw new Error(`Unsupported buffer dtype: ${spec.dtype}`);
+  const typed = new Typed(data, base + spec.offset, spec.bytes / Typed.BYTES_PER_ELEMENT);
+  const isBool = spec.dtype === "bool";
+  if (spec.shape.length <= 1) return toPlain(typed, isBool);
+
+  // Rebuild nested arrays row by row for 2-D (and higher) buffers
+  const inner = spec.shape.slice(1).reduce((a, b) => a * b, 1);
+  const rows = new Array(spec.shape[0]);
+  for (let i = 0; i < spec.shape[0]; i++) {
+    rows[i] = readBuffer(
+      { offset: spec.offset + i * inner * Typed.BYTES_PER_ELEMENT, bytes: inner * Typed.BYTES_PER_ELEMENT, dtype: spec.dtype, shape: spec.shape.slice(1) },
+      data,
+      base,
+    );
+  }
+  return rows;
+}
+
+function decode(value: any, specs: BufferSpec[], data: ArrayBuffer, base: number): any {
+  if (Array.isArray(value)) {
+    return value.map(item => decode(item, specs, data, base));
+  }
+  if (value && typeof value === "object") {
+    const keys = Object.keys(value);
+    if (keys.length === 1 && keys[0] === "__buffer__") {
+      return readBuffer(specs[value.__buffer__], data, base);
+    }
+    if (keys.length === 1 && keys[0] === "__records__") {
+      const { columns, values, length } = value.__records__;
+      const decoded: Record<string, any[]> = {};
+      for (const column of columns) decoded[column] = decode(values[column], specs, data, base);
+      const records = new Array(length);
+      for (let i = 0; i < length; i++) {
+        const record: Record<string, any> = {};
+        for (const column of columns) record[column] = decoded[column][i];
+        records[i] = record;
+      }
+      return records;
+    }
+    const out: Record<string, any> = {};
+    for (const key of keys) out[key] = decode(value[key], specs, data, base);
+    return out;
+  }
+  return value;
+}
+
+// Read an envelope back into the plain result object the technique returned
+export function readResultEnvelope(filePath: string): any {
+  const file = fs.readFileSync(filePath);
+  if (file.toString("latin1", 0, MAGIC.length) !== MAGIC) {
+    throw new Error(`${filePath} is not a result envelope`);
+  }
+  const headerLength = file.readUInt32LE(MAGIC.length);
+  const start = MAGIC.length + 4;
+  const header = JSON.parse(file.toString("utf8", start, start + headerLength));
+  let base = start + headerLength;
+  base += (8 - (base % 8)) % 8;
+
+  // Typed array views need aligned offsets, so work on a copy that starts at
+  // byte 0 of its own ArrayBuffer
+  const data = new Uint8Array(file).buffer;
+  return decode(header.result, header.buffers, data, base);
+}
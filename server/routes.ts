@@ -7,10 +7,16 @@ import { insertDatasetSchema } from "@shared/schema";
 import path from "path";
 import fs from "fs";
 import os from "os";
+import { randomBytes } from "crypto";
 import { spawn } from "child_process";
 import { Request, Response, NextFunction } from "express";
 import { sessionData } from "./api/upload";
 import csvParser from "csv-parser";
+import { getPythonPool } from "./python-pool";
+import { buildColumnarArtifact, findColumnarArtifact, getDtypeHints } from "./dataset-cache";
+import { readResultEnvelope } from "./result-envelope";
+import { getJobQueue, TERMINAL_JOB_STATUSES, type JobEvent } from "./job-queue";
+import { recordRunProfile, renderMetrics } from "./metrics";
 
 declare global {
   namespace Express {
@@ -21,6 +27,97 @@ declare global {
   }
 }
 
+// Shape a technique result into the response contract the client expects;
+// the run's per-stage profile is passed through when Python attached one
+function formatRunResponse(technique: string, result: any) {
+  const response: Record<string, any> = {
+    charts: result.charts || {},
+    stats: result.stats || {},
+    tables: result.tables || {},
+    explanation: result.explanation || `Analysis completed with ${technique}.`
+  };
+  if (result.profile) {
+    response.profile = result.profile;
+  }
+  return response;
+}
+
+// Send a technique result. Python writes large results as a binary envelope
+// file; clients that ask for ?format=binary get that file as-is, others get
+// it decoded into the usual JSON response. The file is removed afterwards
+// unless it belongs to a job, whose result can be fetched again.
+function sendRunResult(req: Request, res: Response, technique: string, result: any, keepFile = false) {
+  if (result && result.result_file) {
+    const resultFile: string = result.result_file;
+    const cleanUp = () => {
+      if (!keepFile) fs.unlink(resultFile, () => {});
+    };
+    if (req.query.format === 'binary') {
+      return res.type('application/octet-stream').sendFile(resultFile, cleanUp);
+    }
+    try {
+      result = readResultEnvelope(resultFile);
+    } finally {
+      cleanUp();
+    }
+  }
+  const response = formatRunResponse(technique, result);
+  // Job results are recorded from their status event instead
+  if (!keepFile) {
+    recordRunProfile(technique, response.profile);
+  }
+  console.log(`Sending response for ${technique}:`, JSON.stringify(response.stats).substring(0, 200) + '...');
+  return res.json(response);
+}
+
+// Whether the request may use a dataset: signed-in users only their own
+// (as for /api/data), guests only guest uploads
+function canUseDataset(req: Request, dataset: { userId: number }) {
+  const userId = req.isAuthenticated() ? (req.user as Express.User).id : -1;
+  return dataset.userId === userId;
+}
+
+// Batch predictions are published under an opaque random id and kept for a
+// day; each new batch removes the outputs (and abandoned scratch
+// directories) that are older than that
+const PREDICTION_RETENTION_MS = 24 * 60 * 60 * 1000;
+
+function getPredictionsRoot(): string {
+  return path.join(process.cwd(), 'uploads', '.predictions');
+}
+
+function prunePredictionOutputs() {
+  const root = getPredictionsRoot();
+  fs.readdir(root, (err, names) => {
+    if (err) return;
+    const cutoff = Date.now() - PREDICTION_RETENTION_MS;
+    for (const name of names) {
+      const dir = path.join(root, name);
+      fs.stat(dir, (statErr, stat) => {
+        if (!statErr && stat.mtimeMs < cutoff) {
+          fs.rm(dir, { recursive: true, force: true }, () => {});
+        }
+      });
+    }
+  });
+}
+
+// Convert a CSV to a JSON array file for scripts that cannot read CSV
+function writeCsvAsJson(csvPath: string, jsonPath: string): Promise<void> {
+  return new Promise<void>((resolve, reject) => {
+    const results: any[] = [];
+    fs.createReadStream(csvPath)
+      .pipe(csvParser())
+      .on('data', (data: any) => results.push(data))
+      .on('end', () => {
+        fs.writeFileSync(jsonPath, JSON.stringify(results));
+        console.log(`Converted CSV file to JSON with ${results.length} rows`);
+        resolve();
+      })
+      .on('error', (err: Error) => reject(err));
+  });
+}
+
 export async function registerRoutes(app: Express): Promise<Server> {
   // Setup authentication routes
   setupAuth(app);
@@ -114,6 +211,10 @@ export async function registerRoutes(app: Express): Promise<Server> {
       // Save dataset info to storage
       const dataset = await storage.createDataset(datasetData);
       
+      // Parse the file once into a columnar artifact for later technique runs.
+      // Not awaited: runs fall back to the CSV until the artifact is ready.
+      buildColumnarArtifact(permanentFilePath, dataset.id);
+      
       // Also save to session data for backward compatibility
       if (!sessionData[userId]) {
         sessionData[userId] = {};
@@ -372,32 +473,15 @@ export async function registerRoutes(app: Express): Promise<Server> {
         }
       }
       
-      // Create a temporary JSON file to store the data
-      const tempFile = path.join(os.tmpdir(), `dataset_${datasetId}.json`);
+      // Python reads the columnar artifact built at upload when it is current,
+      // and otherwise the original CSV in chunks; no JSON copy is needed
+      const artifactDir = findColumnarArtifact(datasetId, filePath);
+      const dataPath = artifactDir || filePath;
+      const dtypes = artifactDir ? null : getDtypeHints(dataset.schemaData);
 
-      try {
-        // Read the CSV file and convert to JSON
-        const results: any[] = [];
-        
-        // Process the CSV file and convert to JSON
-        await new Promise<void>((resolve, reject) => {
-          fs.createReadStream(filePath)
-            .pipe(csvParser())
-            .on('data', (data: any) => results.push(data))
-            .on('end', () => {
-              fs.writeFileSync(tempFile, JSON.stringify(results));
-              resolve();
-            })
-            .on('error', (err: Error) => reject(err));
-        });
-        
-        console.log(`Converted CSV file to JSON with ${results.length} rows`);
-      } catch (err) {
-        console.error('Error processing CSV file:', err);
-        return res.status(500).json({ 
-          message: "Failed to process dataset file",
-          details: err instanceof Error ? err.message : String(err)
-        });
+      if (!artifactDir) {
+        // Build the artifact in the background so later runs can use it
+        buildColumnarArtifact(filePath, datasetId);
       }
       
       // Define which techniques we support
@@ -405,6 +489,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
         'kmeans',
         'isolation_forest',
         'linear_regression',
+        'logistic_regression',
         'random_forest_classifier',
         'dbscan',
         'ridge_regression',
@@ -422,6 +507,19 @@ export async function registerRoutes(app: Express): Promise<Server> {
       if (!supportedTechniques.includes(technique)) {
         return res.status(400).json({ message: `Unsupported technique: ${technique}` });
       }
+
+      // Incremental anomaly scoring keeps one saved forest per dataset; the
+      // key is always the server's, and only the dataset's owner may advance
+      // or refit that forest
+      if (technique === 'isolation_forest') {
+        delete params.model_key;
+        if (params.mode === 'incremental') {
+          if (!canUseDataset(req, dataset)) {
+            return res.status(403).json({ message: "Access denied" });
+          }
+          params.model_key = `dataset-${datasetId}`;
+        }
+      }
       
       // Check if Python implementation exists in backend folder
       const pythonScripts = [
@@ -438,30 +536,72 @@ export async function registerRoutes(app: Express): Promise<Server> {
         });
       }
       
-      return new Promise((resolve, reject) => {
-        // Check if the run_model.py script exists
-        const runModelScript = [
-          path.join(process.cwd(), 'backend/api/run_model.py'),
-          path.join(process.cwd(), 'server/api/run_model.py')
-        ].find(script => fs.existsSync(script));
+      // Results come back as a binary envelope in this file rather than as
+      // JSON on stdout
+      const resultFile = path.join(os.tmpdir(), `result_${datasetId}_${Date.now()}_${Math.random().toString(36).slice(2)}.bin`);
 
+      // Prefer a warm worker from the Python pool over spawning an interpreter
+      const workerScript = path.join(process.cwd(), 'backend/api/run_model.py');
+      const pool = fs.existsSync(workerScript) ? getPythonPool(workerScript) : null;
+      if (pool) {
+        try {
+          const result = await pool.run({ technique, data_path: dataPath, params, dtypes, result_file: resultFile });
+          return sendRunResult(req, res, technique, result);
+        } catch (err) {
+          fs.unlink(resultFile, () => {});
+          console.error(`Python worker error (${technique}):`, err);
+          return res.status(500).json({
+            error: `Error running ${technique} algorithm`,
+            details: err instanceof Error ? err.message : String(err)
+          });
+        }
+      }
+
+      // Check if the run_model.py script exists
+      const runModelScript = [
+        path.join(process.cwd(), 'backend/api/run_model.py'),
+        path.join(process.cwd(), 'server/api/run_model.py')
+      ].find(script => fs.existsSync(script));
+
+      // Standalone technique scripts only read JSON, so they still need a copy
+      let tempFile: string | null = null;
+      if (!runModelScript) {
+        tempFile = path.join(os.tmpdir(), `dataset_${datasetId}_${Date.now()}_${Math.random().toString(36).slice(2)}.json`);
+        try {
+          await writeCsvAsJson(filePath, tempFile);
+        } catch (err) {
+          console.error('Error processing CSV file:', err);
+          return res.status(500).json({ 
+            message: "Failed to process dataset file",
+            details: err instanceof Error ? err.message : String(err)
+          });
+        }
+      }
+
+      return new Promise((resolve, reject) => {
         let pythonProcess;
         
         // If run_model.py exists, use it to run the technique
         if (runModelScript) {
           console.log(`Using run_model.py to execute ${technique}`);
-          const pythonArgs = [runModelScript, technique, tempFile];
+          const pythonArgs = [runModelScript, technique, dataPath];
           
           // Add technique-specific parameters if provided
           for (const [key, value] of Object.entries(params)) {
             pythonArgs.push(`${key}=${value}`);
           }
+          if (dtypes) {
+            pythonArgs.push(`dtypes=${JSON.stringify(dtypes)}`);
+          }
+          if (runModelScript.includes('backend')) {
+            pythonArgs.push(`result_file=${resultFile}`);
+          }
           
           pythonProcess = spawn('python', pythonArgs);
         } else {
           // Fall back to directly calling the technique script
           console.log(`Directly executing ${technique} script`);
-          const pythonArgs = [pythonScript, tempFile];
+          const pythonArgs = [pythonScript, tempFile as string];
           
           // Add technique-specific parameters if provided
           if (params.nClusters && technique === 'kmeans') {
@@ -488,7 +628,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
           console.log(`Python process for ${technique} exited with code:`, code);
           
           // Clean up the temporary file
-          if (fs.existsSync(tempFile)) {
+          if (tempFile && fs.existsSync(tempFile)) {
             fs.unlinkSync(tempFile);
           }
           
@@ -528,15 +668,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
             const result = JSON.parse(cleanedResult);
             
             // Return a well-formed response with defaults for missing fields
-            const response = {
-              charts: result.charts || {},
-              stats: result.stats || {},
-              tables: result.tables || {},
-              explanation: result.explanation || `Analysis completed with ${technique}.`
-            };
-            
-            console.log(`Sending response for ${technique}:`, JSON.stringify(response).substring(0, 200) + '...');
-            res.json(response);
+            sendRunResult(req, res, technique, result);
           } catch (err: unknown) {
             const error = err as Error;
             console.error(`JSON parse error for ${technique}:`, error.message, `\nData: ${resultData}`);
@@ -558,6 +690,476 @@ export async function registerRoutes(app: Express): Promise<Server> {
     }
   });
 
+  // Technique runs as queued jobs: submitting returns at once with a job id,
+  // the run happens in its own Python process under per-technique time and
+  // memory limits, and the client polls the job, follows its event stream,
+  // cancels it or fetches the result when it is done.
+  const jobScript = path.join(process.cwd(), 'backend/api/run_model.py');
+  // Jobs are only visible to the user who submitted them; guests all share
+  // the placeholder user id, so a guest's jobs belong to their session
+  const jobOwner = (req: Request) => req.isAuthenticated()
+    ? String((req.user as Express.User).id)
+    : `guest-${req.sessionID}`;
+  const ownedJob = async (req: Request, res: Response) => {
+    const job = await getJobQueue(jobScript).get(req.params.jobId);
+    if (!job || job.owner !== jobOwner(req)) {
+      res.status(404).json({ message: "Job not found" });
+      return null;
+    }
+    return job;
+  };
+  // Server paths stay on the server
+  const publicJob = ({ result_file, ...job }: any) => job;
+
+  // The body holds the technique params plus optional `priority` (-10 to 10,
+  // at most 0 for guests), `time_limit_s` and `memory_limit_mb`; the limits
+  // can lower the technique's caps but not raise them. Responds 202 with the
+  // queued job and its queue position.
+  app.post("/api/jobs/:technique/:datasetId", async (req, res, next) => {
+    try {
+      if (!req.isAuthenticated() && !req.isGuest?.()) {
+        return res.status(401).json({ message: "Authentication required" });
+      }
+
+      const { technique, datasetId } = req.params;
+      const dataset = await storage.getDataset(parseInt(datasetId));
+      if (!dataset || !dataset.filePath || !fs.existsSync(dataset.filePath)) {
+        return res.status(404).json({ message: "Dataset not found" });
+      }
+      if (!canUseDataset(req, dataset)) {
+        return res.status(403).json({ message: "Access denied" });
+      }
+      const artifactDir = findColumnarArtifact(datasetId, dataset.filePath);
+      const dtypes = artifactDir ? null : getDtypeHints(dataset.schemaData);
+      if (!artifactDir) {
+        buildColumnarArtifact(dataset.filePath, datasetId);
+      }
+
+      // A client model_key is dropped; the saved forest is keyed by the server
+      const { priority, time_limit_s, memory_limit_mb, model_key, ...params } = req.body || {};
+      if (technique === 'isolation_forest' && params.mode === 'incremental') {
+        params.model_key = `dataset-${datasetId}`;
+      }
+      let jobPriority = Number(priority) || 0;
+      if (!req.isAuthenticated()) {
+        jobPriority = Math.min(jobPriority, 0);
+      }
+
+      // The dispatcher rejects unsupported techniques
+      const job = await getJobQueue(jobScript).submit({
+        technique,
+        payload: { technique, data_path: artifactDir || dataset.filePath, params, dtypes },
+        owner: jobOwner(req),
+        priority: jobPriority,
+        time_limit_s,
+        memory_limit_mb,
+      });
+      return res.status(202).json(publicJob(job));
+    } catch (error) {
+      if (error instanceof Error && error.message.includes('not supported')) {
+        return res.status(400).json({ message: error.message });
+      }
+      next(error);
+    }
+  });
+
+  app.get("/api/jobs", async (req, res, next) => {
+    try {
+      if (!req.isAuthenticated() && !req.isGuest?.()) {
+        return res.status(401).json({ message: "Authentication required" });
+      }
+      const limit = Math.min(parseInt(String(req.query.limit || '50')) || 50, 500);
+      const jobs = await getJobQueue(jobScript).list(jobOwner(req), limit);
+      res.json(jobs.map(publicJob));
+    } catch (error) {
+      next(error);
+    }
+  });
+
+  // Status, latest progress event, limits and queue position
+  app.get("/api/jobs/:jobId", async (req, res, next) => {
+    try {
+      if (!req.isAuthenticated() && !req.isGuest?.()) {
+        return res.status(401).json({ message: "Authentication required" });
+      }
+      const job = await ownedJob(req, res);
+      if (job) res.json(publicJob(job));
+    } catch (error) {
+      next(error);
+    }
+  });
+
+  // Newline-delimited JSON events (status changes and progress), starting
+  // after ?after=<seq> (default: from the beginning) and ending with the
+  // job's terminal status
+  app.get("/api/jobs/:jobId/events", async (req, res, next) => {
+    try {
+      if (!req.isAuthenticated() && !req.isGuest?.()) {
+        return res.status(401).json({ message: "Authentication required" });
+      }
+      const job = await ownedJob(req, res);
+      if (!job) return;
+
+      const queue = getJobQueue(jobScript);
+      let last = parseInt(String(req.query.after || '0')) || 0;
+      const send = (event: JobEvent) => {
+        if (event.seq <= last || res.writableEnded) return;
+        last = event.seq;
+        res.write(JSON.stringify(event) + "\n");
+        if (event.type === 'status' && TERMINAL_JOB_STATUSES.includes(event.status as string)) {
+          res.end();
+        }
+      };
+
+      // Subscribe before replaying so no event falls between the two
+      const live: JobEvent[] = [];
+      let replaying = true;
+      const unsubscribe = queue.subscribe(job.id, (event) => replaying ? live.push(event) : send(event));
+      res.on('close', unsubscribe);
+      res.setHeader('Content-Type', 'application/x-ndjson');
+      for (const event of await queue.eventsAfter(job.id, last)) {
+        send(event);
+      }
+      replaying = false;
+      live.forEach(send);
+    } catch (error) {
+      next(error);
+    }
+  });
+
+  // The finished run's result, in the same shape (and ?format=binary
+  // option) as /api/run; 409 while the job has no result yet
+  app.get("/api/jobs/:jobId/result", async (req, res, next) => {
+    try {
+      if (!req.isAuthenticated() && !req.isGuest?.()) {
+        return res.status(401).json({ message: "Authentication required" });
+      }
+      const job = await ownedJob(req, res);
+      if (!job) return;
+      if (!job.result_file) {
+        return res.status(409).json({ message: `Job is ${job.status}`, status: job.status, error: job.error });
+      }
+      return sendRunResult(req, res, job.technique, { result_file: job.result_file }, true);
+    } catch (error) {
+      next(error);
+    }
+  });
+
+  // Cancel a queued job, or stop a running one (SIGTERM, then SIGKILL)
+  app.delete("/api/jobs/:jobId", async (req, res, next) => {
+    try {
+      if (!req.isAuthenticated() && !req.isGuest?.()) {
+        return res.status(401).json({ message: "Authentication required" });
+      }
+      const job = await ownedJob(req, res);
+      if (!job) return;
+      res.json(publicJob(await getJobQueue(jobScript).cancel(job.id)));
+    } catch (error) {
+      next(error);
+    }
+  });
+
+  // Run counts, wall time and per-stage time of the runs the server has
+  // relayed, in the Prometheus text format
+  app.get("/api/metrics", (req, res) => {
+    res.type("text/plain; version=0.0.4").send(renderMetrics());
+  });
+
+  // Run every technique the constraint rules allow (or `techniques` from
+  // the body) on one load of the dataset. Streams newline-delimited JSON: a
+  // "start" line with the chosen and skipped techniques, one "result" line
+  // per technique as soon as it finishes, then a "summary".
+  app.post("/api/run-all/:datasetId", async (req, res, next) => {
+    try {
+      if (!req.isAuthenticated() && !req.isGuest?.()) {
+        return res.status(401).json({ message: "Authentication required" });
+      }
+
+      const { datasetId } = req.params;
+      const dataset = await storage.getDataset(parseInt(datasetId));
+      if (!dataset || !dataset.filePath || !fs.existsSync(dataset.filePath)) {
+        return res.status(404).json({ message: "Dataset not found" });
+      }
+      if (!canUseDataset(req, dataset)) {
+        return res.status(403).json({ message: "Access denied" });
+      }
+      const artifactDir = findColumnarArtifact(datasetId, dataset.filePath);
+      const dtypes = artifactDir ? null : getDtypeHints(dataset.schemaData);
+
+      const { techniques, ...params } = req.body || {};
+      const args = [path.join(process.cwd(), 'backend/api/run_model.py'), 'multi', artifactDir || dataset.filePath];
+      if (Array.isArray(techniques) && techniques.length) {
+        args.push(`techniques=${techniques.join(',')}`);
+      }
+      for (const [key, value] of Object.entries(params)) {
+        args.push(`${key}=${value}`);
+      }
+      if (dtypes) {
+        args.push(`dtypes=${JSON.stringify(dtypes)}`);
+      }
+
+      const pythonProcess = spawn('python', args, { cwd: process.cwd() });
+      res.setHeader('Content-Type', 'application/x-ndjson');
+      pythonProcess.stdout.pipe(res);
+      pythonProcess.stderr.on('data', (data: Buffer) => {
+        console.error('[PYTHON ERROR] multi-run:', data.toString());
+      });
+      // Stop the remaining techniques if the client goes away
+      res.on('close', () => {
+        if (pythonProcess.exitCode === null) pythonProcess.kill();
+      });
+    } catch (error) {
+      next(error);
+    }
+  });
+
+  // Tune one technique's params on one load of the dataset by successive
+  // halving. The body holds an optional `space` (param -> list of choices or
+  // {low, high, log, int}) plus n_trials, eta, min_rows, objective,
+  // direction, workers and the shared technique params. Streams
+  // newline-delimited JSON: "trial" and "rung" lines, then a "summary" with
+  // the leaderboard and the best configuration's full result.
+  app.post("/api/tune/:datasetId/:technique", async (req, res, next) => {
+    try {
+      if (!req.isAuthenticated() && !req.isGuest?.()) {
+        return res.status(401).json({ message: "Authentication required" });
+      }
+
+      // run_model.py rejects unsupported techniques with an "error" line
+      const { datasetId, technique } = req.params;
+      const dataset = await storage.getDataset(parseInt(datasetId));
+      if (!dataset || !dataset.filePath || !fs.existsSync(dataset.filePath)) {
+        return res.status(404).json({ message: "Dataset not found" });
+      }
+      if (!canUseDataset(req, dataset)) {
+        return res.status(403).json({ message: "Access denied" });
+      }
+      const artifactDir = findColumnarArtifact(datasetId, dataset.filePath);
+      const dtypes = artifactDir ? null : getDtypeHints(dataset.schemaData);
+
+      const { space, ...params } = req.body || {};
+      const args = [path.join(process.cwd(), 'backend/api/run_model.py'), 'tune', technique, artifactDir || dataset.filePath];
+      if (space) {
+        args.push(`space=${JSON.stringify(space)}`);
+      }
+      for (const [key, value] of Object.entries(params)) {
+        args.push(`${key}=${value}`);
+      }
+      if (dtypes) {
+        args.push(`dtypes=${JSON.stringify(dtypes)}`);
+      }
+
+      const pythonProcess = spawn('python', args, { cwd: process.cwd() });
+      res.setHeader('Content-Type', 'application/x-ndjson');
+      pythonProcess.stdout.pipe(res);
+      pythonProcess.stderr.on('data', (data: Buffer) => {
+        console.error('[PYTHON ERROR] tuning:', data.toString());
+      });
+      // Stop the remaining trials if the client goes away
+      res.on('close', () => {
+        if (pythonProcess.exitCode === null) pythonProcess.kill();
+      });
+    } catch (error) {
+      next(error);
+    }
+  });
+
+  // Score a CSV of new rows against the dataset's saved isolation forest.
+  // The response is newline-delimited JSON streamed as Python scores each
+  // chunk ("chunk" lines with offset, scores and labels, then a "summary"),
+  // so neither process holds the whole batch in memory.
+  const scoreUpload = multer({ dest: path.join(os.tmpdir(), 'bumpdata-uploads') });
+  app.post("/api/anomaly/:datasetId/score", scoreUpload.single('file'), async (req, res, next) => {
+    try {
+      if (!req.isAuthenticated() && !req.isGuest?.()) {
+        return res.status(401).json({ message: "Authentication required" });
+      }
+      if (!req.file) {
+        return res.status(400).json({ message: "No file uploaded" });
+      }
+
+      const { datasetId } = req.params;
+      const dataset = await storage.getDataset(parseInt(datasetId));
+      if (!dataset) {
+        fs.unlink(req.file.path, () => {});
+        return res.status(404).json({ message: "Dataset not found" });
+      }
+      // Scoring refits and saves the dataset's forest
+      if (!canUseDataset(req, dataset)) {
+        fs.unlink(req.file.path, () => {});
+        return res.status(403).json({ message: "Access denied" });
+      }
+
+      const args = ['-m', 'server.utils.anomaly_stream', 'score', `dataset-${datasetId}`, req.file.path];
+      // The first batch for a dataset fits its forest on the dataset itself
+      if (dataset.filePath && fs.existsSync(dataset.filePath)) {
+        args.push('--dataset', dataset.filePath);
+      }
+      const chunkRows = parseInt(String(req.query.chunk_rows ?? ''));
+      if (!isNaN(chunkRows) && chunkRows > 0) {
+        args.push('--chunk-rows', String(chunkRows));
+      }
+
+      const uploadedPath = req.file.path;
+      const pythonProcess = spawn('python', args, { cwd: process.cwd() });
+      res.setHeader('Content-Type', 'application/x-ndjson');
+      pythonProcess.stdout.pipe(res);
+      pythonProcess.stderr.on('data', (data: Buffer) => {
+        console.error('[PYTHON ERROR] anomaly scoring:', data.toString());
+      });
+      pythonProcess.on('close', () => fs.unlink(uploadedPath, () => {}));
+      // Stop scoring if the client goes away mid-stream
+      res.on('close', () => {
+        if (pythonProcess.exitCode === null) pythonProcess.kill();
+      });
+    } catch (error) {
+      next(error);
+    }
+  });
+
+  // Apply a stored model (the `stats.model_id` of an earlier run) to new
+  // rows sent as `{ rows: [...records], method? }`. A warm worker keeps
+  // recently used models loaded, so no refit or reload is needed.
+  app.post("/api/predict/:modelId", async (req, res, next) => {
+    try {
+      if (!req.isAuthenticated() && !req.isGuest?.()) {
+        return res.status(401).json({ message: "Authentication required" });
+      }
+      const { modelId } = req.params;
+      const { rows, method } = req.body ?? {};
+      if (!/^[0-9a-f]{64}$/.test(modelId)) {
+        return res.status(400).json({ message: "Invalid model id" });
+      }
+      if (!Array.isArray(rows) || rows.length === 0) {
+        return res.status(400).json({ message: "Request body must contain a non-empty rows array" });
+      }
+
+      const workerScript = path.join(process.cwd(), 'backend/api/run_model.py');
+      const pool = fs.existsSync(workerScript) ? getPythonPool(workerScript) : null;
+      let result;
+      if (pool) {
+        result = await pool.run({ action: "predict", model_id: modelId, rows, method });
+      } else {
+        const rowsFile = path.join(os.tmpdir(), `predict_${Date.now()}_${Math.random().toString(36).slice(2)}.json`);
+        await fs.promises.writeFile(rowsFile, JSON.stringify(rows));
+        const args = [path.join(process.cwd(), 'server/api/run_model.py'), 'predict', modelId, rowsFile];
+        if (method) args.push(String(method));
+        result = await new Promise((resolve, reject) => {
+          let output = '';
+          const pythonProcess = spawn('python', args, { cwd: process.cwd() });
+          pythonProcess.stdout.on('data', (data: Buffer) => { output += data.toString(); });
+          pythonProcess.stderr.on('data', (data: Buffer) => {
+            console.error('[PYTHON ERROR] predict:', data.toString());
+          });
+          pythonProcess.on('close', () => {
+            fs.unlink(rowsFile, () => {});
+            try {
+              resolve(JSON.parse(output.substring(output.indexOf('{'))));
+            } catch (err) {
+              reject(err);
+            }
+          });
+        });
+      }
+
+      if (result?.error) {
+        const status = String(result.error).includes("No stored model") ? 404 : 400;
+        return res.status(status).json(result);
+      }
+      res.json(result);
+    } catch (error) {
+      next(error);
+    }
+  });
+
+  // Score a whole file with a stored model: an uploaded CSV, or an existing
+  // dataset (`datasetId` in the body, read from its columnar artifact when
+  // fresh). Streams newline-delimited JSON "progress" lines with rows per
+  // second, then a "summary" whose `output` is the id to download the
+  // predictions with from /api/predict/outputs/:outputId.
+  app.post("/api/predict/:modelId/batch", scoreUpload.single('file'), async (req, res, next) => {
+    try {
+      if (!req.isAuthenticated() && !req.isGuest?.()) {
+        return res.status(401).json({ message: "Authentication required" });
+      }
+      const { modelId } = req.params;
+      if (!/^[0-9a-f]{64}$/.test(modelId)) {
+        if (req.file) fs.unlink(req.file.path, () => {});
+        return res.status(400).json({ message: "Invalid model id" });
+      }
+
+      let inputPath: string | null = req.file ? req.file.path : null;
+      if (!inputPath && req.body?.datasetId) {
+        const dataset = await storage.getDataset(parseInt(req.body.datasetId));
+        if (!dataset || !dataset.filePath || !fs.existsSync(dataset.filePath)) {
+          return res.status(404).json({ message: "Dataset not found" });
+        }
+        if (!canUseDataset(req, dataset)) {
+          return res.status(403).json({ message: "Access denied" });
+        }
+        inputPath = findColumnarArtifact(dataset.id, dataset.filePath) || dataset.filePath;
+      }
+      if (!inputPath) {
+        return res.status(400).json({ message: "Upload a file or pass a datasetId" });
+      }
+
+      prunePredictionOutputs();
+      const outputDir = path.join(getPredictionsRoot(), randomBytes(16).toString('hex'));
+      const args = ['-m', 'server.utils.batch_predict', modelId, inputPath, outputDir];
+      if (req.body?.method) args.push('--method', String(req.body.method));
+      const chunkRows = parseInt(String(req.body?.chunkRows ?? req.query.chunk_rows ?? ''));
+      if (!isNaN(chunkRows) && chunkRows > 0) args.push('--chunk-rows', String(chunkRows));
+
+      const uploadedPath = req.file?.path;
+      const pythonProcess = spawn('python', args, { cwd: process.cwd() });
+      res.setHeader('Content-Type', 'application/x-ndjson');
+      pythonProcess.stdout.pipe(res);
+      pythonProcess.stderr.on('data', (data: Buffer) => {
+        console.error('[PYTHON ERROR] batch prediction:', data.toString());
+      });
+      pythonProcess.on('close', () => {
+        if (uploadedPath) fs.unlink(uploadedPath, () => {});
+      });
+      // Stop scoring if the client goes away mid-stream
+      res.on('close', () => {
+        if (pythonProcess.exitCode === null) pythonProcess.kill();
+      });
+    } catch (error) {
+      next(error);
+    }
+  });
+
+  // Download the predictions of a batch run as CSV. The output id is random
+  // and only handed to the client that started the run.
+  app.get("/api/predict/outputs/:outputId", (req, res, next) => {
+    try {
+      if (!req.isAuthenticated() && !req.isGuest?.()) {
+        return res.status(401).json({ message: "Authentication required" });
+      }
+      const { outputId } = req.params;
+      if (!/^[0-9a-f]{32}$/.test(outputId)) {
+        return res.status(400).json({ message: "Invalid output id" });
+      }
+      const outputDir = path.join(getPredictionsRoot(), outputId);
+      if (!fs.existsSync(path.join(outputDir, 'manifest.json'))) {
+        return res.status(404).json({ message: "Predictions not found" });
+      }
+
+      const pythonProcess = spawn('python', ['-m', 'server.utils.batch_predict', 'csv', outputDir], { cwd: process.cwd() });
+      res.setHeader('Content-Type', 'text/csv');
+      res.setHeader('Content-Disposition', `attachment; filename="predictions-${outputId}.csv"`);
+      pythonProcess.stdout.pipe(res);
+      pythonProcess.stderr.on('data', (data: Buffer) => {
+        console.error('[PYTHON ERROR] predictions download:', data.toString());
+      });
+      res.on('close', () => {
+        if (pythonProcess.exitCode === null) pythonProcess.kill();
+      });
+    } catch (error) {
+      next(error);
+    }
+  });
+
   // Dataset data access endpoint - returns sample rows
   app.get("/api/data/:datasetId", async (req, res, next) => {
     try {
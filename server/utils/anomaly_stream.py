@@ -0,0 +1,398 @@
+"""
+Incremental isolation-forest scoring for datasets that grow over time.
+
+A forest is fitted once per dataset (identified by a model key such as
+"dataset-42") and persisted under uploads/.models/isolation_forest. Later
+runs only score rows that were not seen before, in chunks, without
+refitting. Alongside the model the state keeps:
+
+- a uniform reservoir sample of every row seen, which a refit trains on,
+  so refitting never needs the whole dataset in memory
+- the decile edges of the training anomaly scores and the bin counts of
+  every score since the last fit, for the drift signal: the population
+  stability index (PSI) of new scores against the training distribution
+
+The forest is refitted when PSI exceeds DRIFT_PSI_THRESHOLD or the rows
+scored since the last fit reach refit_ratio times the rows it was fitted on.
+
+Usage (streams one JSON object per line: a "chunk" per scored chunk, then a
+"summary"):
+    python -m server.utils.anomaly_stream score <model_key> <csv> [--dataset <path>] [--chunk-rows N]
+    python -m server.utils.anomaly_stream info <model_key>
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import argparse
+import contextlib
+
+import numpy as np
+import pandas as pd
+import joblib
+from sklearn.ensemble import IsolationForest
+
+try:
+    import fcntl
+except ImportError:  # Not on POSIX: runs on one key are not serialized
+    fcntl = None
+
+from .json_utils import NpEncoder
+from .thread_budget import allotted_threads
+from .model_store import get_model_root
+
+STATE_VERSION = 1
+DEFAULT_CHUNK_ROWS = 50_000
+DEFAULT_RESERVOIR_ROWS = 50_000
+DEFAULT_REFIT_RATIO = 1.0
+DRIFT_PSI_THRESHOLD = 0.2
+SCORE_BINS = 10
+
+def get_model_dir():
+    """Directory for persisted forests (under BUMP_MODEL_CACHE)"""
+    return os.path.join(get_model_root(), "isolation_forest")
+
+def _state_path(model_key):
+    safe = re.sub(r"[^A-Za-z0-9_.-]", "_", str(model_key))
+    return os.path.join(get_model_dir(), f"{safe}.joblib")
+
+@contextlib.contextmanager
+def locked(model_key):
+    """Serialize load-score-save cycles on one model key across processes"""
+    os.makedirs(get_model_dir(), exist_ok=True)
+    with open(_state_path(model_key) + ".lock", "w") as handle:
+        if fcntl:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+def _psi(expected, actual):
+    """Population stability index between two bin-fraction vectors"""
+    expected = np.clip(expected, 1e-6, None)
+    actual = np.clip(actual, 1e-6, None)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+class ForestState:
+    """A fitted forest plus what is needed to extend it to new rows"""
+
+    def __init__(self, columns, contamination=0.1, random_state=42,
+                 reservoir_rows=DEFAULT_RESERVOIR_ROWS):
+        self.version = STATE_VERSION
+        self.columns = list(columns)
+        self.contamination = contamination
+        self.random_state = random_state
+        self.reservoir_rows = reservoir_rows
+        self.rng = np.random.default_rng(random_state)
+        self.reservoir = np.empty((0, len(self.columns)))
+        self.seen = 0
+        self.model = None
+        self.fit_rows = 0
+        self.rows_since_fit = 0
+        self.refits = 0
+        self.score_edges = None
+        self.score_counts = np.zeros(SCORE_BINS, dtype=np.int64)
+        self.fitted_at = None
+        # Dataset rows consumed by score_appended, and a digest of them
+        self.dataset_rows = None
+        self.dataset_digest = None
+
+    def features(self, df):
+        """Feature matrix for the state's columns; missing columns are an error"""
+        missing = [c for c in self.columns if c not in df.columns]
+        if missing:
+            raise ValueError(f"Columns missing from new rows: {missing}")
+        return df[self.columns].to_numpy(dtype=float)
+
+    def remember(self, X):
+        """Add rows to the reservoir sample (algorithm R)"""
+        X = X[~np.isnan(X).any(axis=1)]
+        free = self.reservoir_rows - len(self.reservoir)
+        if free > 0:
+            self.reservoir = np.vstack((self.reservoir, X[:free]))
+            self.seen += min(free, len(X))
+            X = X[free:]
+        if not len(X):
+            return
+        positions = self.seen + np.arange(len(X))
+        slots = (self.rng.random(len(X)) * (positions + 1)).astype(np.int64)
+        accepted = np.flatnonzero(slots < self.reservoir_rows)
+        # Later rows win when two draw the same slot, as in the sequential algorithm
+        self.reservoir[slots[accepted]] = X[accepted]
+        self.seen += len(X)
+
+    def fit(self, X=None):
+        """Fit on X, or refit on the reservoir sample"""
+        on_reservoir = X is None
+        X = self.reservoir if on_reservoir else X
+        X = X[~np.isnan(X).any(axis=1)]
+        if not len(X):
+            raise ValueError("No complete rows to fit the forest on")
+        self.model = IsolationForest(
+            contamination=self.contamination,
+            n_jobs=allotted_threads(),
+            random_state=self.random_state
+        ).fit(X)
+        scores = self.model.decision_function(X)
+        # Decile edges of the training scores; new scores are binned on them
+        self.score_edges = np.quantile(scores, np.linspace(0, 1, SCORE_BINS + 1)[1:-1])
+        self.score_counts = np.zeros(SCORE_BINS, dtype=np.int64)
+        # The refit threshold is relative to every row the sample stands for
+        self.fit_rows = max(self.seen, len(X)) if on_reservoir else len(X)
+        self.rows_since_fit = 0
+        self.fitted_at = time.time()
+        return self
+
+    def score(self, X):
+        """
+        Score rows without refitting.
+
+        Rows with missing values get a NaN score and label 0.
+
+        Returns:
+            (scores, labels) with labels -1 for anomalies and 1 for normal rows
+        """
+        scores = np.full(len(X), np.nan)
+        labels = np.zeros(len(X), dtype=np.int8)
+        complete = ~np.isnan(X).any(axis=1)
+        if complete.any():
+            scores[complete] = self.model.decision_function(X[complete])
+            labels[complete] = np.where(scores[complete] < 0, -1, 1)
+            bins = np.searchsorted(self.score_edges, scores[complete])
+            self.score_counts += np.bincount(bins, minlength=SCORE_BINS)
+        self.rows_since_fit += int(complete.sum())
+        return scores, labels
+
+    def drift(self):
+        """PSI of the scores since the last fit against the training deciles"""
+        total = self.score_counts.sum()
+        if not total:
+            return 0.0
+        return _psi(np.full(SCORE_BINS, 1.0 / SCORE_BINS), self.score_counts / total)
+
+    def refit_reason(self, refit_ratio=DEFAULT_REFIT_RATIO, min_rows=1000):
+        """Why the forest should be refitted now, or None"""
+        if self.rows_since_fit >= min_rows and self.drift() > DRIFT_PSI_THRESHOLD:
+            return "drift"
+        if refit_ratio and self.rows_since_fit >= refit_ratio * self.fit_rows:
+            return "row_threshold"
+        return None
+
+    def info(self):
+        return {
+            "columns": self.columns,
+            "fit_rows": self.fit_rows,
+            "rows_seen": self.seen,
+            "rows_since_fit": self.rows_since_fit,
+            "refits": self.refits,
+            "drift_psi": round(self.drift(), 4),
+            "fitted_at": self.fitted_at
+        }
+
+def load_state(model_key):
+    """The persisted state for a key, or None"""
+    path = _state_path(model_key)
+    if not os.path.exists(path):
+        return None
+    try:
+        state = joblib.load(path)
+    except Exception:
+        return None
+    return state if getattr(state, "version", None) == STATE_VERSION else None
+
+def save_state(model_key, state):
+    path = _state_path(model_key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp = f"{path}.{os.getpid()}.tmp"
+    joblib.dump(state, temp)
+    os.replace(temp, path)
+
+def _iter_chunks(source, chunk_rows):
+    if isinstance(source, pd.DataFrame):
+        for start in range(0, len(source), chunk_rows):
+            yield source.iloc[start:start + chunk_rows]
+    else:
+        yield from pd.read_csv(source, chunksize=chunk_rows)
+
+def fit_from_source(model_key, source, columns=None, contamination=0.1, random_state=42,
+                    chunk_rows=DEFAULT_CHUNK_ROWS, reservoir_rows=DEFAULT_RESERVOIR_ROWS):
+    """
+    Fit and persist a forest from a DataFrame or CSV path, reading it in
+    chunks into the reservoir sample.
+    """
+    state = None
+    for chunk in _iter_chunks(source, chunk_rows):
+        if state is None:
+            columns = columns or chunk.select_dtypes(include='number').columns.tolist()
+            if not columns:
+                raise ValueError("At least 1 numeric column required")
+            state = ForestState(columns, contamination, random_state, reservoir_rows)
+        state.remember(state.features(chunk))
+    if state is None:
+        raise ValueError("No rows to fit the forest on")
+    state.fit()
+    state.rows_since_fit = 0
+    save_state(model_key, state)
+    return state
+
+def _row_hashes(df, columns):
+    """One 64-bit hash per row of the given columns"""
+    return pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+
+def _digest(row_hashes):
+    return hashlib.sha256(row_hashes.tobytes()).hexdigest()
+
+def _json_scores(scores):
+    """Scores as a list with None for unscored rows (NaN is not valid JSON)"""
+    values = scores.astype(object)
+    values[np.isnan(scores)] = None
+    return values.tolist()
+
+def _score_source(state, source, chunk_rows, remember=True):
+    """Score a source chunk by chunk, yielding (offset, scores, labels)"""
+    offset = 0
+    for chunk in _iter_chunks(source, chunk_rows):
+        X = state.features(chunk)
+        scores, labels = state.score(X)
+        if remember:
+            state.remember(X)
+        yield offset, scores, labels
+        offset += len(X)
+
+def _finish(model_key, state, refit_ratio, rows, anomalies, fitted, elapsed, scored_training=False):
+    """Refit if needed, persist the state and summarize the run"""
+    drift = state.drift()
+    reason = None if scored_training else state.refit_reason(refit_ratio)
+    if scored_training:
+        # The rows just scored are the training rows
+        state.rows_since_fit = 0
+        state.score_counts[:] = 0
+    elif reason:
+        state.fit()
+        state.refits += 1
+    save_state(model_key, state)
+    return {
+        "rows_scored": rows,
+        "n_outliers": anomalies,
+        "fitted": fitted,
+        "refit": reason,
+        "drift_psi": round(drift, 4),
+        "rows_per_second": round(rows / elapsed, 1) if elapsed > 0 else None,
+        "model": state.info()
+    }
+
+def stream_scores(model_key, source, chunk_rows=DEFAULT_CHUNK_ROWS, refit_ratio=DEFAULT_REFIT_RATIO,
+                  fit_source=None, contamination=0.1, random_state=42):
+    """
+    Score new rows chunk by chunk with the persisted forest.
+
+    Args:
+        model_key: identifies the dataset's forest
+        source: DataFrame or CSV path of rows to score
+        fit_source: DataFrame or CSV path to fit from when no forest exists
+            yet (defaults to source itself)
+
+    Yields:
+        {"type": "chunk", "offset", "rows", "scores", "labels"} per chunk,
+        then {"type": "summary", ...} after the state was saved (and
+        refitted if needed)
+    """
+    with locked(model_key):
+        state = load_state(model_key)
+        fitted = state is None
+        if fitted:
+            state = fit_from_source(model_key, fit_source if fit_source is not None else source,
+                                    contamination=contamination, random_state=random_state,
+                                    chunk_rows=chunk_rows)
+
+        rows = anomalies = 0
+        started = time.perf_counter()
+        remember = not (fitted and fit_source is None)
+        for offset, scores, labels in _score_source(state, source, chunk_rows, remember):
+            rows += len(scores)
+            anomalies += int((labels == -1).sum())
+            yield {"type": "chunk", "offset": offset, "rows": len(scores),
+                   "scores": _json_scores(scores), "labels": labels}
+
+        summary = _finish(model_key, state, refit_ratio, rows, anomalies, fitted,
+                          time.perf_counter() - started, scored_training=not remember)
+        yield {"type": "summary", **summary}
+
+def score_appended(model_key, df, columns=None, chunk_rows=DEFAULT_CHUNK_ROWS,
+                   refit_ratio=DEFAULT_REFIT_RATIO, contamination=0.1, random_state=42):
+    """
+    Score the rows appended to a dataset since the last call.
+
+    The state remembers how many dataset rows it has consumed and a digest
+    of them. The first call, or a dataset whose leading rows no longer
+    match the digest (it shrank or was replaced), fits on df and scores all
+    of it.
+
+    Returns:
+        (first_row, scores, labels, summary) where scores and labels cover
+        df rows first_row onwards
+    """
+    with locked(model_key):
+        state = load_state(model_key)
+        consumed = getattr(state, "dataset_rows", None)
+        fitted = state is None or consumed is None or consumed > len(df) or (
+            columns is not None and list(columns) != state.columns) or any(
+            c not in df.columns for c in state.columns)
+        row_hashes = None
+        if not fitted:
+            row_hashes = _row_hashes(df, state.columns)
+            fitted = _digest(row_hashes[:consumed]) != getattr(state, "dataset_digest", None)
+        if fitted:
+            state = fit_from_source(model_key, df, columns=columns, contamination=contamination,
+                                    random_state=random_state, chunk_rows=chunk_rows)
+            first_row = 0
+            row_hashes = None
+        else:
+            first_row = consumed
+
+        started = time.perf_counter()
+        parts = list(_score_source(state, df.iloc[first_row:], chunk_rows, remember=not fitted))
+        scores = np.concatenate([p[1] for p in parts]) if parts else np.empty(0)
+        labels = np.concatenate([p[2] for p in parts]) if parts else np.empty(0, dtype=np.int8)
+        state.dataset_rows = len(df)
+        state.dataset_digest = _digest(row_hashes if row_hashes is not None else _row_hashes(df, state.columns))
+        summary = _finish(model_key, state, refit_ratio, len(scores), int((labels == -1).sum()),
+                          fitted, time.perf_counter() - started, scored_training=fitted)
+        return first_row, scores, labels, summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Incremental isolation-forest scoring")
+    commands = parser.add_subparsers(dest="command", required=True)
+    score = commands.add_parser("score", help="Score a CSV of new rows, one JSON line per chunk")
+    score.add_argument("model_key")
+    score.add_argument("csv")
+    score.add_argument("--dataset", help="Fit from this CSV if the key has no forest yet")
+    score.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    score.add_argument("--refit-ratio", type=float, default=DEFAULT_REFIT_RATIO)
+    score.add_argument("--contamination", type=float, default=0.1)
+    info = commands.add_parser("info", help="Show the persisted forest for a key")
+    info.add_argument("model_key")
+    args = parser.parse_args(argv)
+
+    if args.command == "info":
+        state = load_state(args.model_key)
+        print(json.dumps(state.info() if state else {"error": "No model for this key"}, cls=NpEncoder))
+        return 0 if state else 1
+
+    try:
+        for message in stream_scores(args.model_key, args.csv, args.chunk_rows, args.refit_ratio,
+                                     fit_source=args.dataset, contamination=args.contamination):
+            sys.stdout.write(json.dumps(message, cls=NpEncoder) + "\n")
+            sys.stdout.flush()
+    except Exception as e:
+        sys.stdout.write(json.dumps({"type": "error", "error": str(e)}) + "\n")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
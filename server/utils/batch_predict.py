@@ -0,0 +1,390 @@
+"""
+Batch scoring of large files with a stored model.
+
+A model fitted by an earlier run (its `stats.model_id`, see model_store) is
+applied to another file without refitting:
+
+- the input is a CSV or a columnar artifact directory (see dataset_cache);
+  only the model's feature columns are read, one chunk of rows at a time
+- chunks are predicted in a process pool sized by the thread budget; each
+  worker loads the model once (memory-mapped) and, for columnar input, maps
+  the input columns itself so only row ranges cross the process boundary
+- predictions are appended to per-column files and published as a columnar
+  artifact, so the output loads with `dataset_cache.load_artifact` and can be
+  fed to another technique run
+- a progress callback receives rows done, rows per second and, when the
+  input size is known, the fraction done
+
+Output columns are float64. Rows with a missing feature value get NaN unless
+the model imputes them (see preprocessing.FeatureSet.pipeline) or the
+estimator accepts missing values itself. `predict` writes a `prediction`
+column, which is categorical for classifiers with non-numeric labels;
+methods returning one value per class or component write one column per
+class (`predict_proba_<class>`) or index (`transform_<i>`). The number of
+output columns is found with a one-row probe before anything is written.
+
+Usage:
+    python -m server.utils.batch_predict <model_id> <input> <output_dir>
+        [--method NAME] [--chunk-rows N] [--workers N]
+    python -m server.utils.batch_predict csv <output_dir>
+        (writes published predictions to stdout as CSV)
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+import numpy as np
+import pandas as pd
+from threadpoolctl import threadpool_limits
+
+from .json_utils import NpEncoder
+from .thread_budget import allotted_threads
+from .dataset_cache import is_artifact, read_manifest, load_artifact, MANIFEST_NAME, MANIFEST_VERSION
+from .model_store import load_model, resolve_method, apply_model
+
+DEFAULT_CHUNK_ROWS = 50_000
+# Below this many rows, starting worker processes costs more than it saves
+DEFAULT_POOL_MIN_ROWS = 200_000
+COPY_BLOCK_ROWS = 1_000_000
+
+def _allows_nan(estimator):
+    try:
+        from sklearn.utils import get_tags
+        return bool(get_tags(estimator).input_tags.allow_nan)
+    except Exception:
+        return False
+
+def _accepts_missing(estimator):
+    # Pipeline tags do not carry allow_nan: a stored pipeline accepts missing
+    # values when its preprocessing imputes them or its estimator handles them
+    steps = [step for _, step in getattr(estimator, "steps", [])] or [estimator]
+    return _allows_nan(steps[0]) or _allows_nan(steps[-1])
+
+def _label_categories(artifact, method):
+    """The class labels when `predict` returns non-numeric ones, else None"""
+    if method != "predict":
+        return None
+    classes = artifact.get("classes")
+    if classes is None:
+        classes = getattr(artifact["estimator"], "classes_", None)
+    if classes is None or np.asarray(classes).dtype.kind in "biuf":
+        return None
+    return list(classes)
+
+def _output_width(artifact, method):
+    """Number of columns `method` returns, from a one-row probe"""
+    features = artifact["features"]
+    probe = pd.DataFrame(np.zeros((1, len(features))), columns=features)
+    return np.asarray(apply_model(artifact, probe, method)).reshape(1, -1).shape[1]
+
+def _score_frame(artifact, method, frame):
+    """
+    Predictions for one chunk as a 2-D array (rows x outputs): float64, or
+    int32 category codes (-1 for unscored rows) for non-numeric labels
+    """
+    frame = frame[artifact["features"]]
+    output = None
+    categories = _label_categories(artifact, method)
+    if _accepts_missing(artifact["estimator"]):
+        complete = np.ones(len(frame), dtype=bool)
+    else:
+        complete = frame.notna().all(axis=1).to_numpy()
+    if complete.any():
+        scored = apply_model(artifact, frame[complete] if not complete.all() else frame, method)
+        if categories is not None:
+            scored = np.ravel(scored)
+            output = np.full((len(frame), 1), -1, dtype=np.int32)
+            # Label-encoded models already predict positions in `classes`
+            output[complete, 0] = scored if scored.dtype.kind in "iu" else \
+                pd.Categorical(scored, categories=categories).codes
+        else:
+            scored = np.asarray(scored, dtype=np.float64).reshape(int(complete.sum()), -1)
+            output = np.full((len(frame), scored.shape[1]), np.nan)
+            output[complete] = scored
+    return output, int((~complete).sum())
+
+# Worker-process state, set once by _init_worker
+_worker = {}
+
+def _init_worker(model_id, method, artifact_path):
+    # Each worker is one of the job's allotted threads; nested BLAS/OpenMP
+    # pools would oversubscribe the host
+    threadpool_limits(limits=1)
+    artifact = load_model(model_id)
+    _worker.update(artifact=artifact, method=method, frame=None)
+    if artifact_path:
+        _worker["frame"] = load_artifact(artifact_path, columns=artifact["features"])
+
+def _score_rows(start, stop):
+    return _score_frame(_worker["artifact"], _worker["method"], _worker["frame"].iloc[start:stop])
+
+def _score_chunk(frame):
+    return _score_frame(_worker["artifact"], _worker["method"], frame)
+
+def _iter_input(source, features, chunk_rows):
+    """
+    Yield (task, n_rows, fraction) per chunk, where a task is either a
+    (start, stop) row range of a columnar artifact or a DataFrame chunk
+    """
+    if is_artifact(source):
+        total = read_manifest(source)["rows"]
+        for start in range(0, total, chunk_rows):
+            stop = min(start + chunk_rows, total)
+            yield (start, stop), stop - start, stop / total if total else 1.0
+        return
+
+    size = os.path.getsize(source)
+    with open(source, "rb") as handle:
+        reader = pd.read_csv(handle, usecols=features, dtype={c: "float64" for c in features},
+                             chunksize=chunk_rows)
+        for chunk in reader:
+            # The parser reads ahead in blocks, so this is approximate
+            yield chunk, len(chunk), min(handle.tell() / size, 1.0) if size else 1.0
+
+def _output_names(method, width, classes):
+    if method == "predict" and width == 1:
+        return ["prediction"]
+    if method == "predict_proba" and classes and len(classes) == width:
+        return [f"{method}_{c}" for c in classes]
+    if width == 1:
+        return [method]
+    return [f"{method}_{i}" for i in range(width)]
+
+class _ColumnarWriter:
+    """
+    Append output columns chunk by chunk, then publish a manifest. The
+    columns are float64, or int32 category codes when categories are given.
+    """
+
+    def __init__(self, output, width, categories=None):
+        self.output = os.path.abspath(output)
+        parent = os.path.dirname(self.output)
+        os.makedirs(parent, exist_ok=True)
+        self.scratch = tempfile.mkdtemp(prefix=".batch-", dir=parent)
+        self.categories = categories
+        self.dtype = np.dtype(np.int32 if categories is not None else np.float64)
+        self.files = [open(os.path.join(self.scratch, f"c{i}.bin"), "wb") for i in range(width)]
+        self.rows = 0
+        self.digest = hashlib.sha256()
+
+    def empty_block(self, n_rows):
+        """Output for rows that could not be scored"""
+        return np.full((n_rows, len(self.files)), -1 if self.categories is not None else np.nan, dtype=self.dtype)
+
+    def append(self, block):
+        if block.shape[1] != len(self.files):
+            raise ValueError(f"Expected {len(self.files)} output columns, got {block.shape[1]}")
+        block = block.astype(self.dtype, copy=False)
+        for i, f in enumerate(self.files):
+            data = np.ascontiguousarray(block[:, i]).tobytes()
+            f.write(data)
+            self.digest.update(data)
+        self.rows += len(block)
+
+    def publish(self, names, extra):
+        columns = []
+        for i, name in enumerate(names):
+            raw = os.path.join(self.scratch, f"c{i}.bin")
+            self.files[i].close()
+            target = np.lib.format.open_memmap(os.path.join(self.scratch, f"c{i}.npy"), mode="w+",
+                                               dtype=self.dtype, shape=(self.rows,))
+            if self.rows:
+                source = np.memmap(raw, dtype=self.dtype, mode="r", shape=(self.rows,))
+                for start in range(0, self.rows, COPY_BLOCK_ROWS):
+                    target[start:start + COPY_BLOCK_ROWS] = source[start:start + COPY_BLOCK_ROWS]
+                del source
+            target.flush()
+            del target
+            if os.path.exists(raw):
+                os.remove(raw)
+            if self.categories is None:
+                columns.append({"name": name, "file": f"c{i}.npy", "dtype": "float64", "kind": "numeric"})
+                continue
+            # The same layout dataset_cache uses for text columns
+            categories_file = f"c{i}.categories.npy"
+            np.save(os.path.join(self.scratch, categories_file),
+                    np.asarray([str(c) for c in self.categories], dtype=str))
+            columns.append({"name": name, "file": f"c{i}.npy", "dtype": "object", "kind": "categorical",
+                            "categories_file": categories_file})
+
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "content_hash": self.digest.hexdigest(),
+            "rows": self.rows,
+            "columns": columns,
+            **extra
+        }
+        with open(os.path.join(self.scratch, MANIFEST_NAME), "w") as f:
+            json.dump(manifest, f)
+        if os.path.exists(self.output):
+            shutil.rmtree(self.output)
+        os.replace(self.scratch, self.output)
+        manifest["path"] = self.output
+        return manifest
+
+    def abort(self):
+        for f in self.files:
+            f.close()
+        shutil.rmtree(self.scratch, ignore_errors=True)
+
+def score_file(model_id, source, output, method=None, chunk_rows=DEFAULT_CHUNK_ROWS,
+               workers=None, pool_min_rows=DEFAULT_POOL_MIN_ROWS, progress=None):
+    """
+    Apply a stored model to every row of a file.
+
+    Args:
+        model_id: stats.model_id of the run that fitted the model
+        source: CSV path or columnar artifact directory
+        output: directory to publish the predictions to (replaced if present)
+        method: artifact method to call; defaults to its first
+        workers: requested worker processes, capped by the thread budget
+        pool_min_rows: inputs known to be smaller are scored in-process
+        progress: optional callable receiving progress dicts
+
+    Returns:
+        summary dict with rows, rows_skipped, elapsed_s, rows_per_second,
+        workers, the output directory's name (not its path) and its columns
+    """
+    started = time.perf_counter()
+    artifact = load_model(model_id)
+    method = resolve_method(artifact, method)
+    features = artifact["features"]
+    columnar = is_artifact(source)
+    if columnar:
+        missing = [c for c in features if c not in {e["name"] for e in read_manifest(source)["columns"]}]
+    else:
+        missing = [c for c in features if c not in pd.read_csv(source, nrows=0).columns]
+    if missing:
+        raise ValueError(f"Input is missing feature columns: {missing}")
+
+    n_workers = allotted_threads(workers)
+    known_rows = read_manifest(source)["rows"] if columnar else None
+    if known_rows is not None and known_rows < pool_min_rows:
+        n_workers = 1
+
+    # The output layout is fixed before any chunk is written, so a first
+    # chunk without complete rows cannot set it
+    width = _output_width(artifact, method)
+    writer = _ColumnarWriter(output, width, _label_categories(artifact, method))
+    pool = None
+    rows_done = 0
+    skipped = 0
+    try:
+        if n_workers > 1:
+            # spawn: forking a process that already started OpenMP threads can hang
+            pool = ProcessPoolExecutor(
+                max_workers=n_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(model_id, method, source if columnar else None)
+            )
+        else:
+            frame = load_artifact(source, columns=features) if columnar else None
+
+        def finish(result, n_rows, fraction):
+            nonlocal rows_done, skipped
+            block, chunk_skipped = result
+            writer.append(block if block is not None else writer.empty_block(n_rows))
+            rows_done += n_rows
+            skipped += chunk_skipped
+            if progress:
+                elapsed = time.perf_counter() - started
+                progress({
+                    "type": "progress",
+                    "rows": rows_done,
+                    "fraction": round(fraction, 4),
+                    "rows_per_second": round(rows_done / elapsed, 1) if elapsed else None
+                })
+
+        # At most two chunks per worker are in flight, which bounds memory
+        # while keeping every worker busy; results are written in order
+        pending = deque()
+        for task, n_rows, fraction in _iter_input(source, features, chunk_rows):
+            if pool is None:
+                chunk = frame.iloc[task[0]:task[1]] if columnar else task
+                finish(_score_frame(artifact, method, chunk), n_rows, fraction)
+                continue
+            future = pool.submit(_score_rows, *task) if columnar else pool.submit(_score_chunk, task)
+            pending.append((future, n_rows, fraction))
+            while len(pending) >= 2 * n_workers:
+                future, n, f = pending.popleft()
+                finish(future.result(), n, f)
+        while pending:
+            future, n, f = pending.popleft()
+            finish(future.result(), n, f)
+
+        names = _output_names(method, width, artifact.get("classes"))
+        manifest = writer.publish(names, {
+            "model_id": model_id,
+            "method": method,
+            # Only the file name: the manifest must not reveal server paths
+            "source": os.path.basename(os.path.normpath(source))
+        })
+    except BaseException:
+        writer.abort()
+        raise
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    elapsed = time.perf_counter() - started
+    return {
+        "type": "summary",
+        "model_id": model_id,
+        "method": method,
+        "rows": rows_done,
+        "rows_skipped": skipped,
+        "workers": n_workers,
+        "elapsed_s": round(elapsed, 3),
+        "rows_per_second": round(rows_done / elapsed, 1) if elapsed else None,
+        "output": os.path.basename(manifest["path"]),
+        "columns": [c["name"] for c in manifest["columns"]]
+    }
+
+def export_csv(output, handle, block_rows=COPY_BLOCK_ROWS):
+    """Write a published predictions directory to `handle` as CSV, block by block"""
+    frame = load_artifact(output)
+    for start in range(0, max(len(frame), 1), block_rows):
+        frame.iloc[start:start + block_rows].to_csv(handle, header=start == 0, index=False)
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["csv"]:
+        if len(argv) != 2 or not is_artifact(argv[1]):
+            sys.stderr.write("Usage: python -m server.utils.batch_predict csv <output_dir>\n")
+            return 1
+        export_csv(argv[1], sys.stdout)
+        return 0
+
+    parser = argparse.ArgumentParser(description="Score a file with a stored model")
+    parser.add_argument("model_id")
+    parser.add_argument("input", help="CSV file or columnar artifact directory")
+    parser.add_argument("output", help="Directory for the columnar predictions")
+    parser.add_argument("--method")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args(argv)
+
+    def emit(message):
+        sys.stdout.write(json.dumps(message, cls=NpEncoder) + "\n")
+        sys.stdout.flush()
+
+    try:
+        emit(score_file(args.model_id, args.input, args.output, method=args.method,
+                        chunk_rows=args.chunk_rows, workers=args.workers, progress=emit))
+    except Exception as e:
+        emit({"type": "error", "error": str(e)})
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,247 @@
+"""
+Cluster quality metrics that run within a fixed memory budget.
+
+Every metric streams over the data in row chunks sized from the budget, so
+peak memory depends on the budget and the number of features, not on the
+number of rows. Points labelled -1 (noise, e.g. from DBSCAN) are excluded.
+
+- silhouette_chunked: exact silhouette, O(n^2) time but bounded memory
+- silhouette_sampled: silhouette on a random sample with a confidence interval
+- davies_bouldin / calinski_harabasz: two streaming passes, O(n * k)
+- cluster_quality: picks exact or sampled silhouette by size and reports all three
+"""
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import pairwise_distances_chunked
+
+from .profiling import profile_stage
+
+DEFAULT_MEMORY_BUDGET_MB = 64
+EXACT_SILHOUETTE_MAX_ROWS = 10_000
+DEFAULT_SAMPLE_SIZE = 10_000
+
+def _as_array(X):
+    if isinstance(X, pd.DataFrame):
+        return X
+    return np.asarray(X)
+
+def _chunk_rows(n_features, memory_budget_mb, copies=4):
+    """Rows per chunk so that a few float64 copies of a chunk fit the budget"""
+    budget = memory_budget_mb * 1024 * 1024
+    return max(1, int(budget // (max(n_features, 1) * 8 * copies)))
+
+def _row_chunks(X, chunk_rows):
+    """Yield (start, dense float chunk) pairs over the rows of X"""
+    for start in range(0, len(X), chunk_rows):
+        stop = start + chunk_rows
+        if isinstance(X, pd.DataFrame):
+            yield start, X.iloc[start:stop].to_numpy(dtype=float)
+        else:
+            yield start, np.asarray(X[start:stop], dtype=float)
+
+def _dense(X, index=None):
+    if isinstance(X, pd.DataFrame):
+        return (X if index is None else X.iloc[index]).to_numpy(dtype=float)
+    X = np.asarray(X)
+    return np.asarray(X if index is None else X[index], dtype=float)
+
+def _valid(labels):
+    """Mask of points that belong to a cluster (noise is labelled -1)"""
+    return np.asarray(labels) != -1
+
+def _drop_noise(X, labels):
+    """Remove noise points, avoiding a copy of X when there are none"""
+    X = _as_array(X)
+    labels = np.asarray(labels)
+    mask = _valid(labels)
+    if mask.all():
+        return X, labels
+    return X[mask], labels[mask]
+
+def _silhouette_values(X, labels, memory_budget_mb):
+    """Per-point silhouette values computed with chunked pairwise distances"""
+    X = _dense(X)
+    labels = np.asarray(labels)
+    _, codes = np.unique(labels, return_inverse=True)
+    counts = np.bincount(codes)
+
+    # Sort by cluster so per-cluster distance sums are contiguous slices
+    order = np.argsort(codes, kind="stable")
+    X = X[order]
+    codes = codes[order]
+    boundaries = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    values = np.empty(len(X))
+    offset = 0
+    # Half the budget for the distance block leaves room for its temporaries
+    for block in pairwise_distances_chunked(X, working_memory=max(1, memory_budget_mb // 2)):
+        sums = np.add.reduceat(block, boundaries, axis=1)
+        rows = np.arange(offset, offset + len(block))
+        own = codes[rows]
+        own_size = counts[own]
+
+        a = sums[np.arange(len(block)), own] / np.maximum(own_size - 1, 1)
+        means = sums / counts
+        means[np.arange(len(block)), own] = np.inf
+        b = means.min(axis=1)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            s = (b - a) / np.maximum(a, b)
+        # Singleton clusters have a silhouette of 0 by convention
+        s[own_size == 1] = 0.0
+        values[rows] = np.nan_to_num(s)
+        offset += len(block)
+
+    result = np.empty_like(values)
+    result[order] = values
+    return result
+
+def silhouette_chunked(X, labels, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """Exact mean silhouette computed in distance blocks that fit the budget"""
+    X, labels = _drop_noise(X, labels)
+    n_labels = len(np.unique(labels))
+    if n_labels < 2 or n_labels >= len(labels):
+        return None
+    return float(_silhouette_values(X, labels, memory_budget_mb).mean())
+
+def silhouette_sampled(X, labels, sample_size=DEFAULT_SAMPLE_SIZE, confidence=0.95,
+                       memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, random_state=42):
+    """
+    Estimate the silhouette from a random sample of points.
+
+    Returns:
+        dict with `mean`, the confidence interval `ci` from the spread of
+        per-point values, and the `sample_size` actually used
+    """
+    labels = np.asarray(labels)
+    candidates = np.flatnonzero(_valid(labels))
+    rng = np.random.default_rng(random_state)
+    if len(candidates) > sample_size:
+        candidates = np.sort(rng.choice(candidates, sample_size, replace=False))
+
+    sample_labels = labels[candidates]
+    n_labels = len(np.unique(sample_labels))
+    if n_labels < 2 or n_labels >= len(candidates):
+        return None
+
+    values = _silhouette_values(_dense(_as_array(X), candidates), sample_labels, memory_budget_mb)
+    mean = float(values.mean())
+    # Normal approximation; the sample is large enough in practice
+    z = {0.9: 1.645, 0.95: 1.96, 0.99: 2.576}.get(confidence, 1.96)
+    half_width = z * float(values.std(ddof=1)) / np.sqrt(len(values))
+    return {
+        "mean": mean,
+        "ci": [float(mean - half_width), float(mean + half_width)],
+        "confidence": confidence,
+        "sample_size": int(len(values))
+    }
+
+def _cluster_moments(X, labels, chunk_rows):
+    """Per-cluster counts and centroids from one streaming pass"""
+    _, codes = np.unique(labels, return_inverse=True)
+    k = codes.max() + 1
+    counts = np.bincount(codes, minlength=k)
+    sums = None
+    for start, chunk in _row_chunks(X, chunk_rows):
+        chunk_codes = codes[start:start + len(chunk)]
+        if sums is None:
+            sums = np.zeros((k, chunk.shape[1]))
+        for j in range(chunk.shape[1]):
+            sums[:, j] += np.bincount(chunk_codes, weights=chunk[:, j], minlength=k)
+    return codes, counts, sums / counts[:, None]
+
+def davies_bouldin(X, labels, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """Davies-Bouldin index (lower is better) in two streaming passes"""
+    X, labels = _drop_noise(X, labels)
+    if len(np.unique(labels)) < 2:
+        return None
+
+    chunk_rows = _chunk_rows(X.shape[1], memory_budget_mb)
+    codes, counts, centroids = _cluster_moments(X, labels, chunk_rows)
+
+    scatter = np.zeros(len(counts))
+    for start, chunk in _row_chunks(X, chunk_rows):
+        chunk_codes = codes[start:start + len(chunk)]
+        distances = np.linalg.norm(chunk - centroids[chunk_codes], axis=1)
+        scatter += np.bincount(chunk_codes, weights=distances, minlength=len(counts))
+    scatter /= counts
+
+    separation = np.linalg.norm(centroids[:, None, :] - centroids[None, :, :], axis=2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratios = (scatter[:, None] + scatter[None, :]) / separation
+    np.fill_diagonal(ratios, -np.inf)
+    ratios[~np.isfinite(ratios) & (ratios != -np.inf)] = 0.0
+    return float(ratios.max(axis=1).mean())
+
+def calinski_harabasz(X, labels, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """Calinski-Harabasz index (higher is better) in two streaming passes"""
+    X, labels = _drop_noise(X, labels)
+    n = len(labels)
+    k = len(np.unique(labels))
+    if k < 2 or k >= n:
+        return None
+
+    chunk_rows = _chunk_rows(X.shape[1], memory_budget_mb)
+    codes, counts, centroids = _cluster_moments(X, labels, chunk_rows)
+    overall = (centroids * counts[:, None]).sum(axis=0) / n
+
+    within = 0.0
+    for start, chunk in _row_chunks(X, chunk_rows):
+        chunk_codes = codes[start:start + len(chunk)]
+        within += float(((chunk - centroids[chunk_codes]) ** 2).sum())
+    between = float((counts * ((centroids - overall) ** 2).sum(axis=1)).sum())
+
+    if within == 0:
+        return 1.0
+    return between * (n - k) / (within * (k - 1))
+
+@profile_stage("cluster_quality")
+def cluster_quality(X, labels, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB,
+                    exact_max_rows=EXACT_SILHOUETTE_MAX_ROWS, sample_size=DEFAULT_SAMPLE_SIZE,
+                    silhouette_method="auto"):
+    """
+    Report silhouette, Davies-Bouldin and Calinski-Harabasz for a clustering.
+
+    Args:
+        X: feature matrix (DataFrame or array), one row per label
+        labels: cluster labels; -1 marks noise and is excluded
+        memory_budget_mb: upper bound for working memory of each metric
+        exact_max_rows: use the exact silhouette up to this many points
+        sample_size: sample size for the estimated silhouette
+        silhouette_method: "auto", "exact" or "sampled"
+
+    Returns:
+        dict of JSON-serializable stats
+    """
+    labels = np.asarray(labels)
+    n_valid = int(_valid(labels).sum())
+
+    if silhouette_method == "auto":
+        silhouette_method = "exact" if n_valid <= exact_max_rows else "sampled"
+
+    quality = {
+        "silhouette_score": None,
+        "silhouette_method": silhouette_method,
+        "silhouette_ci": None,
+        "davies_bouldin_score": None,
+        "calinski_harabasz_score": None,
+        "quality_points": n_valid,
+        "noise_excluded": int(len(labels) - n_valid)
+    }
+
+    try:
+        if silhouette_method == "exact":
+            quality["silhouette_score"] = silhouette_chunked(X, labels, memory_budget_mb)
+        else:
+            estimate = silhouette_sampled(X, labels, sample_size=sample_size, memory_budget_mb=memory_budget_mb)
+            if estimate:
+                quality["silhouette_score"] = estimate["mean"]
+                quality["silhouette_ci"] = estimate["ci"]
+                quality["silhouette_sample_size"] = estimate["sample_size"]
+        quality["davies_bouldin_score"] = davies_bouldin(X, labels, memory_budget_mb)
+        quality["calinski_harabasz_score"] = calinski_harabasz(X, labels, memory_budget_mb)
+    except (ValueError, MemoryError) as e:
+        quality["quality_error"] = str(e)
+
+    return quality
@@ -0,0 +1,316 @@
+"""
+Columnar dataset cache.
+
+An uploaded CSV is parsed once into a directory of per-column NumPy `.npy`
+files plus a `manifest.json`, keyed by dataset id and content hash. Later runs
+load the columns with memory mapping instead of re-parsing CSV or JSON.
+Until the artifact exists, CSVs are read directly in row chunks, using
+dtype hints from the stored schema when the caller has them.
+
+Layout:
+    <cache_root>/<dataset_id>-<content_hash[:16]>/
+        manifest.json
+        c0.npy, c1.npy, ...          column values (or category codes)
+        c1.categories.npy            string categories for text columns
+
+Usage:
+    python -m server.utils.dataset_cache build <csv_path> <dataset_id>
+"""
+
+import os
+import sys
+import json
+import glob
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+DEFAULT_CSV_CHUNK_ROWS = 100_000
+
+# Schema type names mapped to what read_csv should parse them as
+NUMERIC_HINTS = {"float", "float64", "number", "numeric", "double"}
+CATEGORICAL_HINTS = {"category", "categorical"}
+DATETIME_HINTS = {"datetime", "datetime64", "datetime64[ns]", "date", "timestamp"}
+
+def get_cache_root():
+    """Directory holding columnar artifacts (override with BUMP_COLUMNAR_CACHE)"""
+    default = os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+        "uploads", ".columnar"
+    )
+    return os.environ.get("BUMP_COLUMNAR_CACHE", default)
+
+def file_content_hash(path, block_size=1024 * 1024):
+    """Return the SHA-256 hex digest of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _source_signature(path):
+    stat = os.stat(path)
+    return {"source_size": stat.st_size, "source_mtime_ms": stat.st_mtime_ns // 1_000_000}
+
+def _write_column(directory, index, series):
+    """Write one column and return its manifest entry"""
+    name = f"c{index}"
+    entry = {"name": str(series.name), "file": f"{name}.npy", "dtype": str(series.dtype)}
+    values = series.to_numpy()
+
+    if values.dtype.kind in "biuf":
+        entry["kind"] = "numeric"
+        np.save(os.path.join(directory, entry["file"]), np.ascontiguousarray(values))
+    elif values.dtype.kind == "M":
+        entry["kind"] = "datetime"
+        np.save(os.path.join(directory, entry["file"]), values.view("int64"))
+    else:
+        # Text and mixed columns are stored as int32 codes plus fixed-width
+        # unicode categories so both files can still be memory mapped
+        categorical = pd.Categorical(series.astype(object).where(series.notna(), None))
+        entry["kind"] = "categorical"
+        entry["categories_file"] = f"{name}.categories.npy"
+        np.save(os.path.join(directory, entry["file"]), categorical.codes.astype(np.int32))
+        np.save(
+            os.path.join(directory, entry["categories_file"]),
+            np.asarray([str(c) for c in categorical.categories], dtype=str)
+        )
+    return entry
+
+def build_artifact(source_path, dataset_id, df=None, cache_root=None):
+    """
+    Parse a CSV once and store it as a columnar artifact.
+
+    Args:
+        source_path: path to the uploaded CSV file
+        dataset_id: id of the dataset in storage
+        df: already parsed DataFrame, if the caller has one
+        cache_root: override for the cache directory
+
+    Returns:
+        The manifest dict, including the artifact `path`
+    """
+    cache_root = cache_root or get_cache_root()
+    os.makedirs(cache_root, exist_ok=True)
+
+    content_hash = file_content_hash(source_path)
+    target = os.path.join(cache_root, f"{dataset_id}-{content_hash[:16]}")
+    if os.path.exists(os.path.join(target, MANIFEST_NAME)):
+        return read_manifest(target)
+
+    if df is None:
+        df = pd.read_csv(source_path)
+
+    # Write into a scratch directory and rename so readers never see a
+    # half-written artifact
+    scratch = tempfile.mkdtemp(prefix=f".{dataset_id}-", dir=cache_root)
+    try:
+        columns = [_write_column(scratch, i, df[col]) for i, col in enumerate(df.columns)]
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "dataset_id": str(dataset_id),
+            "content_hash": content_hash,
+            "source_path": os.path.abspath(source_path),
+            "rows": int(len(df)),
+            "columns": columns,
+            **_source_signature(source_path)
+        }
+        with open(os.path.join(scratch, MANIFEST_NAME), "w") as f:
+            json.dump(manifest, f)
+        os.replace(scratch, target)
+    except OSError:
+        shutil.rmtree(scratch, ignore_errors=True)
+        if not os.path.exists(os.path.join(target, MANIFEST_NAME)):
+            raise
+
+    # Artifacts for older contents of the same dataset are now stale
+    for stale in glob.glob(os.path.join(cache_root, f"{dataset_id}-*")):
+        if stale != target:
+            shutil.rmtree(stale, ignore_errors=True)
+
+    manifest = read_manifest(target)
+    return manifest
+
+def read_manifest(artifact_path):
+    """Read an artifact manifest and attach its path"""
+    with open(os.path.join(artifact_path, MANIFEST_NAME)) as f:
+        manifest = json.load(f)
+    manifest["path"] = artifact_path
+    return manifest
+
+def is_artifact(path):
+    """Check whether a path is a columnar artifact directory"""
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, MANIFEST_NAME))
+
+def is_fresh(manifest, source_path):
+    """Check that the source file has not changed since the artifact was built"""
+    try:
+        signature = _source_signature(source_path)
+    except OSError:
+        return False
+    return all(manifest.get(key) == value for key, value in signature.items())
+
+def find_artifact(dataset_id, source_path=None, cache_root=None):
+    """Return the manifest of the artifact for a dataset, or None if missing or stale"""
+    cache_root = cache_root or get_cache_root()
+    candidates = [p for p in glob.glob(os.path.join(cache_root, f"{dataset_id}-*")) if is_artifact(p)]
+    if not candidates:
+        return None
+    manifest = read_manifest(max(candidates, key=os.path.getmtime))
+    if source_path and not is_fresh(manifest, source_path):
+        return None
+    return manifest
+
+def dataset_fingerprint(data_path, dataset_id=None):
+    """
+    Return the content hash identifying a dataset.
+
+    Artifacts already record the hash of their source, so only raw files
+    need to be hashed.
+    """
+    if is_artifact(data_path):
+        return read_manifest(data_path)["content_hash"]
+    if dataset_id is not None:
+        manifest = find_artifact(dataset_id, source_path=data_path)
+        if manifest:
+            return manifest["content_hash"]
+    return file_content_hash(data_path)
+
+def load_artifact(artifact_path, columns=None):
+    """
+    Load a columnar artifact as a DataFrame backed by memory-mapped arrays.
+
+    Args:
+        artifact_path: artifact directory
+        columns: optional list of column names to load
+
+    Returns:
+        pandas DataFrame
+    """
+    manifest = read_manifest(artifact_path)
+    data = {}
+    for entry in manifest["columns"]:
+        if columns is not None and entry["name"] not in columns:
+            continue
+        values = np.load(os.path.join(artifact_path, entry["file"]), mmap_mode="r")
+        if entry["kind"] == "datetime":
+            values = values.view(entry["dtype"])
+        elif entry["kind"] == "categorical":
+            categories = np.load(os.path.join(artifact_path, entry["categories_file"]))
+            values = np.asarray(pd.Categorical.from_codes(values, categories.astype(object)), dtype=object)
+        data[entry["name"]] = values
+    return pd.DataFrame(data, copy=False)
+
+def parse_dtype_hints(hints):
+    """
+    Split schema type hints into read_csv arguments.
+
+    Args:
+        hints: {column: type name} as a dict or JSON string; the values may
+            also be schema entries of the form {"type": ...}, and a full
+            schema_infer result is read through its `column_info`. Unknown
+            type names are left to pandas' own inference.
+
+    Returns:
+        (dtype, categorical_columns, date_columns)
+    """
+    if isinstance(hints, str):
+        hints = json.loads(hints) if hints.strip() else {}
+    if isinstance(hints, dict) and isinstance(hints.get("column_info"), dict):
+        hints = hints["column_info"]
+    dtype, categorical, dates = {}, [], []
+    for column, hint in (hints or {}).items():
+        if isinstance(hint, dict):
+            # schema_infer entries: numeric columns carry their parsed dtype
+            hint = hint.get("dtype") if hint.get("type") == "numeric" else hint.get("type")
+        hint = str(hint or "").lower()
+        if hint in NUMERIC_HINTS:
+            dtype[column] = "float64"
+        elif hint in CATEGORICAL_HINTS:
+            # Parsed as text per chunk and turned into categories afterwards
+            categorical.append(column)
+        elif hint in DATETIME_HINTS or hint.startswith("datetime64"):
+            dates.append(column)
+    return dtype, categorical, dates
+
+def read_csv_chunked(path, dtypes=None, chunk_rows=None):
+    """
+    Read a CSV in row chunks, applying dtype hints.
+
+    The parser only ever buffers one chunk of text, and hinted categorical
+    columns are combined as categories instead of one Python string per
+    cell, so peak memory stays close to the size of the final DataFrame.
+    """
+    chunk_rows = chunk_rows or int(os.environ.get("BUMP_CSV_CHUNK_ROWS", DEFAULT_CSV_CHUNK_ROWS))
+    dtype, categorical, dates = parse_dtype_hints(dtypes)
+
+    header = pd.read_csv(path, nrows=0).columns
+    dtype = {c: t for c, t in dtype.items() if c in header}
+    categorical = [c for c in categorical if c in header]
+    dates = [c for c in dates if c in header]
+
+    chunks = []
+    reader = pd.read_csv(path, dtype=dtype or None, parse_dates=dates or None, chunksize=chunk_rows)
+    for chunk in reader:
+        for column in categorical:
+            chunk[column] = chunk[column].astype("category")
+        chunks.append(chunk)
+    if not chunks:
+        return pd.read_csv(path, dtype=dtype or None)
+    if len(chunks) == 1:
+        return chunks[0]
+
+    # Concatenating categoricals with different categories falls back to
+    # object dtype, so union them separately
+    combined = {
+        column: pd.Series(union_categoricals([c[column] for c in chunks], ignore_order=True))
+        for column in categorical
+    }
+    df = pd.concat([c.drop(columns=categorical) for c in chunks], ignore_index=True)
+    del chunks
+    for column in categorical:
+        df.insert(header.get_loc(column), column, combined.pop(column))
+    return df
+
+def load_dataset(data_path, dataset_id=None, dtypes=None):
+    """
+    Load a dataset from whatever representation is cheapest.
+
+    Uses the columnar artifact when `data_path` is one, or when a fresh
+    artifact exists for `dataset_id`; otherwise reads the CSV in chunks
+    (with optional schema dtype hints) or parses JSON.
+    """
+    if is_artifact(data_path):
+        return load_artifact(data_path)
+
+    if dataset_id is not None:
+        manifest = find_artifact(dataset_id, source_path=data_path)
+        if manifest:
+            return load_artifact(manifest["path"])
+
+    if data_path.lower().endswith(".csv"):
+        return read_csv_chunked(data_path, dtypes)
+    return pd.read_json(data_path)
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4 or sys.argv[1] != "build":
+        print(json.dumps({"success": False, "error": "Usage: python -m server.utils.dataset_cache build <csv_path> <dataset_id>"}))
+        sys.exit(1)
+
+    try:
+        manifest = build_artifact(sys.argv[2], sys.argv[3])
+        print(json.dumps({
+            "success": True,
+            "artifact": manifest["path"],
+            "content_hash": manifest["content_hash"],
+            "rows": manifest["rows"],
+            "columns": len(manifest["columns"])
+        }))
+    except Exception as e:
+        print(json.dumps({"success": False, "error": str(e)}))
+        sys.exit(1)
@@ -0,0 +1,203 @@
+"""
+Point-budget downsampling for chart payloads.
+
+Per-row charts grow with the dataset while a browser can only usefully draw
+a few thousand points. `downsample_result` runs on every technique result
+before it is returned: each chart with more points than the budget is
+reduced and its original row positions are added as `<chart>_index`.
+
+- series (one value per row): largest-triangle-three-buckets (LTTB), which
+  keeps the visual shape including peaks and dips
+- scatters (pairs, 2-D arrays, or records with two numeric fields): a grid
+  over the two axes, sampled per cell in proportion to its density but with
+  at least one point from every occupied cell, so sparse regions and
+  isolated points survive
+
+Techniques can steer this with a `chart_hints` entry in their result,
+{chart: {"kind": "series" | "scatter", "keep": [row, ...]}}; rows listed in
+`keep` (anomalies, large residuals) are always retained. The hints are
+removed from the response. Pass `full_resolution=1` to skip sampling.
+"""
+
+import os
+import numpy as np
+
+DEFAULT_MAX_POINTS = 2000
+
+def lttb(y, n_out, x=None):
+    """
+    Indices of the points kept by largest-triangle-three-buckets.
+
+    Args:
+        y: series values
+        n_out: number of points to keep (at least 3)
+        x: optional x coordinates, defaults to the row position
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.arange(n, dtype=float) if x is None else np.asarray(x, dtype=float)
+    y = np.nan_to_num(y)
+
+    # The first and last points are always kept; the rest is split into
+    # n_out - 2 buckets and each contributes the point forming the largest
+    # triangle with the previous pick and the next bucket's average
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0] = 0
+    previous = 0
+    for bucket in range(n_out - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_start, next_stop = edges[bucket + 1], edges[bucket + 2]
+        else:
+            next_start, next_stop = n - 1, n
+        avg_x = x[next_start:next_stop].mean()
+        avg_y = y[next_start:next_stop].mean()
+        area = np.abs(
+            (x[previous] - avg_x) * (y[start:stop] - y[previous])
+            - (x[previous] - x[start:stop]) * (avg_y - y[previous])
+        )
+        previous = start + int(np.argmax(area))
+        kept[bucket + 1] = previous
+    kept[-1] = n - 1
+    return kept
+
+def stratified_scatter(points, n_out, random_state=42):
+    """
+    Indices of a density-preserving sample of 2-D points.
+
+    Points are binned on a grid of about n_out cells; every occupied cell
+    keeps at least one point and dense cells keep proportionally more.
+    """
+    points = np.asarray(points, dtype=float)
+    n = len(points)
+    if n_out >= n:
+        return np.arange(n)
+    points = np.nan_to_num(points[:, :2])
+
+    side = max(1, int(np.sqrt(n_out)))
+    lows = points.min(axis=0)
+    spans = np.maximum(points.max(axis=0) - lows, 1e-12)
+    cells = np.minimum(((points - lows) / spans * side).astype(np.int64), side - 1)
+    cell_ids = cells[:, 0] * side + cells[:, 1]
+
+    _, codes, counts = np.unique(cell_ids, return_inverse=True, return_counts=True)
+    quotas = np.maximum(1, np.floor(counts * n_out / n)).astype(np.int64)
+
+    # Random order within each cell, then keep the first `quota` of each
+    rng = np.random.default_rng(random_state)
+    order = np.lexsort((rng.random(n), codes))
+    sorted_codes = codes[order]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    rank = np.arange(n) - starts[sorted_codes]
+    return np.sort(order[rank < quotas[sorted_codes]])
+
+def _with_kept_rows(indices, keep, n, budget):
+    """Add rows that must survive sampling, capped at the budget"""
+    if keep is None:
+        return indices
+    keep = np.asarray(keep)
+    if keep.dtype == bool:
+        keep = np.flatnonzero(keep)
+    keep = keep[(keep >= 0) & (keep < n)].astype(np.int64)
+    if len(keep) > budget:
+        keep = keep[np.linspace(0, len(keep) - 1, budget).astype(int)]
+    return np.union1d(indices, keep)
+
+def _numeric_keys(record):
+    return [k for k, v in record.items() if k != "index" and isinstance(v, (int, float)) and not isinstance(v, bool)]
+
+def _classify(values):
+    """Return (kind, coordinates) for a chart payload, or (None, None)"""
+    if isinstance(values, dict) or values is None:
+        return None, None
+    if not isinstance(values, np.ndarray):
+        if not len(values):
+            return None, None
+        first = values[0]
+        if isinstance(first, dict):
+            keys = _numeric_keys(first)
+            if len(keys) >= 2:
+                return "scatter", np.array([[r.get(keys[0], np.nan), r.get(keys[1], np.nan)] for r in values], dtype=float)
+            if len(keys) == 1:
+                return "series", np.array([r.get(keys[0], np.nan) for r in values], dtype=float)
+            return None, None
+        try:
+            values = np.asarray(values, dtype=float)
+        except (TypeError, ValueError):
+            return None, None
+    if values.dtype.kind not in "biuf":
+        return None, None
+    if values.ndim == 1:
+        return "series", values
+    if values.ndim == 2 and values.shape[1] >= 2:
+        return "scatter", values
+    return None, None
+
+def _take(values, indices):
+    if isinstance(values, np.ndarray):
+        return values[indices]
+    return [values[i] for i in indices]
+
+def downsample_chart(values, budget, kind=None, keep=None):
+    """
+    Downsample one chart payload.
+
+    Returns:
+        (sampled values, kept row indices or None, method) where the
+        indices are None when the chart was left as is
+    """
+    detected, coordinates = _classify(values)
+    kind = kind or detected
+    if coordinates is None or len(coordinates) <= budget:
+        return values, None, None
+
+    n = len(coordinates)
+    if kind == "series":
+        series = coordinates if coordinates.ndim == 1 else coordinates[:, 0]
+        indices, method = lttb(series, budget), "lttb"
+    else:
+        points = coordinates if coordinates.ndim == 2 else np.column_stack((np.arange(n), coordinates))
+        indices, method = stratified_scatter(points, budget), "stratified"
+    indices = _with_kept_rows(indices, keep, n, budget)
+    return _take(values, indices), indices, method
+
+def _budget(params):
+    value = params.get("max_chart_points") or os.environ.get("BUMP_MAX_CHART_POINTS") or DEFAULT_MAX_POINTS
+    return max(3, int(value))
+
+def _full_resolution(params):
+    return str(params.get("full_resolution", 0)).lower() in ("1", "true", "yes")
+
+def downsample_result(result, params=None):
+    """
+    Apply the point budget to every chart of a technique result.
+
+    Args:
+        result: technique result dict; modified in place and returned
+        params: run params (`max_chart_points`, `full_resolution`)
+    """
+    if not isinstance(result, dict):
+        return result
+    params = params or {}
+    hints = result.pop("chart_hints", None) or {}
+    charts = result.get("charts")
+    if not isinstance(charts, dict) or _full_resolution(params):
+        return result
+
+    budget = _budget(params)
+    sampling = {}
+    for name in list(charts):
+        hint = hints.get(name) or {}
+        sampled, indices, method = downsample_chart(charts[name], budget, hint.get("kind"), hint.get("keep"))
+        if indices is None:
+            continue
+        sampling[name] = {"points": len(charts[name]), "kept": int(len(indices)), "method": method}
+        charts[name] = sampled
+        charts[f"{name}_index"] = indices
+
+    if sampling and isinstance(result.get("stats"), dict):
+        result["stats"]["chart_sampling"] = {"max_points": budget, "charts": sampling}
+    return result
@@ -0,0 +1,241 @@
+"""
+Cross-validated metrics for the supervised and forecasting techniques.
+
+Techniques used to score a single train_test_split, and some scored on their
+own training rows. `cross_validate` adds mean/std metrics over k folds:
+
+- "kfold", "stratified" (default for classification; falls back to kfold
+  when a class has fewer rows than folds) or "timeseries" splits, where each
+  fold trains on the rows before its test block
+- the feature matrix is prepared once (see preprocessing) and every fold
+  indexes into it; folds fit unfitted clones of the technique's estimator
+- folds run in parallel threads, which share the matrix without copying
+  (sklearn fits release the GIL); the job's thread allotment is split
+  between concurrent folds and their BLAS/OpenMP and `n_jobs` threads
+- `cv_budget_s` bounds the wall clock: a new fold is only started while the
+  elapsed time plus the mean fold time fits the budget, so fewer folds may
+  be reported (stats.cv_budget_exhausted)
+
+`forecast_cv` does the same for forecasters, which are callables rather
+than estimators.
+
+Params read from the technique params: cv ("kfold", "stratified",
+"timeseries" or "none"), cv_folds, cv_budget_s.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+import pandas as pd
+from threadpoolctl import threadpool_limits
+from sklearn.base import clone
+from sklearn.model_selection import KFold, StratifiedKFold, TimeSeriesSplit
+from sklearn.metrics import (accuracy_score, precision_score, recall_score, f1_score,
+                             r2_score, mean_squared_error, mean_absolute_error)
+
+from .thread_budget import allotted_threads
+from .progress import progress_counter
+from .profiling import profile_stage
+
+CV_METHODS = ("kfold", "stratified", "timeseries")
+DEFAULT_FOLDS = 5
+DEFAULT_BUDGET_S = 60.0
+
+def _classification_metrics(y_true, y_pred):
+    return {
+        "accuracy": accuracy_score(y_true, y_pred),
+        "precision": precision_score(y_true, y_pred, average="weighted", zero_division=0),
+        "recall": recall_score(y_true, y_pred, average="weighted", zero_division=0),
+        "f1": f1_score(y_true, y_pred, average="weighted", zero_division=0)
+    }
+
+def _regression_metrics(y_true, y_pred):
+    return {
+        "r2": r2_score(y_true, y_pred),
+        "mse": mean_squared_error(y_true, y_pred),
+        "mae": mean_absolute_error(y_true, y_pred)
+    }
+
+def _forecast_metrics(y_true, y_pred):
+    y_true = np.asarray(y_true, dtype=float)
+    y_pred = np.asarray(y_pred, dtype=float)
+    nonzero = y_true != 0
+    return {
+        "mae": mean_absolute_error(y_true, y_pred),
+        "rmse": float(np.sqrt(mean_squared_error(y_true, y_pred))),
+        "mape": float(np.mean(np.abs((y_true[nonzero] - y_pred[nonzero]) / y_true[nonzero])) * 100)
+                if nonzero.any() else None
+    }
+
+METRICS = {
+    "classification": _classification_metrics,
+    "regression": _regression_metrics,
+    "forecast": _forecast_metrics
+}
+
+def cv_settings(params, task):
+    """(method, folds, budget_s) from the technique params, or None when disabled"""
+    method = str(params.get("cv", "timeseries" if task == "forecast" else "auto")).lower()
+    if method in ("none", "off", "0", "false", "no"):
+        return None
+    if method == "auto":
+        method = "stratified" if task == "classification" else "kfold"
+    if method not in CV_METHODS:
+        raise ValueError(f"Unknown cv '{method}'")
+    folds = int(params.get("cv_folds", DEFAULT_FOLDS))
+    if folds < 2:
+        return None
+    budget = params.get("cv_budget_s", DEFAULT_BUDGET_S)
+    return method, folds, float(budget) if budget not in (None, "", 0, "0") else None
+
+def _splits(method, folds, y, n_rows):
+    if method == "timeseries":
+        return method, list(TimeSeriesSplit(n_splits=folds).split(np.empty(n_rows)))
+    if method == "stratified":
+        _, counts = np.unique(y, return_counts=True)
+        if counts.min() >= folds:
+            return method, list(StratifiedKFold(n_splits=folds, shuffle=True, random_state=42).split(np.empty(n_rows), y))
+        method = "kfold"
+    return method, list(KFold(n_splits=folds, shuffle=True, random_state=42).split(np.empty(n_rows)))
+
+def _run_folds(fit_score, splits, workers, budget_s):
+    """
+    Run fit_score(train, test) per split in a thread pool, starting new
+    folds only while the budget allows; returns fold rows in split order
+    """
+    started = time.perf_counter()
+    rows = {}
+    durations = []
+    exhausted = False
+    step = progress_counter("cross_validation", len(splits))
+
+    def timed(i, train, test):
+        fold_started = time.perf_counter()
+        metrics = fit_score(train, test)
+        step()
+        return i, metrics, time.perf_counter() - fold_started
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        remaining = list(enumerate(splits))
+        pending = set()
+        while remaining or pending:
+            while remaining and len(pending) < workers:
+                elapsed = time.perf_counter() - started
+                estimate = np.mean(durations) if durations else 0.0
+                # The first fold always runs so there is something to report
+                if budget_s is not None and (rows or pending) and elapsed + estimate > budget_s:
+                    exhausted = True
+                    remaining = []
+                    break
+                i, (train, test) = remaining.pop(0)
+                pending.add(pool.submit(timed, i, train, test))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                i, metrics, duration = future.result()
+                durations.append(duration)
+                rows[i] = {"fold": i + 1, "train_rows": int(len(splits[i][0])), "test_rows": int(len(splits[i][1])),
+                           **{k: (round(float(v), 4) if v is not None else None) for k, v in metrics.items()},
+                           "fit_ms": round(duration * 1000, 1)}
+    return [rows[i] for i in sorted(rows)], exhausted
+
+def _summarize(method, planned, folds, exhausted):
+    stats = {
+        "cv_method": method,
+        "cv_folds": len(folds),
+        "cv_folds_planned": planned,
+        "cv_budget_exhausted": exhausted
+    }
+    metric_names = [k for k in (folds[0] if folds else {}) if k not in ("fold", "train_rows", "test_rows", "fit_ms")]
+    for name in metric_names:
+        values = np.array([f[name] for f in folds if f[name] is not None], dtype=float)
+        stats[f"cv_{name}_mean"] = round(float(values.mean()), 4) if len(values) else None
+        stats[f"cv_{name}_std"] = round(float(values.std()), 4) if len(values) else None
+    return stats
+
+def _fold_threads(params, n_folds):
+    """(concurrent folds, threads per fold) within the job's allotment"""
+    threads = allotted_threads(params.get("n_jobs"))
+    workers = max(1, min(n_folds, threads))
+    return workers, max(1, threads // workers)
+
+@profile_stage("cross_validation")
+def cross_validate(estimator, X, y, task, params=None):
+    """
+    Cross-validate an estimator on a prepared feature matrix.
+
+    Args:
+        estimator: the technique's estimator, fitted or not; folds fit clones
+        X, y: features (array or DataFrame) and target, rows aligned
+        task: "classification" or "regression"
+        params: technique params (cv, cv_folds, cv_budget_s, n_jobs)
+
+    Returns:
+        (stats, folds): cv_* stats with <metric>_mean/_std, and one row per
+        completed fold; ({}, []) when disabled. Errors are reported as
+        stats.cv_error instead of failing the technique.
+    """
+    params = params or {}
+    try:
+        settings = cv_settings(params, task)
+        if settings is None:
+            return {}, []
+        method, n_folds, budget_s = settings
+        X = X.to_numpy() if isinstance(X, pd.DataFrame) else np.asarray(X)
+        y = y.to_numpy() if isinstance(y, pd.Series) else np.asarray(y)
+        if len(X) < 2 * n_folds:
+            return {"cv_error": f"Too few rows for {n_folds}-fold cross-validation"}, []
+        method, splits = _splits(method, n_folds, y, len(X))
+        workers, per_fold = _fold_threads(params, len(splits))
+        estimator = clone(estimator)
+        if "n_jobs" in estimator.get_params():
+            estimator.set_params(n_jobs=per_fold)
+        score = METRICS[task]
+
+        def fit_score(train, test):
+            model = clone(estimator)
+            model.fit(X[train], y[train])
+            return score(y[test], model.predict(X[test]))
+
+        with threadpool_limits(limits=per_fold):
+            folds, exhausted = _run_folds(fit_score, splits, workers, budget_s)
+        return _summarize(method, n_folds, folds, exhausted), folds
+    except Exception as e:
+        return {"cv_error": str(e)}, []
+
+@profile_stage("cross_validation")
+def forecast_cv(forecast, y, params=None):
+    """
+    Time-series cross-validation for a forecaster.
+
+    Args:
+        forecast: callable (train_index, test_index) returning predictions
+            for the test rows, using only the train rows (which precede them)
+        y: the observed series, in time order
+        params: technique params (cv_folds, cv_budget_s, n_jobs)
+
+    Returns:
+        (stats, folds) as for cross_validate, with mae, rmse and mape
+    """
+    params = params or {}
+    try:
+        settings = cv_settings(params, "forecast")
+        if settings is None:
+            return {}, []
+        _, n_folds, budget_s = settings
+        y = np.asarray(y, dtype=float)
+        if len(y) < 2 * n_folds:
+            return {"cv_error": f"Too few rows for {n_folds}-fold cross-validation"}, []
+        _, splits = _splits("timeseries", n_folds, y, len(y))
+        workers, per_fold = _fold_threads(params, len(splits))
+
+        def fit_score(train, test):
+            return _forecast_metrics(y[test], forecast(train, test))
+
+        with threadpool_limits(limits=per_fold):
+            folds, exhausted = _run_folds(fit_score, splits, workers, budget_s)
+        return _summarize("timeseries", n_folds, folds, exhausted), folds
+    except Exception as e:
+        return {"cv_error": str(e)}, []
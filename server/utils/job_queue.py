@@ -0,0 +1,570 @@
+"""
+Durable job queue for technique runs.
+
+Runs used to live and die with the HTTP request that started them: a slow
+forecast held the connection open, could not be cancelled and kept a core
+busy after the client left. Jobs decouple the two:
+
+- `JobStore` keeps jobs and their events in one SQLite database (WAL mode,
+  so the dispatcher and job processes read and write it concurrently);
+  queued jobs survive a server restart
+- `serve` is the dispatcher the Node server talks to over stdin/stdout
+  (one JSON command per line, one JSON reply or pushed event per line). It
+  starts the highest-priority queued jobs (FIFO within a priority) while
+  fewer than `concurrency` are running
+- every job runs in its own process (`execute_job`), so cancelling or
+  killing it frees its core and memory without touching the dispatcher
+- progress the technique modules report (see progress) becomes job events,
+  and the dispatcher pushes each new event as it is written
+- the dispatcher enforces each job's wall-clock and resident-memory limits
+  by killing the process; technique caps come from TIME_LIMITS_S and
+  MEMORY_LIMITS_MB, and a job may ask for less but never more
+- cancelling sends SIGTERM, which raises JobCancelled in the job, then
+  SIGKILL after CANCEL_GRACE_S if the job is stuck in native code
+
+The database and result envelopes live under BUMP_JOB_DIR (default
+uploads/.jobs next to the model store); BUMP_JOB_CONCURRENCY sets the
+number of concurrent jobs.
+
+Commands (all carry an "id" echoed in the reply):
+    {"type": "submit", "technique", "payload", "owner", "priority",
+     "time_limit_s", "memory_limit_mb"}
+    {"type": "get", "job_id"}    {"type": "list", "owner", "limit"}
+    {"type": "events", "job_id", "after"}
+    {"type": "cancel", "job_id"}    {"type": "stats"}    {"type": "shutdown"}
+
+Output lines:
+    {"id": 1, "type": "reply", "ok": true, "job": {...}}
+    {"type": "event", "job_id": "...", "seq": 12, "event": {...}}
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import queue
+import signal
+import sqlite3
+import threading
+import contextlib
+import subprocess
+
+from .json_utils import NpEncoder
+from .model_store import get_model_root
+from .progress import progress_sink, JobCancelled
+from .profiling import peak_rss_mb, profile_summary, export_profile
+from .result_transport import write_envelope
+from .thread_budget import total_threads
+
+STATUSES = ("queued", "running", "succeeded", "failed", "cancelled", "timeout")
+TERMINAL = ("succeeded", "failed", "cancelled", "timeout")
+DEFAULT_TIME_LIMIT_S = 600
+DEFAULT_MEMORY_LIMIT_MB = 2048
+# Per-technique caps for the techniques that legitimately run long or big
+TIME_LIMITS_S = {
+    "prophet_forecasting": 1800,
+    "auto_arima": 1800,
+    "hierarchical_clustering": 1200,
+    "kernel_pca": 1200
+}
+MEMORY_LIMITS_MB = {
+    "hierarchical_clustering": 4096,
+    "kernel_pca": 4096
+}
+MAX_PRIORITY = 10
+# Jobs interrupted by a dispatcher restart are queued again this many times
+MAX_ATTEMPTS = 2
+CANCEL_GRACE_S = 5.0
+POLL_INTERVAL_S = 0.2
+PURGE_INTERVAL_S = 3600
+DEFAULT_RETENTION_S = 7 * 24 * 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    technique TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    owner TEXT,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    time_limit_s REAL NOT NULL,
+    memory_limit_mb REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    pid INTEGER,
+    progress TEXT,
+    error TEXT,
+    result_file TEXT,
+    peak_rss_mb REAL,
+    submitted_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority DESC);
+CREATE INDEX IF NOT EXISTS jobs_owner ON jobs (owner, submitted_at);
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    event TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_job ON events (job_id, seq);
+"""
+
+def get_job_root():
+    """Directory for the job database and results (override with BUMP_JOB_DIR)"""
+    return os.environ.get("BUMP_JOB_DIR") or os.path.join(os.path.dirname(get_model_root()), ".jobs")
+
+def _env_number(name, fallback):
+    try:
+        return float(os.environ[name])
+    except (KeyError, ValueError):
+        return fallback
+
+def job_limits(technique, time_limit_s=None, memory_limit_mb=None):
+    """
+    (time_limit_s, memory_limit_mb) for a job: the technique's caps, or the
+    requested limits when they are lower
+    """
+    time_cap = TIME_LIMITS_S.get(technique, _env_number("BUMP_JOB_TIME_LIMIT_S", DEFAULT_TIME_LIMIT_S))
+    memory_cap = MEMORY_LIMITS_MB.get(technique, _env_number("BUMP_JOB_MEMORY_LIMIT_MB", DEFAULT_MEMORY_LIMIT_MB))
+    if time_limit_s not in (None, "", 0, "0"):
+        time_cap = min(time_cap, max(1.0, float(time_limit_s)))
+    if memory_limit_mb not in (None, "", 0, "0"):
+        memory_cap = min(memory_cap, max(64.0, float(memory_limit_mb)))
+    return float(time_cap), float(memory_cap)
+
+def default_concurrency():
+    """Concurrent jobs: BUMP_JOB_CONCURRENCY, else up to 4 of the host's cores"""
+    configured = os.environ.get("BUMP_JOB_CONCURRENCY")
+    if configured:
+        return max(1, int(configured))
+    return max(1, min(4, total_threads()))
+
+def process_rss_mb(pid):
+    """Resident memory of another process in megabytes, or None if unknown"""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+class JobStore:
+    """Jobs and their events in SQLite; safe to share between threads"""
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(get_job_root(), "jobs.sqlite3")
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def _query(self, sql, args=()):
+        with self._lock:
+            return self._db.execute(sql, args).fetchall()
+
+    @staticmethod
+    def _add_event(db, job_id, event):
+        event = dict(event, at=round(time.time(), 3))
+        return db.execute("INSERT INTO events (job_id, event) VALUES (?, ?)",
+                          (job_id, json.dumps(event, cls=NpEncoder))).lastrowid
+
+    def _public(self, row):
+        job = {k: row[k] for k in ("id", "technique", "owner", "priority", "status", "time_limit_s",
+                                    "memory_limit_mb", "attempts", "error", "peak_rss_mb",
+                                    "submitted_at", "started_at", "finished_at")}
+        job["progress"] = json.loads(row["progress"]) if row["progress"] else None
+        job["cancel_requested"] = bool(row["cancel_requested"])
+        has_result = bool(row["result_file"]) and os.path.exists(row["result_file"])
+        job["has_result"] = has_result
+        job["result_file"] = row["result_file"] if has_result else None
+        job["params"] = json.loads(row["payload"]).get("params") or {}
+        if row["status"] == "queued":
+            job["queue_position"] = self._query(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND (priority > ? OR (priority = ? AND rowid < ?))",
+                (row["priority"], row["priority"], row["rowid"])
+            )[0][0]
+        return job
+
+    def submit(self, technique, payload, owner=None, priority=0, time_limit_s=None, memory_limit_mb=None):
+        """Queue a job and return it"""
+        time_limit_s, memory_limit_mb = job_limits(technique, time_limit_s, memory_limit_mb)
+        priority = max(-MAX_PRIORITY, min(MAX_PRIORITY, int(priority or 0)))
+        job_id = uuid.uuid4().hex[:16]
+        with self._transaction() as db:
+            db.execute(
+                "INSERT INTO jobs (id, technique, payload, owner, priority, status, time_limit_s, memory_limit_mb, submitted_at)"
+                " VALUES (?, ?, ?, ?, ?, 'queued', ?, ?, ?)",
+                (job_id, technique, json.dumps(payload, cls=NpEncoder), None if owner is None else str(owner),
+                 priority, time_limit_s, memory_limit_mb, time.time())
+            )
+            self._add_event(db, job_id, {"type": "status", "status": "queued"})
+        return self.get(job_id)
+
+    def get(self, job_id):
+        """The job's public fields, or None"""
+        rows = self._query("SELECT rowid, * FROM jobs WHERE id = ?", (job_id,))
+        return self._public(rows[0]) if rows else None
+
+    def load(self, job_id):
+        """The job with its payload and result file, for running it"""
+        rows = self._query("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        if not rows:
+            return None
+        job = dict(rows[0])
+        job["payload"] = json.loads(job["payload"])
+        return job
+
+    def list(self, owner=None, limit=50):
+        """Most recent jobs first, optionally of one owner"""
+        if owner is None:
+            rows = self._query("SELECT rowid, * FROM jobs ORDER BY submitted_at DESC LIMIT ?", (int(limit),))
+        else:
+            rows = self._query("SELECT rowid, * FROM jobs WHERE owner = ? ORDER BY submitted_at DESC LIMIT ?",
+                               (str(owner), int(limit)))
+        return [self._public(row) for row in rows]
+
+    def events(self, job_id, after=0):
+        """The job's events with seq greater than `after`"""
+        rows = self._query("SELECT seq, event FROM events WHERE job_id = ? AND seq > ? ORDER BY seq",
+                           (job_id, int(after or 0)))
+        return [{"seq": row["seq"], **json.loads(row["event"])} for row in rows]
+
+    def events_since(self, after):
+        """(seq, job_id, event) for every job's events after `after`"""
+        rows = self._query("SELECT seq, job_id, event FROM events WHERE seq > ? ORDER BY seq", (int(after),))
+        return [(row["seq"], row["job_id"], json.loads(row["event"])) for row in rows]
+
+    def last_seq(self):
+        return self._query("SELECT COALESCE(MAX(seq), 0) FROM events")[0][0]
+
+    def claim_next(self):
+        """Mark the next queued job running and return it, or None"""
+        with self._transaction() as db:
+            row = db.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY priority DESC, rowid LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE jobs SET status = 'running', started_at = ?, attempts = attempts + 1, progress = NULL"
+                       " WHERE id = ?", (time.time(), row["id"]))
+            self._add_event(db, row["id"], {"type": "status", "status": "running"})
+        return self.load(row["id"])
+
+    def set_pid(self, job_id, pid):
+        with self._transaction() as db:
+            db.execute("UPDATE jobs SET pid = ? WHERE id = ?", (pid, job_id))
+
+    def record_progress(self, job_id, event):
+        with self._transaction() as db:
+            db.execute("UPDATE jobs SET progress = ? WHERE id = ?", (json.dumps(event, cls=NpEncoder), job_id))
+            self._add_event(db, job_id, event)
+
+    def finish(self, job_id, status, error=None, result_file=None, peak_rss_mb=None, profile=None):
+        """
+        Move a running job to a terminal status. Returns False if it is no
+        longer running, so a job process and the dispatcher racing to finish
+        the same job record only the first outcome. The run's profile, if
+        given, goes into the status event.
+        """
+        with self._transaction() as db:
+            updated = db.execute(
+                "UPDATE jobs SET status = ?, error = ?, result_file = COALESCE(?, result_file),"
+                " peak_rss_mb = COALESCE(?, peak_rss_mb), finished_at = ?"
+                " WHERE id = ? AND status = 'running'",
+                (status, error, result_file, peak_rss_mb, time.time(), job_id)
+            ).rowcount
+            if updated:
+                event = {"type": "status", "status": status}
+                if error:
+                    event["error"] = error
+                if profile:
+                    event["profile"] = profile
+                self._add_event(db, job_id, event)
+        return bool(updated)
+
+    def request_cancel(self, job_id):
+        """Cancel a queued job now, or flag a running one for the dispatcher"""
+        with self._transaction() as db:
+            row = db.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            if row["status"] == "queued":
+                db.execute("UPDATE jobs SET status = 'cancelled', error = 'Cancelled', finished_at = ? WHERE id = ?",
+                           (time.time(), job_id))
+                self._add_event(db, job_id, {"type": "status", "status": "cancelled", "error": "Cancelled"})
+            elif row["status"] == "running":
+                db.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+                self._add_event(db, job_id, {"type": "cancel_requested"})
+        return self.get(job_id)
+
+    def cancel_requested(self, job_ids):
+        if not job_ids:
+            return set()
+        marks = ",".join("?" * len(job_ids))
+        rows = self._query(f"SELECT id FROM jobs WHERE cancel_requested = 1 AND id IN ({marks})", list(job_ids))
+        return {row["id"] for row in rows}
+
+    def requeue(self, job_id, reason):
+        """Queue an interrupted job again, or fail it after MAX_ATTEMPTS"""
+        with self._transaction() as db:
+            row = db.execute("SELECT attempts, cancel_requested FROM jobs WHERE id = ? AND status = 'running'",
+                             (job_id,)).fetchone()
+            if row is None:
+                return
+            if row["cancel_requested"] or row["attempts"] >= MAX_ATTEMPTS:
+                status = "cancelled" if row["cancel_requested"] else "failed"
+                db.execute("UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                           (status, reason, time.time(), job_id))
+                self._add_event(db, job_id, {"type": "status", "status": status, "error": reason})
+            else:
+                db.execute("UPDATE jobs SET status = 'queued', pid = NULL, started_at = NULL WHERE id = ?", (job_id,))
+                self._add_event(db, job_id, {"type": "status", "status": "queued", "reason": reason})
+
+    def recover(self):
+        """Requeue jobs left running by a dispatcher that did not stop cleanly"""
+        for row in self._query("SELECT id FROM jobs WHERE status = 'running'"):
+            self.requeue(row["id"], "Interrupted: the job runner stopped")
+
+    def purge(self, retention_s=DEFAULT_RETENTION_S):
+        """Delete finished jobs older than retention_s with their events and results"""
+        cutoff = time.time() - retention_s
+        rows = self._query("SELECT id, result_file FROM jobs WHERE finished_at < ?", (cutoff,))
+        for row in rows:
+            if row["result_file"]:
+                with contextlib.suppress(OSError):
+                    os.remove(row["result_file"])
+        with self._transaction() as db:
+            db.execute("DELETE FROM events WHERE job_id IN (SELECT id FROM jobs WHERE finished_at < ?)", (cutoff,))
+            db.execute("DELETE FROM jobs WHERE finished_at < ?", (cutoff,))
+        return len(rows)
+
+    def counts(self):
+        return {row["status"]: row["n"] for row in self._query("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")}
+
+def _result_error(result):
+    if not isinstance(result, dict):
+        return None
+    return result.get("error") or (result.get("stats") or {}).get("error")
+
+def execute_job(job_id, run_job, store=None):
+    """
+    Run one claimed job in the current process (the job process the
+    dispatcher starts). The result is written as a binary envelope under
+    the job directory; results carrying an error finish the job as failed.
+    """
+    store = store or JobStore()
+    job = store.load(job_id)
+    if job is None:
+        raise ValueError(f"Unknown job '{job_id}'")
+
+    def on_terminate(signum, frame):
+        raise JobCancelled()
+
+    previous = signal.signal(signal.SIGTERM, on_terminate)
+    status, error, result_file, profile = "failed", None, None, None
+    try:
+        with progress_sink(lambda event: store.record_progress(job_id, event)):
+            result = run_job(job["payload"])
+        result_file = os.path.join(get_job_root(), "results", f"{job_id}.bin")
+        os.makedirs(os.path.dirname(result_file), exist_ok=True)
+        write_envelope(result, result_file)
+        error = _result_error(result)
+        status = "failed" if error else "succeeded"
+        profile = profile_summary(result.get("profile") if isinstance(result, dict) else None)
+    except JobCancelled:
+        status, error = "cancelled", "Cancelled"
+    except MemoryError:
+        error = "Out of memory"
+    except Exception as e:
+        error = str(e)
+    finally:
+        signal.signal(signal.SIGTERM, previous)
+    store.finish(job_id, status, error=error, result_file=result_file,
+                 peak_rss_mb=round(peak_rss_mb(), 1), profile=profile)
+    export_profile(profile, entry="job", job_id=job_id)
+    return status
+
+class Dispatcher:
+    """Starts queued jobs as processes and enforces their limits"""
+
+    def __init__(self, command, store=None, concurrency=None, techniques=None, stdout=None):
+        self.command = list(command)
+        self.store = store or JobStore()
+        self.concurrency = concurrency or default_concurrency()
+        self.techniques = set(techniques) if techniques else None
+        self.stdout = stdout or sys.stdout
+        self.running = {}
+        self.last_seq = self.store.last_seq()
+        self.last_purge = 0.0
+
+    def _write(self, message):
+        self.stdout.write(json.dumps(message, cls=NpEncoder) + "\n")
+        self.stdout.flush()
+
+    def handle(self, command):
+        """Apply one command and return its reply"""
+        kind = command.get("type")
+        store = self.store
+        if kind == "submit":
+            technique = command.get("technique")
+            if self.techniques is not None and technique not in self.techniques:
+                raise ValueError(f"Technique '{technique}' is not supported")
+            return {"job": store.submit(technique, command.get("payload") or {}, owner=command.get("owner"),
+                                        priority=command.get("priority", 0),
+                                        time_limit_s=command.get("time_limit_s"),
+                                        memory_limit_mb=command.get("memory_limit_mb"))}
+        if kind == "get":
+            return {"job": store.get(command["job_id"])}
+        if kind == "list":
+            return {"jobs": store.list(command.get("owner"), command.get("limit", 50))}
+        if kind == "events":
+            return {"events": store.events(command["job_id"], command.get("after", 0))}
+        if kind == "cancel":
+            return {"job": store.request_cancel(command["job_id"])}
+        if kind == "stats":
+            return {"concurrency": self.concurrency, "running": len(self.running), "counts": store.counts()}
+        raise ValueError(f"Unknown command '{kind}'")
+
+    def _start(self, job):
+        process = subprocess.Popen(self.command + [job["id"]], stdin=subprocess.DEVNULL, stdout=sys.stderr)
+        self.store.set_pid(job["id"], process.pid)
+        self.running[job["id"]] = {
+            "process": process,
+            "started": time.monotonic(),
+            "time_limit_s": job["time_limit_s"],
+            "memory_limit_mb": job["memory_limit_mb"],
+            "terminated_at": None
+        }
+
+    def _kill(self, job_id, status, error):
+        entry = self.running.pop(job_id)
+        entry["process"].kill()
+        entry["process"].wait()
+        self.store.finish(job_id, status, error=error)
+
+    def tick(self):
+        """Reap finished jobs, enforce limits and cancellations, start jobs"""
+        now = time.monotonic()
+        for job_id, entry in list(self.running.items()):
+            code = entry["process"].poll()
+            if code is not None:
+                del self.running[job_id]
+                # A job process finishes its own job unless it was killed
+                if entry["terminated_at"] is not None:
+                    self.store.finish(job_id, "cancelled", error="Cancelled")
+                else:
+                    self.store.finish(job_id, "failed", error=f"Job process exited with code {code}")
+                continue
+            if now - entry["started"] > entry["time_limit_s"]:
+                self._kill(job_id, "timeout", f"Exceeded the {entry['time_limit_s']:g}s time limit")
+                continue
+            rss = process_rss_mb(entry["process"].pid)
+            if rss is not None and rss > entry["memory_limit_mb"]:
+                self._kill(job_id, "failed", f"Exceeded the {entry['memory_limit_mb']:g} MB memory limit")
+                continue
+            if entry["terminated_at"] is not None and now - entry["terminated_at"] > CANCEL_GRACE_S:
+                self._kill(job_id, "cancelled", "Cancelled")
+
+        for job_id in self.store.cancel_requested(list(self.running)):
+            entry = self.running[job_id]
+            if entry["terminated_at"] is None:
+                entry["terminated_at"] = now
+                entry["process"].terminate()
+
+        while len(self.running) < self.concurrency:
+            job = self.store.claim_next()
+            if job is None:
+                break
+            try:
+                self._start(job)
+            except OSError as e:
+                self.store.finish(job["id"], "failed", error=f"Could not start the job: {str(e)}")
+
+        for seq, job_id, event in self.store.events_since(self.last_seq):
+            self.last_seq = seq
+            self._write({"type": "event", "job_id": job_id, "seq": seq, "event": event})
+
+        if time.time() - self.last_purge > PURGE_INTERVAL_S:
+            self.last_purge = time.time()
+            self.store.purge(_env_number("BUMP_JOB_RETENTION_S", DEFAULT_RETENTION_S))
+
+    def stop(self):
+        """Stop running jobs and queue them again for the next dispatcher"""
+        # Requeued first, so the jobs' own "cancelled" outcome is not recorded
+        for job_id, entry in self.running.items():
+            self.store.requeue(job_id, "Interrupted: the job runner stopped")
+            entry["process"].terminate()
+        deadline = time.monotonic() + CANCEL_GRACE_S
+        for entry in self.running.values():
+            try:
+                entry["process"].wait(max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                entry["process"].kill()
+                entry["process"].wait()
+        self.running.clear()
+
+def serve(command, store=None, concurrency=None, techniques=None, stdin=None, stdout=None):
+    """
+    Run the dispatcher until shutdown or EOF on stdin.
+
+    Args:
+        command: argv prefix that runs one job when the job id is appended
+        techniques: accepted technique names (any when None)
+    """
+    stdin = stdin or sys.stdin
+    store = store or JobStore()
+    store.recover()
+    dispatcher = Dispatcher(command, store, concurrency, techniques, stdout)
+    commands = queue.Queue()
+
+    def read():
+        for line in stdin:
+            if line.strip():
+                commands.put(line)
+        commands.put(None)
+
+    threading.Thread(target=read, daemon=True).start()
+    dispatcher._write({"type": "ready", "pid": os.getpid(), "concurrency": dispatcher.concurrency})
+    try:
+        while True:
+            try:
+                line = commands.get(timeout=POLL_INTERVAL_S)
+            except queue.Empty:
+                line = ""
+            if line is None:
+                return "eof"
+            if line:
+                try:
+                    message = json.loads(line)
+                except json.JSONDecodeError as e:
+                    dispatcher._write({"type": "reply", "ok": False, "error": f"Invalid command: {str(e)}"})
+                    continue
+                if message.get("type") == "shutdown":
+                    return "shutdown"
+                try:
+                    reply = {"id": message.get("id"), "type": "reply", "ok": True, **dispatcher.handle(message)}
+                except Exception as e:
+                    reply = {"id": message.get("id"), "type": "reply", "ok": False, "error": str(e)}
+                dispatcher._write(reply)
+            dispatcher.tick()
+    finally:
+        dispatcher.stop()
@@ -5,9 +5,40 @@ Shared utilities for JSON encoding and processing.
 import json
 import numpy as np
 
+class ColumnarRecords:
+    """
+    A list of row records held as one array per column.
+
+    Techniques return this instead of `df.to_dict('records')` for per-row
+    output: JSON encoding still produces the list of dicts, but the binary
+    result envelope can ship the columns as typed buffers without building
+    a Python dict per row.
+    """
+
+    def __init__(self, columns):
+        self.columns = {str(name): np.asarray(values) for name, values in columns.items()}
+        lengths = {len(values) for values in self.columns.values()}
+        if len(lengths) > 1:
+            raise ValueError("All record columns must have the same length")
+        self.length = lengths.pop() if lengths else 0
+
+    @classmethod
+    def from_frame(cls, df):
+        return cls({column: df[column].to_numpy() for column in df.columns})
+
+    def __len__(self):
+        return self.length
+
+    def as_records(self):
+        names = list(self.columns)
+        values = [self.columns[name].tolist() for name in names]
+        return [dict(zip(names, row)) for row in zip(*values)]
+
 class NpEncoder(json.JSONEncoder):
     """Custom JSON encoder for NumPy types"""
     def default(self, o):
+        if isinstance(o, ColumnarRecords):
+            return o.as_records()
         if isinstance(o, np.integer):
             return int(o)
         if isinstance(o, np.floating):
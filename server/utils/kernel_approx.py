@@ -0,0 +1,264 @@
+"""
+Low-rank kernel approximations for techniques that would otherwise build an
+n x n kernel matrix.
+
+- kernel_feature_map: a fitted Nystroem (landmark) or random Fourier feature
+  map whose inner products approximate the kernel
+- approximation_error: relative Frobenius error of that approximation on a
+  random sample of rows
+- approximate_kernel_pca: kernel PCA as linear PCA in the approximate feature
+  space, computed in row chunks so memory depends on the number of landmarks,
+  not on the number of rows
+- kernel_pca_projection: exact KernelPCA below a row threshold, the
+  approximation above it
+- svm_estimator: kernel SVC/SVR below a row threshold, an approximate feature
+  map feeding a linear SVM (or SGD) solver above it
+"""
+
+import numpy as np
+from sklearn.decomposition import KernelPCA
+from sklearn.kernel_approximation import Nystroem, RBFSampler
+from sklearn.metrics.pairwise import pairwise_kernels
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.svm import SVC, SVR, LinearSVC, LinearSVR
+from sklearn.linear_model import SGDClassifier, SGDRegressor
+from sklearn.calibration import CalibratedClassifierCV
+
+DEFAULT_LANDMARKS = 300
+DEFAULT_ERROR_SAMPLE = 500
+DEFAULT_CHUNK_ROWS = 10_000
+# Exact kernel PCA stores an n x n kernel matrix: 5000 rows is ~200 MB
+DEFAULT_EXACT_MAX_ROWS = 5000
+APPROXIMATIONS = ("nystroem", "rff")
+# Kernel SVMs scale between O(n^2) and O(n^3); past this they time out
+DEFAULT_SVM_EXACT_MAX_ROWS = 10_000
+# liblinear is exact but single-threaded; SGD takes over for classification
+# on very large inputs, and always for regression, where liblinear's
+# epsilon-insensitive solver converges too slowly on kernel features
+DEFAULT_SGD_MIN_ROWS = 200_000
+
+# Random Fourier features only exist for shift-invariant kernels
+RFF_KERNELS = {"rbf"}
+
+def kernel_feature_map(X, kernel="rbf", method="nystroem", n_components=DEFAULT_LANDMARKS,
+                       gamma=None, degree=3, coef0=1, random_state=42):
+    """
+    Fit an approximate feature map for a kernel.
+
+    Args:
+        X: dense training matrix (only a subset of rows is used for Nystroem)
+        kernel: kernel name as accepted by sklearn's pairwise_kernels
+        method: "nystroem" or "rff"
+        n_components: landmarks (Nystroem) or random features (RFF)
+        gamma: kernel coefficient; defaults to 1 / n_features like KernelPCA
+
+    Returns:
+        fitted transformer with a `transform` method
+    """
+    X = np.asarray(X, dtype=float)
+    gamma = gamma if gamma is not None else 1.0 / X.shape[1]
+    n_components = min(int(n_components), len(X))
+
+    if method == "rff":
+        if kernel not in RFF_KERNELS:
+            raise ValueError(f"Random Fourier features do not support the '{kernel}' kernel")
+        return RBFSampler(gamma=gamma, n_components=n_components, random_state=random_state).fit(X)
+
+    kernel_params = {"gamma": gamma, "degree": degree, "coef0": coef0}
+    if kernel in ("linear", "cosine"):
+        kernel_params = {}
+    elif kernel == "rbf":
+        kernel_params = {"gamma": gamma}
+    elif kernel == "sigmoid":
+        kernel_params = {"gamma": gamma, "coef0": coef0}
+    return Nystroem(
+        kernel=kernel,
+        n_components=n_components,
+        kernel_params=kernel_params or None,
+        random_state=random_state
+    ).fit(X)
+
+def _kernel(X, kernel, gamma, degree, coef0):
+    if kernel in ("linear", "cosine"):
+        return pairwise_kernels(X, metric=kernel)
+    if kernel == "rbf":
+        return pairwise_kernels(X, metric=kernel, gamma=gamma)
+    if kernel == "sigmoid":
+        return pairwise_kernels(X, metric=kernel, gamma=gamma, coef0=coef0)
+    return pairwise_kernels(X, metric=kernel, gamma=gamma, degree=degree, coef0=coef0)
+
+def approximation_error(X, feature_map, kernel="rbf", sample_size=DEFAULT_ERROR_SAMPLE,
+                        gamma=None, degree=3, coef0=1, random_state=0):
+    """
+    Relative Frobenius error ||K - Z Z^T|| / ||K|| on a random sample of rows.
+
+    Only the sample's kernel matrix is built, so this costs O(sample_size^2).
+    """
+    X = np.asarray(X, dtype=float)
+    gamma = gamma if gamma is not None else 1.0 / X.shape[1]
+    rng = np.random.default_rng(random_state)
+    rows = rng.choice(len(X), min(sample_size, len(X)), replace=False)
+    sample = X[np.sort(rows)]
+
+    exact = _kernel(sample, kernel, gamma, degree, coef0)
+    features = feature_map.transform(sample)
+    approx = features @ features.T
+    norm = np.linalg.norm(exact)
+    return float(np.linalg.norm(exact - approx) / norm) if norm else 0.0
+
+def approximate_kernel_pca(X, feature_map, n_components=2, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Project rows onto the top principal components of the feature space.
+
+    Two chunked passes: the first accumulates the mean and covariance of the
+    features, the second projects each chunk.
+
+    Returns:
+        (projection, explained_variance_ratio) where the ratio is relative
+        to the total variance of the approximate feature space
+    """
+    X = np.asarray(X, dtype=float)
+    n = len(X)
+    total = None
+    outer = None
+    for start in range(0, n, chunk_rows):
+        features = feature_map.transform(X[start:start + chunk_rows])
+        if total is None:
+            total = np.zeros(features.shape[1])
+            outer = np.zeros((features.shape[1], features.shape[1]))
+        total += features.sum(axis=0)
+        outer += features.T @ features
+
+    mean = total / n
+    covariance = outer / n - np.outer(mean, mean)
+    eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+    order = np.argsort(eigenvalues)[::-1][:n_components]
+    components = eigenvectors[:, order]
+    # Match sklearn's sign convention so repeated runs give the same picture
+    signs = np.sign(components[np.argmax(np.abs(components), axis=0), np.arange(components.shape[1])])
+    components *= np.where(signs == 0, 1, signs)
+
+    projection = np.empty((n, components.shape[1]))
+    for start in range(0, n, chunk_rows):
+        features = feature_map.transform(X[start:start + chunk_rows])
+        projection[start:start + len(features)] = (features - mean) @ components
+
+    variance = np.clip(eigenvalues, 0, None)
+    ratio = variance[order] / variance.sum() if variance.sum() else np.zeros(len(order))
+    return projection, ratio
+
+def _resolve_mode(n_rows, mode, exact_max_rows):
+    if mode == "auto":
+        mode = "approximate" if n_rows > exact_max_rows else "exact"
+    if mode not in ("exact", "approximate"):
+        raise ValueError(f"Unknown mode '{mode}'")
+    return mode
+
+def kernel_pca_projection(X, kernel="rbf", n_components=2, mode="auto",
+                          exact_max_rows=DEFAULT_EXACT_MAX_ROWS, approximation="nystroem",
+                          n_landmarks=DEFAULT_LANDMARKS, error_sample_size=DEFAULT_ERROR_SAMPLE):
+    """
+    Kernel PCA projection that stays tractable on large inputs.
+
+    Args:
+        mode: "exact", "approximate", or "auto" (approximate above
+            exact_max_rows)
+        approximation: "nystroem" or "rff" for the approximate mode
+
+    Returns:
+        (projection, info) where info has mode, approximation, n_landmarks,
+        approximation_error and explained_variance_ratio (the last three
+        are None in exact mode)
+    """
+    X = np.asarray(X, dtype=float)
+    mode = _resolve_mode(len(X), mode, exact_max_rows)
+
+    if mode == "exact":
+        projection = KernelPCA(n_components=n_components, kernel=kernel).fit_transform(X)
+        return projection, {"mode": mode, "approximation": None, "n_landmarks": None,
+                            "approximation_error": None, "explained_variance_ratio": None}
+
+    if approximation not in APPROXIMATIONS:
+        raise ValueError(f"Unknown approximation '{approximation}'")
+    feature_map = kernel_feature_map(X, kernel, approximation, n_landmarks)
+    projection, ratio = approximate_kernel_pca(X, feature_map, n_components)
+    return projection, {
+        "mode": mode,
+        "approximation": approximation,
+        "n_landmarks": min(int(n_landmarks), len(X)),
+        "approximation_error": round(approximation_error(X, feature_map, kernel, error_sample_size), 4),
+        "explained_variance_ratio": [round(float(r), 4) for r in ratio]
+    }
+
+def _calibrated(estimator, probability):
+    """Platt scaling from a 3-fold cross-validation, fitted only on request"""
+    if not probability:
+        return estimator
+    return CalibratedClassifierCV(estimator, method="sigmoid", cv=3, ensemble=False)
+
+def svm_estimator(task, X, mode="auto", exact_max_rows=DEFAULT_SVM_EXACT_MAX_ROWS,
+                  approximation="nystroem", n_landmarks=DEFAULT_LANDMARKS, solver="auto",
+                  probability=False, C=1.0, epsilon=0.1, random_state=42):
+    """
+    Build an unfitted support vector estimator sized for the training data.
+
+    The approximate path uses the same gamma as SVC/SVR's default
+    ("scale"), so switching modes changes the solver, not the model family.
+    Probability calibration (Platt scaling via an internal cross-validation)
+    is only added when `probability` is set.
+
+    Args:
+        task: "classification" or "regression"
+        X: training matrix, used for the row count, gamma and the feature map
+        mode: "exact", "approximate", or "auto" (approximate above
+            exact_max_rows)
+        solver: "linear", "sgd", or "auto" (see DEFAULT_SGD_MIN_ROWS)
+
+    Returns:
+        (estimator, info) where info has mode, approximation, n_landmarks and
+        solver (the last three are None in exact mode)
+    """
+    X = np.asarray(X, dtype=float)
+    n_rows = len(X)
+    mode = _resolve_mode(n_rows, mode, exact_max_rows)
+    classification = task == "classification"
+
+    if mode == "exact":
+        if classification:
+            estimator = SVC(C=C, random_state=random_state)
+        else:
+            estimator = SVR(C=C, epsilon=epsilon)
+        info = {"mode": mode, "approximation": None, "n_landmarks": None, "solver": None}
+        return _calibrated(estimator, classification and probability), info
+
+    if approximation not in APPROXIMATIONS:
+        raise ValueError(f"Unknown approximation '{approximation}'")
+    if solver == "auto":
+        solver = "sgd" if n_rows >= DEFAULT_SGD_MIN_ROWS or not classification else "linear"
+    if solver not in ("linear", "sgd"):
+        raise ValueError(f"Unknown solver '{solver}'")
+
+    variance = X.var()
+    gamma = 1.0 / (X.shape[1] * variance) if variance > 0 else 1.0
+    n_landmarks = min(int(n_landmarks), n_rows)
+    if approximation == "rff":
+        feature_map = RBFSampler(gamma=gamma, n_components=n_landmarks, random_state=random_state)
+    else:
+        feature_map = Nystroem(gamma=gamma, n_components=n_landmarks, random_state=random_state)
+
+    if classification and solver == "sgd":
+        # alpha plays the role of 1 / (C * n) in the hinge-loss objective
+        linear = SGDClassifier(loss="hinge", alpha=1.0 / (C * n_rows), random_state=random_state)
+    elif classification:
+        linear = LinearSVC(C=C, random_state=random_state)
+    elif solver == "sgd":
+        linear = SGDRegressor(loss="epsilon_insensitive", epsilon=epsilon,
+                              alpha=1.0 / (C * n_rows), random_state=random_state)
+    else:
+        linear = LinearSVR(C=C, epsilon=epsilon, dual="auto", random_state=random_state)
+
+    # SGD is sensitive to feature scale; liblinear is not
+    steps = [feature_map, StandardScaler(), linear] if solver == "sgd" else [feature_map, linear]
+    estimator = _calibrated(make_pipeline(*steps), classification and probability)
+    return estimator, {"mode": mode, "approximation": approximation, "n_landmarks": n_landmarks, "solver": solver}
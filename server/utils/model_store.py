@@ -0,0 +1,246 @@
+"""
+Registry of fitted models, so predictions do not need a refit.
+
+Techniques hand their fitted estimator back by adding a `model_artifact`
+entry to their result (built with `model_artifact`). run_model pops it and
+stores it under the same content address as the result cache: dataset
+hash, technique, normalized params and library versions. The key is
+returned to the caller as `stats.model_id`.
+
+Artifacts are uncompressed joblib files, so their NumPy arrays are
+memory-mapped on load instead of copied. The store keeps a byte budget with
+LRU eviction on disk (the result cache's SQLite index) and a small LRU of
+loaded artifacts in memory, which lets a warm worker serve `predict` for
+new rows in milliseconds.
+
+Usage:
+    python -m server.utils.model_store stats
+    python -m server.utils.model_store clear
+"""
+
+import os
+import sys
+import json
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import joblib
+
+from .result_cache import ResultCache
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+DEFAULT_MEMORY_ENTRIES = 8
+ARTIFACT_VERSION = 1
+
+def get_model_root():
+    """Root for persisted models (override with BUMP_MODEL_CACHE)"""
+    default = os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+        "uploads", ".models"
+    )
+    return os.environ.get("BUMP_MODEL_CACHE", default)
+
+def model_artifact(estimator, features, target=None, methods=("predict",), classes=None):
+    """
+    Describe a fitted estimator for the store.
+
+    Args:
+        estimator: fitted object exposing the listed methods
+        features: input column names, in the order the estimator expects
+        target: target column name for supervised models
+        methods: estimator methods `predict_rows` may call; the first is
+            the default
+    """
+    return {
+        "version": ARTIFACT_VERSION,
+        "estimator": estimator,
+        "features": list(features),
+        "target": target,
+        "methods": list(methods),
+        "classes": None if classes is None else list(classes)
+    }
+
+class ModelStore(ResultCache):
+    """Joblib artifacts on disk plus an in-memory LRU of loaded ones"""
+
+    suffix = ".joblib"
+
+    def __init__(self, root, max_bytes=DEFAULT_MAX_BYTES, memory_entries=DEFAULT_MEMORY_ENTRIES):
+        super().__init__(root, max_bytes=max_bytes)
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+
+    def _load(self, path):
+        # Arrays stay on disk and are paged in as the estimator touches them
+        return joblib.load(path, mmap_mode="r")
+
+    def _dump(self, value, path):
+        joblib.dump(value, path)
+        return os.path.getsize(path)
+
+    def get(self, key):
+        artifact = self._memory.get(key)
+        if artifact is not None:
+            self._memory.move_to_end(key)
+            return artifact
+        artifact = super().get(key)
+        if artifact is not None:
+            self._remember(key, artifact)
+        return artifact
+
+    def put(self, key, result, technique=None, dataset_hash=None):
+        stored = super().put(key, result, technique=technique, dataset_hash=dataset_hash)
+        if stored:
+            self._remember(key, result)
+        return stored
+
+    def _remember(self, key, artifact):
+        self._memory[key] = artifact
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def clear(self):
+        super().clear()
+        self._memory.clear()
+
+_store = None
+
+def get_model_store():
+    """
+    Return the process-wide model store, or None when disabled.
+
+    Configured with BUMP_MODEL_STORE ("off" disables it),
+    BUMP_MODEL_STORE_MAX_BYTES and BUMP_MODEL_STORE_MEMORY_ENTRIES.
+    """
+    global _store
+    if _store is None:
+        setting = os.environ.get("BUMP_MODEL_STORE", "")
+        if setting.lower() in ("0", "off", "false"):
+            return None
+        _store = ModelStore(
+            os.path.join(get_model_root(), "store"),
+            max_bytes=int(os.environ.get("BUMP_MODEL_STORE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+            memory_entries=int(os.environ.get("BUMP_MODEL_STORE_MEMORY_ENTRIES", DEFAULT_MEMORY_ENTRIES))
+        )
+    return _store
+
+def save_model_artifact(technique, dataset_hash, params, result):
+    """
+    Move a result's `model_artifact` into the store.
+
+    The artifact is always removed from the result (it is not serializable);
+    when it was stored, `stats.model_id` tells the caller how to reach it.
+
+    Args:
+        dataset_hash: content hash, or a callable returning it (only called
+            when there is an artifact to store)
+    """
+    if not isinstance(result, dict):
+        return result
+    artifact = result.pop("model_artifact", None)
+    store = get_model_store()
+    if artifact is None or store is None:
+        return result
+    if callable(dataset_hash):
+        dataset_hash = dataset_hash()
+    # Same address as the run's cached result, in a different store
+    key = store.make_key(dataset_hash, technique, params)
+    if store.put(key, artifact, technique=technique, dataset_hash=dataset_hash) and isinstance(result.get("stats"), dict):
+        result["stats"]["model_id"] = key
+    return result
+
+def model_available(result):
+    """
+    Whether the model a result names as stats.model_id is still stored.
+
+    The store evicts on its own budget, so a cached result can outlive its
+    model; run_model recomputes such results, which stores the model again
+    under the same id.
+    """
+    stats = result.get("stats") if isinstance(result, dict) else None
+    model_id = stats.get("model_id") if isinstance(stats, dict) else None
+    if model_id is None:
+        return True
+    store = get_model_store()
+    return store is not None and store.contains(model_id)
+
+def load_model(model_id):
+    """Return the stored artifact for a model id, or raise LookupError"""
+    store = get_model_store()
+    if store is None:
+        raise RuntimeError("Model store is disabled")
+    artifact = store.get(model_id)
+    if artifact is None:
+        raise LookupError(f"No stored model with id '{model_id}'; it may have been evicted. "
+                          "Run the technique again with the same params and dataset to refit it "
+                          "under the same id")
+    return artifact
+
+def resolve_method(artifact, method=None):
+    """Validate a requested method against the artifact; defaults to its first"""
+    method = method or artifact["methods"][0]
+    if method not in artifact["methods"]:
+        raise ValueError(f"Method '{method}' is not available; choose from {artifact['methods']}")
+    return method
+
+def apply_model(artifact, rows, method):
+    """Call `method` on the artifact's estimator for a frame of rows"""
+    missing = [c for c in artifact["features"] if c not in rows.columns]
+    if missing:
+        raise ValueError(f"Rows are missing feature columns: {missing}")
+    estimator = artifact["estimator"]
+    X = rows[artifact["features"]]
+    if not hasattr(estimator, "feature_names_in_"):
+        # Fitted on a bare array; passing a frame would only add a warning
+        X = X.to_numpy()
+    return np.asarray(getattr(estimator, method)(X))
+
+def predict_rows(model_id, rows, method=None):
+    """
+    Apply a stored model to new rows.
+
+    Args:
+        model_id: key returned as stats.model_id by the run that fitted it
+        rows: DataFrame (or records) with the model's feature columns
+        method: one of the artifact's methods; defaults to its first
+
+    Returns:
+        {"model_id", "method", "rows", "features", "output", "elapsed_ms"}
+        plus "classes" for classifiers
+    """
+    started = time.perf_counter()
+    artifact = load_model(model_id)
+    method = resolve_method(artifact, method)
+    if not isinstance(rows, pd.DataFrame):
+        rows = pd.DataFrame(rows)
+
+    response = {
+        "model_id": model_id,
+        "method": method,
+        "rows": len(rows),
+        "features": artifact["features"],
+        "output": apply_model(artifact, rows, method)
+    }
+    if artifact.get("classes") is not None:
+        response["classes"] = artifact["classes"]
+    response["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return response
+
+def read_rows(path):
+    """Read rows to predict on from a CSV or JSON (records) file"""
+    if path.lower().endswith(".json"):
+        return pd.read_json(path)
+    return pd.read_csv(path)
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    store = get_model_store()
+    if store is None:
+        print(json.dumps({"error": "Model store is disabled"}))
+        sys.exit(1)
+    if command == "clear":
+        store.clear()
+    print(json.dumps(store.stats()))
@@ -0,0 +1,221 @@
+"""
+Run several techniques on one loaded dataset.
+
+Running every valid technique used to mean one request, one interpreter and
+one dataset parse per technique. A multi-run parses the dataset once and:
+
+- profiles it the way the constraints router does (numeric feature count,
+  missing percentage, time column) and keeps the techniques whose rules in
+  shared/rules/constraints.json pass
+- prepares one numeric feature frame for all of them: numeric columns only,
+  with a single NaN policy ("drop" incomplete rows, "impute" column medians,
+  or "keep")
+- places that frame in shared memory; pool workers map it read-only instead
+  of receiving a pickled copy
+- yields each technique's result as soon as it finishes, in completion order
+
+Techniques that need more than numeric features (time-series rules) are
+skipped with a reason, as are unsupported or rule-less ones unless they are
+requested explicitly.
+"""
+
+import os
+import sys
+import json
+import time
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from .thread_budget import total_threads
+
+NAN_POLICIES = ("drop", "impute", "keep")
+# Rows sampled from text columns when looking for parseable dates
+DATE_SAMPLE_ROWS = 100
+
+def get_rules_path():
+    return os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+        "shared", "rules", "constraints.json"
+    )
+
+def load_rules(path=None):
+    with open(path or get_rules_path()) as f:
+        return json.load(f)
+
+def _has_time_column(df):
+    for column in df.columns:
+        series = df[column]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            return True
+        if series.dtype == object or pd.api.types.is_string_dtype(series):
+            sample = series.dropna().head(DATE_SAMPLE_ROWS)
+            if len(sample) and pd.to_datetime(sample, errors="coerce", format="mixed").notna().all():
+                return True
+    return False
+
+def profile_frame(df):
+    """The dataset facts the constraint rules are written against"""
+    numeric = df.select_dtypes(include="number")
+    cells = numeric.size
+    return {
+        "rows": int(len(df)),
+        "num_features": int(numeric.shape[1]),
+        "missing_percent": round(float(numeric.isna().to_numpy().sum()) * 100 / cells, 2) if cells else 0.0,
+        "has_time_column": _has_time_column(df.drop(columns=numeric.columns))
+    }
+
+def valid_techniques(profile, supported, rules=None, target_column=None, requested=None):
+    """
+    Choose the techniques to run.
+
+    Args:
+        profile: output of profile_frame
+        supported: techniques the runner can execute
+        rules: constraint rules (defaults to shared/rules/constraints.json)
+        requested: explicit technique list; rules are then only used to
+            skip time-series techniques, which need the full table
+
+    Returns:
+        (techniques, skipped) where skipped maps technique to a reason
+    """
+    rules = {rule["internal_code"]: rule for rule in (rules if rules is not None else load_rules())}
+    candidates = list(requested) if requested else list(rules)
+    techniques, skipped = [], {}
+    for technique in candidates:
+        rule = rules.get(technique)
+        if technique not in supported:
+            skipped[technique] = "not supported"
+        elif rule and rule.get("time_series_required"):
+            skipped[technique] = "needs the full table, not the shared numeric features"
+        elif requested:
+            techniques.append(technique)
+        elif profile["num_features"] < rule.get("min_numeric_features", 0):
+            skipped[technique] = f"needs at least {rule['min_numeric_features']} numeric features"
+        elif profile["missing_percent"] > rule.get("max_missing", 100):
+            skipped[technique] = f"allows at most {rule['max_missing']}% missing values"
+        elif rule.get("requires_target") and not target_column:
+            skipped[technique] = "needs a target column"
+        else:
+            techniques.append(technique)
+    return techniques, skipped
+
+def prepare_features(df, nan_policy="drop"):
+    """Numeric float64 features with one NaN policy applied for every technique"""
+    if nan_policy not in NAN_POLICIES:
+        raise ValueError(f"Unknown nan_policy '{nan_policy}'")
+    numeric = df.select_dtypes(include="number").astype(np.float64)
+    if nan_policy == "drop":
+        numeric = numeric.dropna()
+    elif nan_policy == "impute":
+        numeric = numeric.fillna(numeric.median())
+    return numeric.reset_index(drop=True)
+
+class SharedFrame:
+    """A float64 frame copied once into shared memory (column-major)"""
+
+    def __init__(self, frame):
+        values = frame.to_numpy(dtype=np.float64)
+        self.columns = [str(c) for c in frame.columns]
+        self.shape = values.shape
+        self.memory = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        # Column-major so each column is one contiguous slice
+        target = np.ndarray(self.shape, dtype=np.float64, buffer=self.memory.buf, order="F")
+        target[:] = values
+
+    def spec(self):
+        return {"name": self.memory.name, "shape": self.shape, "columns": self.columns}
+
+    def close(self):
+        self.memory.close()
+        with contextlib.suppress(FileNotFoundError):
+            self.memory.unlink()
+
+def attach_frame(spec):
+    """
+    Map a SharedFrame from another process.
+
+    Returns:
+        (shared memory handle, read-only DataFrame backed by it)
+    """
+    # Spawned pool workers share the parent's resource tracker, so attaching
+    # here does not hand ownership over; the parent unlinks the segment
+    memory = shared_memory.SharedMemory(name=spec["name"])
+    values = np.ndarray(tuple(spec["shape"]), dtype=np.float64, buffer=memory.buf, order="F")
+    values.flags.writeable = False
+    frame = pd.DataFrame({c: values[:, i] for i, c in enumerate(spec["columns"])}, copy=False)
+    return memory, frame
+
+# Worker-process state, set once by _init_worker
+_worker = {}
+
+def _init_worker(spec):
+    memory, frame = attach_frame(spec)
+    _worker.update(memory=memory, frame=frame)
+
+def _run_task(runner, technique, params):
+    started = time.perf_counter()
+    # Technique modules print progress; stdout belongs to the result stream
+    with contextlib.redirect_stdout(sys.stderr):
+        result = runner(technique, _worker["frame"], dict(params))
+    return result, round((time.perf_counter() - started) * 1000, 1)
+
+def run_all(frame, techniques, runner, params=None, workers=None, cached=None):
+    """
+    Run techniques on one prepared frame, yielding results as they finish.
+
+    Args:
+        frame: prepared numeric features (see prepare_features)
+        runner: picklable module-level callable (technique, frame, params)
+            returning a result dict; it runs in a pool worker
+        workers: worker processes; defaults to one per technique up to the
+            host's thread budget (each worker then takes its fair share of
+            threads through thread_budget)
+        cached: optional callable (technique) returning a finished result or
+            None; hits are yielded immediately without a worker
+
+    Yields:
+        (technique, result, elapsed_ms, cache_hit)
+    """
+    params = params or {}
+    pending = []
+    for technique in techniques:
+        result = cached(technique) if cached else None
+        if result is not None:
+            yield technique, result, 0.0, True
+        else:
+            pending.append(technique)
+    if not pending:
+        return
+
+    workers = max(1, min(len(pending), int(workers or total_threads())))
+    if workers == 1:
+        _worker["frame"] = frame
+        try:
+            for technique in pending:
+                result, elapsed = _run_task(runner, technique, params)
+                yield technique, result, elapsed, False
+        finally:
+            _worker.clear()
+        return
+
+    shared = SharedFrame(frame)
+    try:
+        # spawn: forked children would inherit the parent's OpenMP state
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker, initargs=(shared.spec(),)) as pool:
+            futures = {pool.submit(_run_task, runner, technique, params): technique for technique in pending}
+            for future in as_completed(futures):
+                technique = futures[future]
+                try:
+                    result, elapsed = future.result()
+                except Exception as e:
+                    result, elapsed = {"charts": {}, "stats": {"error": f"Worker error: {str(e)}"},
+                                       "tables": {}, "explanation": "An error occurred during model execution."}, None
+                yield technique, result, elapsed, False
+    finally:
+        shared.close()
@@ -0,0 +1,131 @@
+"""
+Cached radius-neighbour graphs for density-based clustering.
+
+Building the neighbourhoods is the expensive part of DBSCAN. A sparse
+radius-neighbour graph built once at radius r (using a KD/ball tree) answers
+every eps <= r by dropping longer edges, so eps/min_samples sweeps on the
+same features reuse it instead of querying the tree again.
+
+Graphs are kept in a small in-process LRU (useful in long-lived workers)
+and on disk as `.npz` files keyed by a fingerprint of the feature matrix.
+"""
+
+import os
+import glob
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.neighbors import NearestNeighbors
+
+from .thread_budget import allotted_threads
+
+MEMORY_CACHE_ENTRIES = 4
+DISK_CACHE_ENTRIES = 16
+
+_memory_cache = OrderedDict()
+
+def get_cache_dir():
+    """Directory for cached graphs (override with BUMP_NEIGHBOR_CACHE)"""
+    default = os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+        "uploads", ".neighbors"
+    )
+    return os.environ.get("BUMP_NEIGHBOR_CACHE", default)
+
+def feature_fingerprint(X, columns=None):
+    """Hash a dense feature matrix and its column names"""
+    X = np.ascontiguousarray(X, dtype=float)
+    digest = hashlib.sha1()
+    digest.update(str(X.shape).encode())
+    digest.update(repr(list(columns) if columns is not None else []).encode())
+    digest.update(X.tobytes())
+    return digest.hexdigest()
+
+def filter_graph(graph, eps):
+    """Keep only the edges of a distance graph that are no longer than eps"""
+    graph = graph.tocsr()
+    if graph.nnz and graph.data.max() <= eps:
+        return graph
+    rows = np.repeat(np.arange(graph.shape[0]), np.diff(graph.indptr))
+    mask = graph.data <= eps
+    counts = np.bincount(rows[mask], minlength=graph.shape[0])
+    indptr = np.concatenate(([0], np.cumsum(counts)))
+    # Explicit zero distances (duplicate points) must survive, so build the
+    # matrix from arrays rather than through arithmetic that drops zeros
+    return sp.csr_matrix((graph.data[mask], graph.indices[mask], indptr), shape=graph.shape)
+
+def _remember(key, radius, graph):
+    _memory_cache[key] = (radius, graph)
+    _memory_cache.move_to_end(key)
+    while len(_memory_cache) > MEMORY_CACHE_ENTRIES:
+        _memory_cache.popitem(last=False)
+
+def _graph_path(directory, key, radius):
+    # The radius is written exactly (as a hex float): a rounded one could
+    # claim coverage of an eps slightly beyond the graph's
+    return os.path.join(directory, f"{key}-x{float(radius).hex()}.npz")
+
+def _load_from_disk(key, radius):
+    """Return (radius, graph) for the smallest cached graph covering radius"""
+    best = None
+    for path in glob.glob(os.path.join(get_cache_dir(), f"{key}-x*.npz")):
+        try:
+            cached_radius = float.fromhex(os.path.basename(path)[len(key) + 2:-4])
+        except ValueError:
+            continue
+        if cached_radius >= radius and (best is None or cached_radius < best[0]):
+            best = (cached_radius, path)
+    if best is None:
+        return None
+    try:
+        return best[0], sp.load_npz(best[1])
+    except (OSError, ValueError):
+        return None
+
+def _save_to_disk(key, radius, graph):
+    directory = get_cache_dir()
+    try:
+        os.makedirs(directory, exist_ok=True)
+        path = _graph_path(directory, key, radius)
+        scratch = f"{path}.{os.getpid()}.tmp.npz"
+        sp.save_npz(scratch, graph, compressed=False)
+        os.replace(scratch, path)
+
+        files = sorted(glob.glob(os.path.join(directory, "*.npz")), key=os.path.getmtime)
+        for stale in files[:-DISK_CACHE_ENTRIES]:
+            os.remove(stale)
+    except OSError:
+        # The disk cache is an optimisation; a failed write only costs a rebuild
+        pass
+
+def radius_graph(X, radius, key=None):
+    """
+    Return a sparse distance graph covering at least `radius`.
+
+    Args:
+        X: dense feature matrix
+        radius: minimum neighbourhood radius the graph must cover
+        key: feature fingerprint; computed from X when omitted
+
+    Returns:
+        (graph, graph_radius, cache_hit)
+    """
+    key = key or feature_fingerprint(X)
+
+    cached = _memory_cache.get(key)
+    if cached and cached[0] >= radius:
+        _memory_cache.move_to_end(key)
+        return cached[1], cached[0], True
+
+    cached = _load_from_disk(key, radius)
+    if cached:
+        _remember(key, *cached)
+        return cached[1], cached[0], True
+
+    tree = NearestNeighbors(radius=radius, n_jobs=allotted_threads()).fit(X)
+    graph = tree.radius_neighbors_graph(X, mode="distance").tocsr()
+    _remember(key, radius, graph)
+    _save_to_disk(key, radius, graph)
+    return graph, radius, False
@@ -0,0 +1,323 @@
+"""
+Shared feature preprocessing for the technique modules.
+
+Techniques used to repeat `select_dtypes(include='number')`, `dropna()` and
+the target/feature split, copying the data each time and silently dropping
+incomplete rows. `feature_matrix` does this once per (dataset, target,
+feature set, missing-value policy, scaling, dtype):
+
+- the features become one C-contiguous float32/float64 matrix, filled column
+  by column so no intermediate frame is built
+- missing feature values are dropped or imputed according to `missing`, and
+  the counts are reported instead of happening silently; rows without a
+  target are always dropped
+- the result is cached in memory and on disk (uncompressed joblib, so its
+  arrays are memory-mapped on load) under the dataset's content hash, which
+  run_model provides through `dataset_scope`
+- techniques receive read-only arrays; `FeatureSet.frame()` wraps them in a
+  DataFrame without copying
+- the fill values and scaler parameters are kept, and `FeatureSet.pipeline`
+  puts them in front of a fitted estimator so stored models replay the same
+  transform on new raw rows
+
+Outside a dataset scope (scripts, tests) nothing is cached.
+"""
+
+import os
+import warnings
+import threading
+import contextlib
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.pipeline import Pipeline
+
+from .model_store import ModelStore, get_model_root
+from .profiling import profile_stage
+
+MISSING_POLICIES = ("drop", "median", "mean", "zero", "keep")
+DEFAULT_MISSING = "median"
+SCALINGS = (None, "standard", "minmax")
+DTYPES = ("float64", "float32")
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024
+FEATURE_FORMAT_VERSION = 2
+
+_local = threading.local()
+
+@contextlib.contextmanager
+def dataset_scope(dataset_hash):
+    """
+    Declare which dataset the frames handed to techniques come from.
+
+    Args:
+        dataset_hash: content hash, or a callable returning it (only called
+            when a feature matrix is actually requested)
+    """
+    previous = getattr(_local, "dataset_hash", None)
+    _local.dataset_hash = dataset_hash
+    try:
+        yield
+    finally:
+        _local.dataset_hash = previous
+
+def _current_hash():
+    dataset_hash = getattr(_local, "dataset_hash", None)
+    if callable(dataset_hash):
+        dataset_hash = _local.dataset_hash = dataset_hash()
+    return dataset_hash
+
+class FeatureSet:
+    """Read-only feature matrix and target vector with their provenance"""
+
+    def __init__(self, X, y, rows, feature_names, target_name, info):
+        self.X = X
+        self.y = y
+        self.rows = rows
+        self.feature_names = feature_names
+        self.target_name = target_name
+        self.info = info
+
+    def frame(self):
+        """Features as a DataFrame backed by X (no copy)"""
+        return pd.DataFrame(self.X, columns=self.feature_names, copy=False)
+
+    def target(self):
+        """Target as a Series aligned with frame(), or None"""
+        if self.y is None:
+            return None
+        return pd.Series(self.y, name=self.target_name, copy=False)
+
+    def pipeline(self, estimator):
+        """
+        The estimator behind this set's imputation and scaling, for stored
+        models that are applied to raw rows; the bare estimator when the
+        transform is the identity
+        """
+        fill = self.info.get("fill_values")
+        scaler = self.info.get("scaler")
+        if fill is None and scaler is None:
+            return estimator
+        transform = FeatureTransform(
+            self.feature_names,
+            fill=fill,
+            center=scaler["center"] if scaler else None,
+            scale=scaler["scale"] if scaler else None,
+            # Match what the estimator was fitted on, so it does not warn
+            frame_output=hasattr(estimator, "feature_names_in_")
+        )
+        return Pipeline([("preprocess", transform), ("estimator", estimator)])
+
+    def _state(self):
+        return {k: getattr(self, k) for k in ("X", "y", "rows", "feature_names", "target_name", "info")}
+
+class FeatureTransform(TransformerMixin, BaseEstimator):
+    """Replays a FeatureSet's imputation and scaling; fitted at construction"""
+
+    def __init__(self, features, fill=None, center=None, scale=None, frame_output=False):
+        self.features = features
+        self.fill = fill
+        self.center = center
+        self.scale = scale
+        self.frame_output = frame_output
+
+    def fit(self, X, y=None):
+        return self
+
+    def transform(self, X):
+        if isinstance(X, pd.DataFrame):
+            X = X[self.features]
+        X = np.array(X, dtype=np.float64)
+        if self.fill is not None:
+            rows_idx, cols_idx = np.nonzero(np.isnan(X))
+            X[rows_idx, cols_idx] = np.asarray(self.fill, dtype=np.float64)[cols_idx]
+        if self.center is not None:
+            X -= np.asarray(self.center, dtype=np.float64)
+            X /= np.asarray(self.scale, dtype=np.float64)
+        return pd.DataFrame(X, columns=self.features) if self.frame_output else X
+
+    def __sklearn_tags__(self):
+        tags = super().__sklearn_tags__()
+        tags.input_tags.allow_nan = self.fill is not None
+        return tags
+
+class FeatureCache(ModelStore):
+    """Feature sets on disk plus an in-memory LRU of memory-mapped ones"""
+
+    def put(self, key, result, technique=None, dataset_hash=None):
+        stored = super().put(key, result, technique=technique, dataset_hash=dataset_hash)
+        if stored:
+            # Serve later requests from the memory map, not the built copy
+            self._memory.pop(key, None)
+        return stored
+
+_cache = None
+
+def get_feature_cache():
+    """
+    Return the process-wide feature cache, or None when disabled.
+
+    Configured with BUMP_FEATURE_CACHE ("off" disables it, any other value is
+    the directory) and BUMP_FEATURE_CACHE_MAX_BYTES.
+    """
+    global _cache
+    if _cache is None:
+        setting = os.environ.get("BUMP_FEATURE_CACHE", "")
+        if setting.lower() in ("0", "off", "false"):
+            return None
+        _cache = FeatureCache(
+            setting or os.path.join(os.path.dirname(get_model_root()), ".features"),
+            max_bytes=int(os.environ.get("BUMP_FEATURE_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+        )
+    return _cache
+
+def _read_only(array):
+    if array is not None and array.flags.writeable:
+        array.flags.writeable = False
+    return array
+
+def build_features(df, target=None, features=None, missing=DEFAULT_MISSING, scaling=None, dtype="float64"):
+    """Build a FeatureSet without caching (see feature_matrix for the args)"""
+    if missing not in MISSING_POLICIES:
+        raise ValueError(f"Unknown missing-value policy '{missing}'")
+    if scaling not in SCALINGS:
+        raise ValueError(f"Unknown scaling '{scaling}'")
+    if dtype not in DTYPES:
+        raise ValueError(f"Unknown dtype '{dtype}'")
+
+    numeric = df.select_dtypes(include="number").columns.tolist()
+    if target is not None and target not in df.columns:
+        raise ValueError(f"Target column '{target}' not found")
+    if features is None:
+        features = [c for c in numeric if c != target]
+    else:
+        unknown = [c for c in features if c not in numeric]
+        if unknown:
+            raise ValueError(f"Feature columns must be numeric: {unknown}")
+
+    n = len(df)
+    X = np.empty((n, len(features)), dtype=dtype)
+    for i, column in enumerate(features):
+        X[:, i] = df[column].to_numpy(dtype=dtype, na_value=np.nan)
+
+    keep = np.ones(n, dtype=bool)
+    y = None
+    if target is not None:
+        y_series = df[target]
+        keep &= y_series.notna().to_numpy()
+        y = y_series.to_numpy()
+
+    missing_cells = np.isnan(X)
+    incomplete = missing_cells.any(axis=1)
+    imputed_cells = 0
+    fill_values = None
+    if missing == "drop":
+        keep &= ~incomplete
+    elif missing == "zero":
+        fill_values = np.zeros(X.shape[1], dtype=dtype)
+    elif missing != "keep":
+        reducer = np.nanmedian if missing == "median" else np.nanmean
+        # Statistics come from the rows that are kept for the target; they
+        # are computed even for complete data, as stored models need them
+        # for new rows
+        with warnings.catch_warnings():
+            # All-missing columns fall back to zero below
+            warnings.simplefilter("ignore", RuntimeWarning)
+            fill_values = reducer(X[keep] if not keep.all() else X, axis=0)
+        fill_values = np.where(np.isnan(fill_values), 0, fill_values).astype(dtype)
+    if fill_values is not None and incomplete.any():
+        rows_idx, cols_idx = np.nonzero(missing_cells & keep[:, None])
+        X[rows_idx, cols_idx] = fill_values[cols_idx]
+        imputed_cells = int(len(rows_idx))
+
+    rows = np.flatnonzero(keep)
+    if len(rows) < n:
+        X = X[rows]
+        y = y[rows] if y is not None else None
+    X = np.ascontiguousarray(X)
+
+    scaler = None
+    if scaling == "standard":
+        center = np.nanmean(X, axis=0)
+        scale = np.nanstd(X, axis=0)
+        scale[scale == 0] = 1
+        X -= center
+        X /= scale
+        scaler = {"center": center.tolist(), "scale": scale.tolist()}
+    elif scaling == "minmax":
+        low = np.nanmin(X, axis=0) if len(X) else np.zeros(X.shape[1])
+        span = (np.nanmax(X, axis=0) - low) if len(X) else np.ones(X.shape[1])
+        span[span == 0] = 1
+        X -= low
+        X /= span
+        scaler = {"center": low.tolist(), "scale": span.tolist()}
+
+    info = {
+        "rows_in": n,
+        "rows_used": int(len(rows)),
+        "rows_dropped": int(n - len(rows)),
+        "imputed_cells": imputed_cells,
+        "missing": missing,
+        "scaling": scaling,
+        "dtype": dtype,
+        "scaler": scaler,
+        "fill_values": None if fill_values is None else fill_values.tolist(),
+        "cache": "built"
+    }
+    return FeatureSet(_read_only(X), _read_only(y), _read_only(rows), list(features), target, info)
+
+@profile_stage("preprocess")
+def feature_matrix(df, target=None, features=None, missing=DEFAULT_MISSING, scaling=None, dtype="float64"):
+    """
+    Return the FeatureSet for a frame, from cache when possible.
+
+    Args:
+        df: the dataset frame passed to the technique
+        target: target column, or None for unsupervised techniques
+        features: feature columns; defaults to every numeric column except
+            the target
+        missing: "drop" incomplete rows, impute with "median", "mean" or
+            "zero", or "keep" NaN for estimators that handle it
+        scaling: None, "standard" or "minmax"
+        dtype: "float64" or "float32"
+
+    Returns:
+        FeatureSet; info["cache"] is "memory", "disk" or "built"
+    """
+    dataset_hash = _current_hash()
+    cache = get_feature_cache() if dataset_hash else None
+    if cache is None:
+        return build_features(df, target, features, missing, scaling, dtype)
+
+    spec = {
+        "version": FEATURE_FORMAT_VERSION,
+        # Guards against techniques that pass a derived frame
+        "columns": [str(c) for c in df.columns],
+        "n_rows": len(df),
+        "target": target,
+        "features": features,
+        "missing": missing,
+        "scaling": scaling,
+        "dtype": dtype
+    }
+    key = cache.make_key(dataset_hash, "features", spec)
+    in_memory = key in cache._memory
+    state = cache.get(key)
+    if state is not None:
+        feature_set = FeatureSet(**state)
+        feature_set.info = dict(feature_set.info, cache="memory" if in_memory else "disk")
+        return feature_set
+
+    feature_set = build_features(df, target, features, missing, scaling, dtype)
+    cache.put(key, feature_set._state(), technique="features", dataset_hash=dataset_hash)
+    return feature_set
+
+def missing_stats(feature_set):
+    """The preprocessing facts techniques add to their stats"""
+    info = feature_set.info
+    return {
+        "missing": info["missing"],
+        "rows_used": info["rows_used"],
+        "rows_dropped": info["rows_dropped"],
+        "imputed_cells": info["imputed_cells"]
+    }
@@ -0,0 +1,286 @@
+"""
+Per-stage timing and memory for technique runs.
+
+When a run was slow there was no telling whether the time went to loading,
+preprocessing, the fit, the metrics or encoding the result. Every run now
+happens inside `run_profile`, and the entry points, shared helpers and
+technique modules mark their stages with `profile_stage`:
+
+- each stage records wall and CPU time, resident memory at its end and how
+  far it raised the process's peak RSS; stages nest ("technique.fit") and
+  repeated stages are aggregated, with self time excluding child stages
+- the profile is thread-local, so the techniques of a multi-run each get
+  their own; stages entered on threads without a profile are no-ops
+- the result carries it as a top-level "profile" block; `encode_result`
+  times the JSON encoding and adds it as the "encode" stage
+- BUMP_PROFILE_LOG names a file that receives one JSON line per run, and
+  the Node server aggregates the profiles it relays into Prometheus metrics
+
+The `profile` run param opts a single run into heavier instrumentation:
+"cprofile" (top functions by cumulative time, and the full stats saved
+under BUMP_PROFILE_DIR) and/or "tracemalloc" (Python heap peak per stage
+and the top allocation sites), e.g. profile=cprofile,tracemalloc. CPU time
+is process-wide, so it includes BLAS/OpenMP and joblib threads.
+"""
+
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import resource
+import threading
+import tracemalloc
+import contextlib
+
+from .json_utils import NpEncoder
+from .model_store import get_model_root
+
+PROFILE_OPTIONS = ("cprofile", "tracemalloc")
+TOP_FUNCTIONS = 25
+TOP_ALLOCATIONS = 20
+
+_local = threading.local()
+
+def peak_rss_mb():
+    """Peak resident set size of this process in megabytes"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def current_rss_mb():
+    """Return the resident set size of this process in megabytes"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        # Not on Linux: fall back to the peak
+        return peak_rss_mb()
+
+def parse_profile_options(value):
+    """The set of opt-in profilers named by the `profile` param"""
+    if value in (None, "", 0, "0", False):
+        return set()
+    if isinstance(value, str):
+        value = [v.strip().lower() for v in value.split(",")]
+    options = {v for v in value if v}
+    if options & {"1", "true", "all"}:
+        return set(PROFILE_OPTIONS)
+    unknown = options - set(PROFILE_OPTIONS)
+    if unknown:
+        raise ValueError(f"Unknown profile option(s): {sorted(unknown)}")
+    return options
+
+class RunProfile:
+    """Stages recorded during one run"""
+
+    def __init__(self, technique=None, options=()):
+        self.technique = technique
+        self.options = set(options)
+        self.stages = {}
+        self.cached = None
+        self.started = time.perf_counter()
+        self.cpu_started = time.process_time()
+        self.rss_start_mb = current_rss_mb()
+        self.finished = None
+        self.extra = {}
+
+    def open(self, name):
+        """Reserve the stage's place so stages are listed in the order they start"""
+        if name not in self.stages:
+            self.stages[name] = {"stage": name, "calls": 0, "ms": 0.0, "cpu_ms": 0.0,
+                                 "rss_mb": 0.0, "peak_rise_mb": 0.0}
+
+    def record(self, name, ms, cpu_ms, rss_mb, peak_rise_mb, py_peak_mb=None):
+        self.open(name)
+        stage = self.stages[name]
+        stage["calls"] += 1
+        stage["ms"] += ms
+        stage["cpu_ms"] += cpu_ms
+        stage["rss_mb"] = rss_mb
+        stage["peak_rise_mb"] += peak_rise_mb
+        if py_peak_mb is not None:
+            stage["py_peak_mb"] = max(stage.get("py_peak_mb", 0.0), py_peak_mb)
+
+    def finish(self):
+        if self.finished is None:
+            self.finished = {
+                "total_ms": (time.perf_counter() - self.started) * 1000,
+                "cpu_ms": (time.process_time() - self.cpu_started) * 1000,
+                "rss_end_mb": current_rss_mb(),
+                "peak_rss_mb": peak_rss_mb()
+            }
+
+    def to_dict(self):
+        self.finish()
+        stages = []
+        for name, stage in self.stages.items():
+            depth = name.count(".")
+            children = [s["ms"] for n, s in self.stages.items()
+                        if n.startswith(name + ".") and n.count(".") == depth + 1]
+            row = {k: (round(v, 2) if isinstance(v, float) else v) for k, v in stage.items()}
+            row["self_ms"] = round(max(0.0, stage["ms"] - sum(children)), 2)
+            stages.append(row)
+        return {
+            "technique": self.technique,
+            "cached": self.cached,
+            "total_ms": round(self.finished["total_ms"], 2),
+            "cpu_ms": round(self.finished["cpu_ms"], 2),
+            "rss_start_mb": round(self.rss_start_mb, 1),
+            "rss_end_mb": round(self.finished["rss_end_mb"], 1),
+            "peak_rss_mb": round(self.finished["peak_rss_mb"], 1),
+            "stages": stages,
+            **self.extra
+        }
+
+def current_profile():
+    """The profile of the run on this thread, or None"""
+    return getattr(_local, "profile", None)
+
+@contextlib.contextmanager
+def profile_stage(name):
+    """
+    Record the enclosed block as a stage of the current run, if any; also
+    usable as a function decorator
+    """
+    profile = current_profile()
+    if profile is None:
+        yield
+        return
+    stack = _local.stack
+    path = f"{stack[-1]['path']}.{name}" if stack else name
+    tracing = "tracemalloc" in profile.options and tracemalloc.is_tracing()
+    profile.open(path)
+    entry = {"path": path, "child_py_peak": 0}
+    if tracing:
+        entry["py_start"] = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+    stack.append(entry)
+    peak_before = peak_rss_mb()
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    try:
+        yield
+    finally:
+        ms = (time.perf_counter() - started) * 1000
+        cpu_ms = (time.process_time() - cpu_started) * 1000
+        stack.pop()
+        py_peak_mb = None
+        if tracing:
+            # reset_peak in a child stage clears this stage's peak, so the
+            # children hand theirs up
+            peak = max(tracemalloc.get_traced_memory()[1], entry["child_py_peak"])
+            py_peak_mb = max(0, peak - entry["py_start"]) / (1024 * 1024)
+            if stack:
+                stack[-1]["child_py_peak"] = max(stack[-1]["child_py_peak"], peak)
+        profile.record(path, ms, cpu_ms, current_rss_mb(), max(0.0, peak_rss_mb() - peak_before), py_peak_mb)
+
+def _profile_dir():
+    return os.environ.get("BUMP_PROFILE_DIR") or os.path.join(os.path.dirname(get_model_root()), ".profiles")
+
+def _top_functions(profiler, technique):
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, line, function), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            "function": f"{function} ({os.path.basename(filename)}:{line})",
+            "calls": calls,
+            "tottime_ms": round(tottime * 1000, 2),
+            "cumtime_ms": round(cumtime * 1000, 2)
+        })
+    rows.sort(key=lambda r: r["cumtime_ms"], reverse=True)
+    path = os.path.join(_profile_dir(), f"{technique or 'run'}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.prof")
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        stats.dump_stats(path)
+    except OSError:
+        path = None
+    return {"cprofile": rows[:TOP_FUNCTIONS], "cprofile_file": path}
+
+def _top_allocations(snapshot):
+    return {"tracemalloc": [
+        {"location": f"{os.path.basename(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+         "size_mb": round(stat.size / (1024 * 1024), 3),
+         "count": stat.count}
+        for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]
+    ]}
+
+@contextlib.contextmanager
+def run_profile(technique=None, options=None):
+    """
+    Profile the run on this thread and yield its RunProfile.
+
+    Args:
+        technique: recorded in the profile
+        options: opt-in profilers (see parse_profile_options); only one
+            run per process should ask for them, as both are process-wide
+    """
+    profile = RunProfile(technique, parse_profile_options(options))
+    previous = (current_profile(), getattr(_local, "stack", None))
+    _local.profile, _local.stack = profile, []
+    profiler = cProfile.Profile() if "cprofile" in profile.options else None
+    started_tracing = "tracemalloc" in profile.options and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield profile
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profile.extra.update(_top_functions(profiler, technique))
+        if "tracemalloc" in profile.options and tracemalloc.is_tracing():
+            profile.extra.update(_top_allocations(tracemalloc.take_snapshot()))
+            if started_tracing:
+                tracemalloc.stop()
+        profile.finish()
+        _local.profile, _local.stack = previous
+
+def attach_profile(result, profile):
+    """Add the profile block to a result dict"""
+    if isinstance(result, dict):
+        result["profile"] = profile.to_dict()
+    return result
+
+def encode_result(result):
+    """
+    JSON-encode a result, timing the encoding and adding it to the result's
+    profile block as the "encode" stage
+
+    Returns:
+        (text, profile dict or None)
+    """
+    profile = result.pop("profile", None) if isinstance(result, dict) else None
+    started = time.perf_counter()
+    text = json.dumps(result, cls=NpEncoder)
+    if profile is None:
+        return text, None
+    ms = round((time.perf_counter() - started) * 1000, 2)
+    profile["stages"].append({"stage": "encode", "calls": 1, "ms": ms, "self_ms": ms, "bytes": len(text)})
+    profile["total_ms"] = round(profile["total_ms"] + ms, 2)
+    profile_text = json.dumps(profile, cls=NpEncoder)
+    if text.endswith("}") and text != "{}":
+        return f'{text[:-1]}, "profile": {profile_text}}}', profile
+    return text, profile
+
+def profile_summary(profile):
+    """The profile without the opt-in detail, which is large and already in
+    the result or the .prof file"""
+    if not isinstance(profile, dict):
+        return None
+    return {k: v for k, v in profile.items() if k not in PROFILE_OPTIONS}
+
+def export_profile(profile, **labels):
+    """Append a profile as one JSON line to BUMP_PROFILE_LOG, if set"""
+    path = os.environ.get("BUMP_PROFILE_LOG")
+    if not path or not profile:
+        return
+    record = {"ts": round(time.time(), 3), "pid": os.getpid(), **labels, **profile_summary(profile)}
+    try:
+        with open(path, "a") as f:
+            f.write(json.dumps(record, cls=NpEncoder) + "\n")
+    except OSError as e:
+        print(f"Could not write profile log: {str(e)}", file=sys.stderr)
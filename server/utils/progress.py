@@ -0,0 +1,96 @@
+"""
+Progress events from inside technique runs.
+
+Techniques call `report_progress(stage, fraction)` at their natural
+milestones (folds, k values, trials, fit/forecast steps). Outside a job
+nothing is listening and the calls are no-ops; a queued job (see job_queue)
+installs a sink with `progress_sink` that records them as job events.
+
+- the sink is process-wide rather than thread-local, because folds and
+  sweep blocks report from worker threads
+- events for the same stage are throttled to one per `min_interval_s`;
+  stage changes and completed stages (fraction 1) are always delivered
+- `JobCancelled` derives from BaseException so the `except Exception`
+  handlers every technique wraps its run in do not swallow a cancellation
+"""
+
+import time
+import threading
+import contextlib
+
+_lock = threading.Lock()
+_sink = None
+
+class JobCancelled(BaseException):
+    """Raised in a job process when its job is cancelled"""
+
+class _Sink:
+    def __init__(self, callback, min_interval_s):
+        self.callback = callback
+        self.min_interval_s = min_interval_s
+        self.started = time.perf_counter()
+        self.last_stage = None
+        self.last_sent = 0.0
+
+    def emit(self, stage, fraction, message, info):
+        now = time.perf_counter()
+        if (stage == self.last_stage and fraction != 1
+                and now - self.last_sent < self.min_interval_s):
+            return
+        self.last_stage = stage
+        self.last_sent = now
+        event = {"type": "progress", "stage": stage, "elapsed_ms": round((now - self.started) * 1000, 1)}
+        if fraction is not None:
+            event["fraction"] = round(min(max(float(fraction), 0.0), 1.0), 4)
+        if message:
+            event["message"] = message
+        event.update(info)
+        self.callback(event)
+
+@contextlib.contextmanager
+def progress_sink(callback, min_interval_s=0.25):
+    """
+    Deliver progress events to callback(event) for the duration of the block.
+
+    Args:
+        callback: called with {"type": "progress", "stage", "elapsed_ms",
+            "fraction"?, "message"?, **info}, possibly from several threads
+            but never concurrently
+        min_interval_s: throttle for repeated events of one stage
+    """
+    global _sink
+    with _lock:
+        previous = _sink
+        _sink = _Sink(callback, min_interval_s)
+    try:
+        yield
+    finally:
+        with _lock:
+            _sink = previous
+
+def report_progress(stage, fraction=None, message=None, **info):
+    """
+    Report that a run reached `stage`, optionally `fraction` (0-1) of the
+    way through it. Extra keyword args must be JSON-serializable.
+    """
+    if _sink is None:
+        return
+    with _lock:
+        if _sink is not None:
+            _sink.emit(stage, fraction, message, info)
+
+def progress_counter(stage, total):
+    """
+    Return a thread-safe step() that reports `stage` as each of `total`
+    units of work (folds, k values, trials) completes.
+    """
+    done = [0]
+    step_lock = threading.Lock()
+    report_progress(stage, 0.0, total=total)
+
+    def step(**info):
+        with step_lock:
+            done[0] += 1
+            completed = done[0]
+        report_progress(stage, completed / total if total else 1.0, completed=completed, total=total, **info)
+    return step
@@ -0,0 +1,346 @@
+"""
+Content-addressed cache for technique results.
+
+Results are keyed by (dataset content hash, technique, normalized params,
+library versions), so a changed dataset or an upgraded scikit-learn simply
+produces new keys and old entries age out. Entries are JSON files on disk;
+an SQLite index tracks their size and last access for LRU eviction under a
+byte budget, plus hit/miss counters shared by every worker process.
+
+Usage:
+    python -m server.utils.result_cache stats
+    python -m server.utils.result_cache clear
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import importlib
+import contextlib
+
+from .json_utils import NpEncoder
+
+CACHE_FORMAT_VERSION = 1
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# Params that control the run itself rather than the result (chart
+# downsampling is applied to cached results, and thread counts do not change
+# seeded results, so their params are not part of the key either)
+CONTROL_PARAMS = {
+    "target_data", "use_cache", "dtypes", "max_chart_points", "full_resolution", "n_jobs", "n_threads", "profile"
+}
+
+# Techniques whose estimators are not seeded by default; their results
+# differ between runs unless the caller pins a random_state, which the
+# technique then passes to its estimator. Every other technique is either
+# deterministic or seeds itself (random_state=42 or its random_state param)
+UNSEEDED_TECHNIQUES = {
+    "random_forest_classifier",
+}
+
+VERSIONED_LIBRARIES = ["numpy", "pandas", "sklearn", "scipy", "prophet"]
+
+_library_versions = None
+
+def library_versions():
+    """Versions of the libraries that can change a technique's output"""
+    global _library_versions
+    if _library_versions is None:
+        versions = {}
+        for name in VERSIONED_LIBRARIES:
+            try:
+                versions[name] = importlib.import_module(name).__version__
+            except Exception:
+                versions[name] = None
+        _library_versions = versions
+    return _library_versions
+
+def normalize_params(params):
+    """Drop control params and canonicalize values so equal runs share a key"""
+    normalized = {}
+    for key, value in sorted((params or {}).items()):
+        if key in CONTROL_PARAMS:
+            continue
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        elif isinstance(value, (list, tuple)):
+            value = list(value)
+        elif not isinstance(value, (str, int, float, bool, type(None), dict)):
+            value = str(value)
+        normalized[key] = value
+    return normalized
+
+def is_cacheable(technique, params):
+    """Check whether a run is deterministic and the caller allows caching"""
+    params = params or {}
+    if str(params.get("use_cache", 1)).lower() in ("0", "false", "no"):
+        return False
+    if technique in UNSEEDED_TECHNIQUES and params.get("random_state") is None:
+        return False
+    # Incremental runs depend on persisted model state, not just the inputs
+    if params.get("mode") == "incremental":
+        return False
+    return True
+
+def is_error_result(result):
+    """Error responses are never cached"""
+    if not isinstance(result, dict) or "error" in result:
+        return True
+    stats = result.get("stats")
+    return isinstance(stats, dict) and "error" in stats
+
+class ResultCache:
+    """
+    On-disk result store with a byte budget and LRU eviction.
+
+    Entries are JSON files; subclasses can store other formats by
+    overriding `suffix`, `_load` and `_dump`.
+    """
+
+    suffix = ".json"
+
+    def __init__(self, root, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+        self.index_path = os.path.join(root, "index.sqlite")
+        with self._connect() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, technique TEXT, dataset_hash TEXT, "
+                "size INTEGER, created REAL, last_access REAL)"
+            )
+            db.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER)")
+
+    @contextlib.contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.index_path, timeout=30, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], f"{key}{self.suffix}")
+
+    def _load(self, path):
+        with open(path) as f:
+            return json.load(f)
+
+    def _dump(self, value, path):
+        """Write value to path and return its size, or None if it cannot be stored"""
+        try:
+            encoded = json.dumps(value, cls=NpEncoder).encode("utf-8")
+        except (TypeError, ValueError):
+            return None
+        if len(encoded) > self.max_bytes:
+            return None
+        with open(path, "wb") as f:
+            f.write(encoded)
+        return len(encoded)
+
+    def _bump(self, db, name, amount=1):
+        db.execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount)
+        )
+
+    def make_key(self, dataset_hash, technique, params):
+        """Build the content address for a run"""
+        payload = json.dumps({
+            "format": CACHE_FORMAT_VERSION,
+            "dataset": dataset_hash,
+            "technique": technique,
+            "params": normalize_params(params),
+            "libraries": library_versions()
+        }, sort_keys=True, cls=NpEncoder)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Return the cached result for a key, or None on a miss"""
+        with self._connect() as db:
+            row = db.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                try:
+                    result = self._load(self._path(key))
+                except (OSError, ValueError, EOFError):
+                    # The file was removed or is corrupt; forget the entry
+                    db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    result = None
+                if result is not None:
+                    db.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+                    self._bump(db, "hits")
+                    return result
+            self._bump(db, "misses")
+            return None
+
+    def contains(self, key):
+        """Whether an entry is stored, without loading it; counts as an access"""
+        with self._connect() as db:
+            if db.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone() is None:
+                return False
+            if not os.path.exists(self._path(key)):
+                db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                return False
+            db.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+            return True
+
+    def put(self, key, result, technique=None, dataset_hash=None):
+        """Store a result and evict least recently used entries over budget"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        scratch = f"{path}.{os.getpid()}.tmp"
+        size = self._dump(result, scratch)
+        if size is None or size > self.max_bytes:
+            with contextlib.suppress(OSError):
+                os.remove(scratch)
+            return False
+        os.replace(scratch, path)
+
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO entries (key, technique, dataset_hash, size, created, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, technique, dataset_hash, size, now, now)
+            )
+            self._bump(db, "stores")
+            self._evict(db)
+        return True
+
+    def _evict(self, db):
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in db.execute("SELECT key, size FROM entries ORDER BY last_access ASC").fetchall():
+            if total <= self.max_bytes:
+                break
+            db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            total -= size
+            self._bump(db, "evictions")
+
+    def stats(self):
+        """Entry count, stored bytes and hit/miss/eviction counters"""
+        with self._connect() as db:
+            entries, total = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            counters = dict(db.execute("SELECT name, value FROM counters").fetchall())
+        hits = counters.get("hits", 0)
+        misses = counters.get("misses", 0)
+        return {
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "hits": hits,
+            "misses": misses,
+            "stores": counters.get("stores", 0),
+            "evictions": counters.get("evictions", 0),
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0
+        }
+
+    def clear(self):
+        """Remove every entry and reset the counters"""
+        with self._connect() as db:
+            for (key,) in db.execute("SELECT key FROM entries").fetchall():
+                try:
+                    os.remove(self._path(key))
+                except OSError:
+                    pass
+            db.execute("DELETE FROM entries")
+            db.execute("DELETE FROM counters")
+
+_cache = None
+
+def get_result_cache():
+    """
+    Return the process-wide result cache, or None when disabled.
+
+    Configured with BUMP_RESULT_CACHE (directory, or "off") and
+    BUMP_RESULT_CACHE_MAX_BYTES.
+    """
+    global _cache
+    if _cache is None:
+        root = os.environ.get("BUMP_RESULT_CACHE")
+        if root and root.lower() in ("0", "off", "false"):
+            return None
+        if not root:
+            root = os.path.join(
+                os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                "uploads", ".results"
+            )
+        max_bytes = int(os.environ.get("BUMP_RESULT_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+        _cache = ResultCache(root, max_bytes=max_bytes)
+    return _cache
+
+def cached_result(technique, dataset_hash, params, valid=None):
+    """
+    Return the cached result for a run, or None on a miss or when
+    uncacheable. A result that `valid(result)` rejects counts as a miss.
+    """
+    cache = get_result_cache()
+    if cache is None or not is_cacheable(technique, params):
+        return None
+    if callable(dataset_hash):
+        dataset_hash = dataset_hash()
+    result = cache.get(cache.make_key(dataset_hash, technique, params))
+    if result is not None and valid is not None and not valid(result):
+        return None
+    return result
+
+def store_result(technique, dataset_hash, params, result):
+    """Cache a freshly computed result (errors and uncacheable runs are skipped)"""
+    cache = get_result_cache()
+    if cache is None or not is_cacheable(technique, params) or is_error_result(result):
+        return
+    if callable(dataset_hash):
+        dataset_hash = dataset_hash()
+    if isinstance(result, dict) and "profile" in result:
+        # A profile describes the run that computed the result, not later hits
+        result = {k: v for k, v in result.items() if k != "profile"}
+    cache.put(cache.make_key(dataset_hash, technique, params), result,
+              technique=technique, dataset_hash=dataset_hash)
+
+def cached_run(technique, dataset_hash, params, compute, valid=None):
+    """
+    Return a cached result for the run or compute and store it.
+
+    Args:
+        technique: technique name
+        dataset_hash: content hash of the dataset, or a callable returning it
+            (only called when the run is cacheable)
+        params: run params (control params are ignored for the key)
+        compute: zero-argument callable producing the result on a miss
+        valid: optional check of a cached result; rejected results are
+            recomputed and replaced
+    """
+    cache = get_result_cache()
+    if cache is None or not is_cacheable(technique, params):
+        return compute()
+
+    if callable(dataset_hash):
+        dataset_hash = dataset_hash()
+
+    result = cached_result(technique, dataset_hash, params, valid)
+    if result is not None:
+        return result
+
+    result = compute()
+    store_result(technique, dataset_hash, params, result)
+    return result
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    cache = get_result_cache()
+    if cache is None:
+        print(json.dumps({"error": "Result cache is disabled"}))
+        sys.exit(1)
+    if command == "clear":
+        cache.clear()
+    print(json.dumps(cache.stats()))
@@ -0,0 +1,181 @@
+"""
+Binary envelope for technique results.
+
+Large results are mostly per-row numbers (labels, scores, projected points,
+record tables). Encoding them as JSON text, piping them through stdout and
+re-parsing them in Node costs far more than the technique itself on big
+datasets. The envelope keeps the small parts of a result as JSON and moves
+every large numeric array into a raw little-endian buffer in a file.
+
+File layout:
+    b"BUMPRES1"                 magic
+    uint32 (little endian)      length of the JSON header
+    JSON header                 {"version", "result", "buffers"}
+    zero padding to 8 bytes
+    buffers                     each starts on an 8-byte boundary
+
+Inside `result`, a replaced array becomes {"__buffer__": i} pointing at
+header["buffers"][i] = {"offset", "bytes", "dtype", "shape"}, and a large
+list of same-keyed dicts (or a ColumnarRecords) becomes {"__records__":
+{"columns", "values", "length"}} with one (possibly buffered) entry per
+column.
+"""
+
+import json
+import struct
+import numpy as np
+
+from .json_utils import NpEncoder, ColumnarRecords
+
+MAGIC = b"BUMPRES1"
+ENVELOPE_VERSION = 1
+# Arrays shorter than this stay inline as JSON
+MIN_BUFFER_LENGTH = 1024
+
+# Buffer dtypes mirror JavaScript typed arrays; int64 has no cheap JS
+# equivalent, so integer data is narrowed to int32 when it fits
+_JS_DTYPES = {"float64", "float32", "int32", "int16", "int8", "uint32", "uint16", "uint8"}
+
+def _to_buffer_array(array):
+    """Return a little-endian array in a dtype the Node side can view, or None"""
+    kind = array.dtype.kind
+    if kind == "b":
+        return array.astype("<u1"), "bool"
+    if kind in "iu":
+        if array.dtype.name in _JS_DTYPES:
+            return array.astype(array.dtype.newbyteorder("<"), copy=False), array.dtype.name
+        if array.size == 0 or (array.min() >= -2 ** 31 and array.max() < 2 ** 31):
+            return array.astype("<i4"), "int32"
+        return array.astype("<f8"), "float64"
+    if kind == "f":
+        name = "float32" if array.dtype.itemsize == 4 else "float64"
+        return array.astype("<f4" if name == "float32" else "<f8", copy=False), name
+    return None
+
+class _Writer:
+    def __init__(self, min_length):
+        self.min_length = min_length
+        self.arrays = []
+        self.specs = []
+
+    def buffer(self, array):
+        converted = _to_buffer_array(array)
+        if converted is None:
+            return None
+        data, dtype = converted
+        self.arrays.append(np.ascontiguousarray(data))
+        self.specs.append({"dtype": dtype, "shape": list(array.shape)})
+        return {"__buffer__": len(self.arrays) - 1}
+
+    def encode(self, value):
+        if isinstance(value, ColumnarRecords):
+            if len(value) < self.min_length:
+                return value.as_records()
+            return {"__records__": {
+                "columns": list(value.columns),
+                "values": {name: self.encode(values) for name, values in value.columns.items()},
+                "length": len(value)
+            }}
+        if isinstance(value, dict):
+            return {key: self.encode(item) for key, item in value.items()}
+        if isinstance(value, np.ndarray):
+            if value.size >= self.min_length:
+                ref = self.buffer(value)
+                if ref is not None:
+                    return ref
+            return value.tolist()
+        if isinstance(value, (list, tuple)) and len(value) >= self.min_length:
+            return self._encode_list(list(value))
+        if isinstance(value, (list, tuple)):
+            return [self.encode(item) for item in value]
+        return value
+
+    def _encode_list(self, values):
+        first = values[0]
+        if isinstance(first, dict):
+            return self._encode_records(values)
+        if isinstance(first, (bool, int, float, np.number, list, tuple)):
+            try:
+                array = np.asarray(values)
+            except ValueError:
+                # Ragged nested lists
+                array = None
+            if array is not None and array.dtype.kind in "biuf":
+                ref = self.buffer(array)
+                if ref is not None:
+                    return ref
+        return [self.encode(item) for item in values]
+
+    def _encode_records(self, records):
+        columns = list(records[0].keys())
+        key_set = set(columns)
+        if not all(isinstance(r, dict) and r.keys() == key_set for r in records):
+            return [self.encode(item) for item in records]
+        values = {}
+        for column in columns:
+            values[column] = self._encode_list([r[column] for r in records])
+        return {"__records__": {"columns": columns, "values": values, "length": len(records)}}
+
+def write_envelope(result, path, min_length=MIN_BUFFER_LENGTH):
+    """
+    Write a result as a binary envelope.
+
+    Returns:
+        Number of bytes written
+    """
+    writer = _Writer(min_length)
+    encoded = writer.encode(result)
+
+    offset = 0
+    buffers = []
+    for array, spec in zip(writer.arrays, writer.specs):
+        buffers.append({"offset": offset, "bytes": int(array.nbytes), **spec})
+        offset += (array.nbytes + 7) // 8 * 8
+
+    header = json.dumps(
+        {"version": ENVELOPE_VERSION, "result": encoded, "buffers": buffers},
+        cls=NpEncoder
+    ).encode("utf-8")
+    prefix = len(MAGIC) + 4 + len(header)
+    header_padding = b"\0" * ((8 - prefix % 8) % 8)
+
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        f.write(header_padding)
+        for array in writer.arrays:
+            f.write(array.tobytes())
+            f.write(b"\0" * ((8 - array.nbytes % 8) % 8))
+    return prefix + len(header_padding) + offset
+
+def _decode(value, buffers, data, base):
+    if isinstance(value, dict):
+        if "__buffer__" in value and len(value) == 1:
+            spec = buffers[value["__buffer__"]]
+            dtype = "<u1" if spec["dtype"] == "bool" else np.dtype(spec["dtype"]).newbyteorder("<")
+            array = np.frombuffer(data, dtype=dtype, count=int(np.prod(spec["shape"], dtype=np.int64)),
+                                  offset=base + spec["offset"]).reshape(spec["shape"])
+            return array.astype(bool) if spec["dtype"] == "bool" else array
+        if "__records__" in value and len(value) == 1:
+            records = value["__records__"]
+            columns = {c: _decode(records["values"][c], buffers, data, base) for c in records["columns"]}
+            columns = {c: v.tolist() if isinstance(v, np.ndarray) else v for c, v in columns.items()}
+            return [{c: columns[c][i] for c in records["columns"]} for i in range(records["length"])]
+        return {key: _decode(item, buffers, data, base) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_decode(item, buffers, data, base) for item in value]
+    return value
+
+def read_envelope(path):
+    """Read an envelope back into a result, with buffers as NumPy arrays"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a result envelope")
+    (header_length,) = struct.unpack_from("<I", data, len(MAGIC))
+    start = len(MAGIC) + 4
+    header = json.loads(data[start:start + header_length])
+    base = start + header_length
+    base += (8 - base % 8) % 8
+    return _decode(header["result"], header["buffers"], data, base)
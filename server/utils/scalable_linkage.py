@@ -0,0 +1,194 @@
+"""
+Hierarchical clustering that stays within a memory budget.
+
+scipy's `linkage` needs the condensed distance matrix, n(n-1)/2 doubles, so
+it is only used while that fits the budget. Larger inputs are clustered in
+two stages: mini-batch k-means first compresses the rows into a few hundred
+weighted micro-clusters, then the dendrogram is built over the micro-cluster
+centroids. For ward linkage the merge cost accounts for micro-cluster sizes,
+so the upper levels of the tree match what ward would produce on the rows.
+
+Responses carry a truncated dendrogram (the last `p` merges) instead of the
+full (n-1) x 4 linkage matrix.
+"""
+
+import numpy as np
+from scipy.cluster.hierarchy import linkage, fcluster, dendrogram
+from sklearn.cluster import MiniBatchKMeans
+
+from .progress import report_progress
+from .profiling import profile_stage
+
+DEFAULT_MEMORY_BUDGET_MB = 256
+DEFAULT_MICRO_CLUSTERS = 500
+DEFAULT_DENDROGRAM_LEAVES = 30
+
+def exact_fits_budget(n_rows, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """Check whether the condensed distance matrix for n_rows fits the budget"""
+    return n_rows * (n_rows - 1) / 2 * 8 <= memory_budget_mb * 1024 * 1024
+
+@profile_stage("micro_clusters")
+def micro_clusters(X, n_micro=DEFAULT_MICRO_CLUSTERS, chunk_size=10_000, random_state=42):
+    """
+    Compress rows into weighted micro-clusters with mini-batch k-means.
+
+    Returns:
+        (centroids, sizes, assignments) where assignments maps each row to
+        its micro-cluster; empty micro-clusters are dropped
+    """
+    X = np.asarray(X, dtype=float)
+    n_micro = min(n_micro, len(X))
+    model = MiniBatchKMeans(
+        n_clusters=n_micro,
+        batch_size=min(chunk_size, len(X)),
+        n_init=1,
+        random_state=random_state
+    )
+    assignments = model.fit_predict(X)
+    sizes = np.bincount(assignments, minlength=n_micro)
+
+    # Renumber so that only populated micro-clusters become dendrogram leaves
+    used = np.flatnonzero(sizes)
+    remap = np.full(n_micro, -1)
+    remap[used] = np.arange(len(used))
+    return model.cluster_centers_[used], sizes[used].astype(float), remap[assignments]
+
+def weighted_ward(centroids, sizes):
+    """
+    Ward linkage over weighted points.
+
+    The ward distance between clusters A and B is
+    sqrt(2 * |A||B| / (|A| + |B|)) * ||c_A - c_B||, which equals scipy's ward
+    distance when every weight is 1. Runs in O(m^2) memory and O(m^3) time
+    on m points, so it is meant for micro-cluster centroids.
+
+    Returns:
+        scipy-compatible linkage matrix; the count column holds the number
+        of micro-clusters per node, as scipy requires
+    """
+    m = len(centroids)
+    centers = np.array(centroids, dtype=float)
+    weights = np.array(sizes, dtype=float)
+    members = np.ones(m)
+    ids = np.arange(m)
+    active = np.ones(m, dtype=bool)
+
+    def ward_row(i):
+        factor = 2 * weights[i] * weights / (weights[i] + weights)
+        row = np.sqrt(factor * ((centers - centers[i]) ** 2).sum(axis=1))
+        row[~active] = np.inf
+        row[i] = np.inf
+        return row
+
+    distances = np.vstack([ward_row(i) for i in range(m)])
+    Z = np.empty((m - 1, 4))
+    for step in range(m - 1):
+        i, j = np.unravel_index(np.argmin(distances), distances.shape)
+        if i > j:
+            i, j = j, i
+        a, b = sorted((ids[i], ids[j]))
+        Z[step] = [a, b, distances[i, j], members[i] + members[j]]
+
+        # The merged cluster takes slot i; slot j is retired
+        total = weights[i] + weights[j]
+        centers[i] = (centers[i] * weights[i] + centers[j] * weights[j]) / total
+        weights[i] = total
+        members[i] += members[j]
+        ids[i] = m + step
+        active[j] = False
+        distances[j, :] = np.inf
+        distances[:, j] = np.inf
+
+        row = ward_row(i)
+        distances[i, :] = row
+        distances[:, i] = row
+    return Z
+
+def _node_sizes(Z, leaf_sizes):
+    """Number of original rows under every node of a linkage matrix"""
+    m = len(leaf_sizes)
+    sizes = np.concatenate((np.asarray(leaf_sizes, dtype=float), np.zeros(len(Z))))
+    for step, (a, b) in enumerate(Z[:, :2].astype(int)):
+        sizes[m + step] = sizes[a] + sizes[b]
+    return sizes
+
+def truncated_dendrogram(Z, leaf_sizes=None, p=DEFAULT_DENDROGRAM_LEAVES):
+    """
+    Plot-ready coordinates for the last p merges of a linkage matrix.
+
+    Args:
+        Z: linkage matrix
+        leaf_sizes: rows per leaf when the leaves are micro-clusters
+        p: number of leaves to keep
+
+    Returns:
+        dict with `icoord`, `dcoord`, leaf node ids and the number of rows
+        under each leaf
+    """
+    tree = dendrogram(Z, truncate_mode="lastp", p=p, no_plot=True)
+    if leaf_sizes is None:
+        leaf_sizes = np.ones(len(Z) + 1)
+    sizes = _node_sizes(Z, leaf_sizes)
+    return {
+        "icoord": tree["icoord"],
+        "dcoord": tree["dcoord"],
+        "leaves": [int(leaf) for leaf in tree["leaves"]],
+        "leaf_sizes": [int(sizes[leaf]) for leaf in tree["leaves"]],
+        "truncated": bool(len(Z) + 1 > p)
+    }
+
+def cut_labels(Z, n_clusters=3, distance_threshold=None):
+    """Flat cluster labels from a distance cut or a target cluster count"""
+    if distance_threshold is not None:
+        return fcluster(Z, t=float(distance_threshold), criterion="distance")
+    return fcluster(Z, t=int(n_clusters), criterion="maxclust")
+
+@profile_stage("linkage")
+def hierarchical_labels(X, method="ward", n_clusters=3, distance_threshold=None,
+                        mode="auto", memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB,
+                        n_micro=DEFAULT_MICRO_CLUSTERS, dendrogram_leaves=DEFAULT_DENDROGRAM_LEAVES):
+    """
+    Cluster rows hierarchically, exactly when it fits the budget.
+
+    Args:
+        X: dense feature matrix
+        method: scipy linkage method
+        n_clusters: number of flat clusters to cut (ignored with a threshold)
+        distance_threshold: cut the tree at this merge distance instead
+        mode: "auto", "exact" or "two_stage"
+        memory_budget_mb: budget for the exact condensed distance matrix
+        n_micro: micro-clusters for the two-stage mode
+        dendrogram_leaves: leaves kept in the truncated dendrogram
+
+    Returns:
+        (labels, info) with per-row labels and a dict holding the mode,
+        the truncated dendrogram and the leaf count
+    """
+    X = np.asarray(X, dtype=float)
+    if mode == "auto":
+        mode = "exact" if exact_fits_budget(len(X), memory_budget_mb) else "two_stage"
+
+    if mode == "two_stage" and len(X) > n_micro:
+        report_progress("micro_clusters", rows=len(X))
+        centroids, sizes, assignments = micro_clusters(X, n_micro)
+        report_progress("linkage", rows=len(centroids))
+        if method == "ward":
+            Z = weighted_ward(centroids, sizes)
+        else:
+            # Other linkages have no weighted form here; the centroids stand
+            # in for their members
+            Z = linkage(centroids, method=method)
+        labels = cut_labels(Z, n_clusters, distance_threshold)[assignments]
+        leaf_sizes = sizes
+    else:
+        mode = "exact"
+        report_progress("linkage", rows=len(X))
+        Z = linkage(X, method=method)
+        labels = cut_labels(Z, n_clusters, distance_threshold)
+        leaf_sizes = None
+
+    return labels, {
+        "mode": mode,
+        "dendrogram": truncated_dendrogram(Z, leaf_sizes, p=dendrogram_leaves),
+        "dendrogram_leaves": int(len(Z) + 1)
+    }
@@ -0,0 +1,111 @@
+"""
+Process-wide thread budget shared by concurrently running jobs.
+
+Techniques used to run single-threaded (no `n_jobs`) while BLAS and OpenMP
+pools each grabbed every core, so one job wasted the machine and several
+jobs oversubscribed it. Every technique run now happens inside `job_threads`:
+
+- the job registers itself in a small directory of slot files (one per
+  running job, across all worker processes and CLI runs on the host)
+- its share is the core budget divided by the number of running jobs
+- BLAS and OpenMP pools are capped to that share with threadpoolctl for
+  the duration of the job
+- techniques read the share back with `allotted_threads()` and pass it as
+  `n_jobs` to joblib-parallel estimators
+
+The budget is os.sched_getaffinity (or cpu_count) unless BUMP_THREAD_BUDGET
+overrides it; BUMP_JOB_REGISTRY moves the slot directory.
+"""
+
+import os
+import tempfile
+import itertools
+import threading
+import contextlib
+
+from threadpoolctl import threadpool_limits
+
+_slot_counter = itertools.count()
+_local = threading.local()
+
+def total_threads():
+    """Cores available to all jobs on this host"""
+    configured = os.environ.get("BUMP_THREAD_BUDGET")
+    if configured:
+        return max(1, int(configured))
+    try:
+        return max(1, len(os.sched_getaffinity(0)))
+    except AttributeError:
+        return max(1, os.cpu_count() or 1)
+
+def _registry_dir():
+    path = os.environ.get("BUMP_JOB_REGISTRY") or os.path.join(tempfile.gettempdir(), "bump-jobs")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def active_jobs():
+    """Number of running jobs; slots left behind by dead processes are removed"""
+    directory = _registry_dir()
+    count = 0
+    for name in os.listdir(directory):
+        try:
+            pid = int(name.split("-", 1)[0])
+        except ValueError:
+            continue
+        if _pid_alive(pid):
+            count += 1
+        else:
+            with contextlib.suppress(OSError):
+                os.remove(os.path.join(directory, name))
+    return count
+
+def fair_share(jobs=None, total=None):
+    """Threads one job gets when `jobs` jobs share the budget"""
+    total = total or total_threads()
+    jobs = max(1, jobs if jobs is not None else active_jobs())
+    return max(1, total // jobs)
+
+def allotted_threads(requested=None):
+    """
+    Threads the current job may use.
+
+    Args:
+        requested: optional explicit `n_jobs` from the run params; it can
+            lower the allotment but never exceed it
+    """
+    allotted = getattr(_local, "threads", None) or fair_share()
+    if requested in (None, "", 0, "0"):
+        return allotted
+    requested = int(requested)
+    # joblib convention: -1 means "all", which here means the allotment
+    return allotted if requested < 0 else max(1, min(requested, allotted))
+
+@contextlib.contextmanager
+def job_threads(requested=None):
+    """
+    Register a running job, cap BLAS/OpenMP to its share and yield the
+    number of threads it was given.
+    """
+    slot = os.path.join(_registry_dir(), f"{os.getpid()}-{next(_slot_counter)}")
+    with open(slot, "w"):
+        pass
+    previous = getattr(_local, "threads", None)
+    try:
+        _local.threads = None
+        threads = allotted_threads(requested)
+        _local.threads = threads
+        with threadpool_limits(limits=threads):
+            yield threads
+    finally:
+        _local.threads = previous
+        with contextlib.suppress(OSError):
+            os.remove(slot)
@@ -0,0 +1,341 @@
+"""
+Hyperparameter search for one technique over one loaded dataset.
+
+Finding good values for `n_clusters`, `eps`/`min_samples` or `contamination`
+used to mean clicking through full cold-start runs. A tuning job samples
+configurations from a search space and runs them as successive halving:
+
+- every configuration is first fitted on a small random subsample; the best
+  1/eta of them are promoted to a subsample eta times larger, until the last
+  rung fits the survivors on the full prepared frame
+- subsamples are nested (each is a prefix of one fixed permutation), so a
+  promoted configuration sees the rows it was already judged on plus more
+- trials of a rung run in parallel in a process pool over the shared-memory
+  frame (see multi_run), and each worker builds its subsample itself
+- fits are reused where the technique allows it: a promoted k-means trial
+  starts from the centroids of its previous rung, and full-frame trials are
+  looked up in the result cache
+- the job returns a leaderboard of every configuration, ranked by the rung
+  it reached and then by its score
+
+Scores are technique stats (silhouette for clustering, accuracy or r2 for
+supervised techniques). Isolation forest has no quality stat of its own; it
+is scored by the F1 of its flagged anomalies against a label column given as
+`target_column`, which is then not used as a feature.
+"""
+
+import sys
+import math
+import time
+import itertools
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from sklearn.metrics import f1_score
+
+from .thread_budget import total_threads
+from .multi_run import SharedFrame, attach_frame
+
+DEFAULT_TRIALS = 16
+DEFAULT_ETA = 3
+# Smallest subsample a trial is judged on
+DEFAULT_MIN_ROWS = 1_000
+
+CLASSIFIERS = ("logistic_regression", "random_forest_classifier", "gaussian_nb", "svc",
+               "gradient_boosting_classifier")
+REGRESSORS = ("linear_regression", "lasso_regression", "ridge_regression", "svr",
+              "gradient_boosting_regressor")
+
+DEFAULT_SPACES = {
+    "kmeans": {"n_clusters": {"low": 2, "high": 12, "int": True}},
+    "dbscan": {
+        "eps": {"low": 0.05, "high": 5.0, "log": True},
+        "min_samples": {"low": 3, "high": 20, "int": True}
+    },
+    "hierarchical_clustering": {
+        "n_clusters": {"low": 2, "high": 12, "int": True},
+        "method": ["ward", "average", "complete"]
+    },
+    "isolation_forest": {"contamination": {"low": 0.01, "high": 0.3}},
+    "lasso_regression": {"alpha": {"low": 1e-4, "high": 10.0, "log": True}},
+    "ridge_regression": {"alpha": {"low": 1e-4, "high": 100.0, "log": True}},
+    "svc": {"C": {"low": 0.01, "high": 100.0, "log": True}},
+    "svr": {
+        "C": {"low": 0.01, "high": 100.0, "log": True},
+        "epsilon": {"low": 0.01, "high": 1.0, "log": True}
+    }
+}
+
+# (stat, direction) each technique is ranked by
+OBJECTIVES = {
+    "kmeans": ("silhouette_score", "max"),
+    "dbscan": ("silhouette_score", "max"),
+    "hierarchical_clustering": ("silhouette_score", "max"),
+    "isolation_forest": ("f1", "max"),
+    **{technique: ("accuracy", "max") for technique in CLASSIFIERS},
+    **{technique: ("r2", "max") for technique in REGRESSORS}
+}
+
+# Params that carry a finished fit into the same configuration's next rung
+WARM_STARTS = {
+    "kmeans": lambda result: {"init": result["centroids"]} if result.get("centroids") else {}
+}
+
+def sample_configs(space, n_trials, seed=0):
+    """
+    Draw configurations from a search space.
+
+    A space maps each param to a list of choices or to a range
+    {"low", "high", "log": bool, "int": bool}. When every param is discrete
+    and the full grid has at most n_trials points, the grid is returned.
+    """
+    if not space:
+        raise ValueError("Empty search space")
+    choices = {}
+    for name, spec in space.items():
+        if isinstance(spec, list):
+            choices[name] = spec
+        elif isinstance(spec, dict) and "low" in spec and "high" in spec:
+            if spec.get("int") and not spec.get("log"):
+                choices[name] = list(range(int(spec["low"]), int(spec["high"]) + 1))
+        else:
+            raise ValueError(f"Invalid search space for '{name}'")
+    if len(choices) == len(space) and math.prod(len(c) for c in choices.values()) <= n_trials:
+        return [dict(zip(choices, values)) for values in itertools.product(*choices.values())]
+
+    rng = np.random.default_rng(seed)
+    configs, seen = [], set()
+    # Narrow spaces run out of distinct points before n_trials
+    for _ in range(n_trials * 10):
+        config = {}
+        for name, spec in space.items():
+            if isinstance(spec, list):
+                config[name] = spec[rng.integers(len(spec))]
+            else:
+                low, high = float(spec["low"]), float(spec["high"])
+                value = math.exp(rng.uniform(math.log(low), math.log(high))) if spec.get("log") else rng.uniform(low, high)
+                config[name] = int(round(value)) if spec.get("int") else float(f"{value:.4g}")
+        key = tuple(sorted((k, str(v)) for k, v in config.items()))
+        if key not in seen:
+            seen.add(key)
+            configs.append(config)
+        if len(configs) == n_trials:
+            break
+    return configs
+
+def halving_schedule(n_rows, n_configs, eta=DEFAULT_ETA, min_rows=DEFAULT_MIN_ROWS):
+    """
+    Rungs of a successive halving run as (configurations, rows) pairs; the
+    last rung always uses every row
+    """
+    rungs = 0
+    while n_configs > eta ** rungs and n_rows / eta ** (rungs + 1) >= min_rows:
+        rungs += 1
+    return [
+        (math.ceil(n_configs / eta ** i), n_rows if i == rungs else int(n_rows / eta ** (rungs - i)))
+        for i in range(rungs + 1)
+    ]
+
+def score_result(technique, result, frame, params, objective):
+    """The objective value of a finished trial, or None with an error"""
+    stats = (result or {}).get("stats") or {}
+    error = (result or {}).get("error") or stats.get("error")
+    if error:
+        return None, error
+    if technique == "isolation_forest" and objective == "f1":
+        label = params.get("target_column")
+        if label not in frame.columns:
+            return None, "Scoring isolation_forest needs target_column with the anomaly labels"
+        # The forest scores rows with every feature present
+        features = frame.drop(columns=[label]).select_dtypes(include="number")
+        complete = features.notna().all(axis=1).to_numpy()
+        truth = frame[label].to_numpy()[complete] != 0
+        flagged = np.asarray(result["charts"]["anomaly_scores"]) < 0
+        return float(f1_score(truth, flagged, zero_division=0)), None
+    value = stats.get(objective)
+    if value is None:
+        return None, f"Result has no '{objective}' stat"
+    return float(value), None
+
+# Worker-process state, set once by _init_worker
+_worker = {}
+
+def _init_worker(spec, seed):
+    memory, frame = attach_frame(spec)
+    _worker.update(memory=memory, frame=frame)
+    _set_frame(frame, seed)
+
+def _set_frame(frame, seed):
+    _worker["frame"] = frame
+    _worker["order"] = np.random.default_rng(seed).permutation(len(frame))
+
+def _run_trial(runner, technique, params, n_rows, objective, sample):
+    frame = _worker["frame"]
+    if n_rows < len(frame):
+        # Sorted so the subsample keeps the frame's row order
+        frame = frame.iloc[np.sort(_worker["order"][:n_rows])].reset_index(drop=True)
+    else:
+        sample = None
+    run_frame = frame
+    if technique == "isolation_forest" and params.get("target_column") in frame.columns:
+        run_frame = frame.drop(columns=[params["target_column"]])
+
+    started = time.perf_counter()
+    # Technique modules print progress; stdout belongs to the event stream
+    with contextlib.redirect_stdout(sys.stderr):
+        result = runner(technique, run_frame, dict(params), sample=sample)
+    elapsed = round((time.perf_counter() - started) * 1000, 1)
+    score, error = score_result(technique, result, frame, params, objective)
+    warm = WARM_STARTS[technique](result) if technique in WARM_STARTS and error is None else {}
+    return {
+        "score": score,
+        "error": error,
+        "elapsed_ms": elapsed,
+        "warm_start": warm,
+        # Only full-frame results are handed back whole
+        "result": result if sample is None else None
+    }
+
+def tune(frame, technique, runner, space=None, params=None, n_trials=DEFAULT_TRIALS, eta=DEFAULT_ETA,
+         min_rows=DEFAULT_MIN_ROWS, objective=None, direction=None, workers=None, seed=0, cached=None,
+         store=None):
+    """
+    Search a technique's params by successive halving.
+
+    Args:
+        frame: prepared numeric features (see multi_run.prepare_features)
+        runner: picklable module-level callable (technique, frame, params,
+            sample) returning a result dict; sample is None on the full
+            frame and otherwise a label for the subsample, whose fitted model
+            need not be kept
+        space: search space (see sample_configs); defaults to DEFAULT_SPACES
+        params: params shared by every trial
+        objective, direction: stat to rank by and "max" or "min"; default
+            from OBJECTIVES
+        workers: pool size; defaults to the host's thread budget
+        cached: optional callable (params) returning a finished full-frame
+            result or None
+        store: optional callable (params, result) receiving full-frame
+            results that were not warm-started, i.e. that a plain run with
+            those params would reproduce
+
+    Yields:
+        "trial" events as trials finish, a "rung" event after each rung and
+        a final "summary" with the leaderboard, the best params and the best
+        full-frame result
+    """
+    params = dict(params or {})
+    space = space or DEFAULT_SPACES.get(technique)
+    if not space:
+        raise ValueError(f"No default search space for '{technique}'; pass one")
+    default_objective, default_direction = OBJECTIVES.get(technique, (None, "max"))
+    objective = objective or default_objective
+    direction = direction or default_direction
+    if not objective:
+        raise ValueError(f"No default objective for '{technique}'; pass one")
+    if direction not in ("max", "min"):
+        raise ValueError(f"Unknown direction '{direction}'")
+
+    configs = sample_configs(space, int(n_trials), seed)
+    schedule = halving_schedule(len(frame), len(configs), int(eta), int(min_rows))
+    sample = f"tune-{seed}"
+    sign = 1 if direction == "max" else -1
+    trials = [{"id": i, "params": config, "rung": None, "rows": None, "score": None,
+               "error": None, "elapsed_ms": 0.0, "warm_start": {}, "warm_started": False}
+              for i, config in enumerate(configs)]
+    results = {}
+
+    n_workers = max(1, min(len(configs), int(workers or total_threads())))
+    shared = pool = None
+    if n_workers > 1:
+        shared = SharedFrame(frame)
+        # spawn: forked children would inherit the parent's OpenMP state
+        pool = ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=_init_worker, initargs=(shared.spec(), seed))
+    else:
+        _set_frame(frame, seed)
+
+    try:
+        alive = trials
+        for rung, (n_configs, n_rows) in enumerate(schedule):
+            if rung:
+                ranked = sorted((t for t in alive if t["score"] is not None), key=lambda t: -sign * t["score"])
+                alive = ranked[:n_configs]
+            final = n_rows >= len(frame)
+
+            def finished(trial, outcome, hit=False):
+                trial.update(rung=rung, rows=n_rows, score=outcome["score"], error=outcome["error"],
+                             warm_start=outcome["warm_start"])
+                trial["elapsed_ms"] += outcome["elapsed_ms"] or 0
+                if final and outcome.get("result") is not None:
+                    results[trial["id"]] = outcome["result"]
+                    if store and not hit and not trial["warm_started"]:
+                        store({**params, **trial["params"]}, outcome["result"])
+                return {"type": "trial", "rung": rung, "rows": n_rows, "trial": trial["id"],
+                        "params": trial["params"], "score": trial["score"], "error": trial["error"],
+                        "elapsed_ms": outcome["elapsed_ms"], "cached": hit}
+
+            pending = []
+            for trial in alive:
+                trial_params = {**params, **trial["params"]}
+                result = cached(trial_params) if final and cached else None
+                if result is not None:
+                    score, error = score_result(technique, result, frame, trial_params, objective)
+                    yield finished(trial, {"score": score, "error": error, "elapsed_ms": 0.0,
+                                           "warm_start": {}, "result": result}, hit=True)
+                else:
+                    trial["warm_started"] = bool(trial["warm_start"])
+                    pending.append((trial, {**trial_params, **trial["warm_start"]}))
+
+            if pool is None:
+                for trial, trial_params in pending:
+                    yield finished(trial, _run_trial(runner, technique, trial_params, n_rows, objective, sample))
+            else:
+                futures = {pool.submit(_run_trial, runner, technique, trial_params, n_rows, objective, sample): trial
+                           for trial, trial_params in pending}
+                for future in as_completed(futures):
+                    try:
+                        outcome = future.result()
+                    except Exception as e:
+                        outcome = {"score": None, "error": f"Worker error: {str(e)}", "elapsed_ms": None,
+                                   "warm_start": {}}
+                    yield finished(futures[future], outcome)
+
+            yield {"type": "rung", "rung": rung, "rows": n_rows, "trials": len(alive),
+                   "errors": sum(1 for t in alive if t["error"])}
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        if shared is not None:
+            shared.close()
+        _worker.clear()
+
+    ranked = sorted(
+        trials,
+        key=lambda t: (-(t["rung"] if t["rung"] is not None else -1),
+                       t["score"] is None,
+                       -sign * t["score"] if t["score"] is not None else 0)
+    )
+    leaderboard = [{
+        "rank": rank,
+        "params": t["params"],
+        "score": t["score"],
+        "rung": t["rung"],
+        "rows": t["rows"],
+        "elapsed_ms": round(t["elapsed_ms"], 1),
+        "warm_started": t["warm_started"],
+        "error": t["error"]
+    } for rank, t in enumerate(ranked, start=1)]
+    best = ranked[0] if ranked and ranked[0]["score"] is not None else None
+    yield {
+        "type": "summary",
+        "objective": objective,
+        "direction": direction,
+        "schedule": [{"configs": c, "rows": r} for c, r in schedule],
+        "leaderboard": leaderboard,
+        "best_params": best["params"] if best else None,
+        "best_score": best["score"] if best else None,
+        "result": results.get(best["id"]) if best else None
+    }
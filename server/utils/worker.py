@@ -0,0 +1,177 @@
+"""
+Long-lived worker loop for running techniques in a warm interpreter.
+
+A worker reads one JSON job per line on stdin and writes one JSON response
+per line on stdout. Anything the technique modules print while a job runs is
+redirected to stderr so it cannot corrupt the framing. A run job that names
+a `result_file` gets its result written there as a binary envelope (see
+result_transport) instead of inline JSON. Results carrying a profile block
+(see profiling) are exported to the profile log once they are encoded.
+
+Request lines:
+    {"id": 1, "type": "run", ...job fields...}
+    {"id": 2, "type": "ping"}
+    {"id": 3, "type": "shutdown"}
+
+Response lines:
+    {"id": 1, "type": "result", "ok": true, "result": {...}, "elapsed_ms": 12.3}
+    {"id": 4, "type": "result", "ok": true, "result": {"result_file": "...", "bytes": 123, "encode_ms": 4.5}}
+    {"id": 2, "type": "pong", "jobs": 1, "rss_mb": 180.2}
+    {"type": "recycle", "reason": "max_jobs", "jobs": 100}
+"""
+
+import os
+import sys
+import json
+import time
+import importlib
+import contextlib
+
+from .json_utils import NpEncoder
+from .result_transport import write_envelope
+from .profiling import current_rss_mb, encode_result, export_profile
+
+# Heavy libraries every technique needs; importing them once is the point
+# of running as a worker.
+WARM_IMPORTS = [
+    "numpy",
+    "pandas",
+    "scipy.spatial.distance",
+    "scipy.cluster.hierarchy",
+    "sklearn.cluster",
+    "sklearn.ensemble",
+    "sklearn.linear_model",
+    "sklearn.svm",
+    "sklearn.decomposition",
+    "sklearn.metrics",
+    "sklearn.model_selection",
+    "sklearn.naive_bayes",
+]
+
+def warm_up(preload=None):
+    """Import the shared scientific stack and any extra modules up front"""
+    for name in WARM_IMPORTS:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            continue
+    if preload:
+        preload()
+
+def _write(stream, message):
+    stream.write(json.dumps(message, cls=NpEncoder) + "\n")
+    stream.flush()
+
+def serve(handle_job, max_jobs=None, max_rss_mb=None, preload=None,
+          stdin=None, stdout=None):
+    """
+    Serve jobs from stdin until shutdown, EOF or a recycle limit is reached.
+
+    Args:
+        handle_job: callable taking the job dict and returning a result dict
+        max_jobs: exit after this many jobs so the pool can start a fresh worker
+        max_rss_mb: exit after a job once resident memory exceeds this limit
+        preload: optional callable run once at startup to import technique modules
+
+    Returns:
+        The reason the loop stopped ("eof", "shutdown", "max_jobs" or "max_rss")
+    """
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+
+    with contextlib.redirect_stdout(sys.stderr):
+        warm_up(preload)
+    _write(stdout, {"type": "ready", "pid": os.getpid(), "rss_mb": round(current_rss_mb(), 1)})
+
+    jobs = 0
+    for line in stdin:
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            message = json.loads(line)
+        except json.JSONDecodeError as e:
+            _write(stdout, {"type": "error", "ok": False, "error": f"Invalid job: {str(e)}"})
+            continue
+
+        job_id = message.get("id")
+        kind = message.get("type", "run")
+
+        if kind == "ping":
+            _write(stdout, {
+                "id": job_id,
+                "type": "pong",
+                "jobs": jobs,
+                "rss_mb": round(current_rss_mb(), 1)
+            })
+            continue
+
+        if kind == "shutdown":
+            return "shutdown"
+
+        started = time.perf_counter()
+        encoded = profile = None
+        try:
+            with contextlib.redirect_stdout(sys.stderr):
+                result = handle_job(message)
+            if message.get("result_file"):
+                profile = result.get("profile") if isinstance(result, dict) else None
+                encode_started = time.perf_counter()
+                size = write_envelope(result, message["result_file"])
+                encode_ms = round((time.perf_counter() - encode_started) * 1000, 2)
+                result = {"result_file": message["result_file"], "bytes": size, "encode_ms": encode_ms}
+                if profile:
+                    profile = dict(profile, encode_ms=encode_ms)
+            else:
+                # The result is encoded on its own so the time goes into its profile
+                try:
+                    encoded, profile = encode_result(result)
+                except (TypeError, ValueError) as e:
+                    raise ValueError(f"Result is not JSON serializable: {str(e)}")
+            response = {"id": job_id, "type": "result", "ok": True}
+        except Exception as e:
+            response = {"id": job_id, "type": "result", "ok": False, "error": str(e)}
+        response["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+        try:
+            if encoded is not None:
+                stdout.write(json.dumps(response)[:-1] + f', "result": {encoded}}}\n')
+                stdout.flush()
+            else:
+                if response["ok"]:
+                    response["result"] = result
+                _write(stdout, response)
+        except (TypeError, ValueError) as e:
+            _write(stdout, {"id": job_id, "type": "result", "ok": False,
+                            "error": f"Result is not JSON serializable: {str(e)}"})
+        export_profile(profile, entry="worker")
+        jobs += 1
+
+        if max_jobs and jobs >= max_jobs:
+            _write(stdout, {"type": "recycle", "reason": "max_jobs", "jobs": jobs})
+            return "max_jobs"
+        if max_rss_mb and current_rss_mb() > max_rss_mb:
+            _write(stdout, {"type": "recycle", "reason": "max_rss", "jobs": jobs})
+            return "max_rss"
+
+    return "eof"
+
+def parse_worker_args(args):
+    """Parse --max-jobs/--max-rss-mb options that follow the --worker flag"""
+    options = {"max_jobs": None, "max_rss_mb": None}
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if '=' in arg:
+            key, value = arg.split('=', 1)
+        elif i + 1 < len(args):
+            key, value = arg, args[i + 1]
+            i += 1
+        else:
+            break
+        key = key.lstrip('-').replace('-', '_')
+        if key in options:
+            options[key] = float(value) if key == "max_rss_mb" else int(value)
+        i += 1
+    return options